@@ -65,6 +65,8 @@ async def lifespan(app: FastAPI):
     
     # --- Shutdown 処理 ---
     await session_manager.stop_cleanup_task()
+    # 未送信の CloudWatch Logs を送信してから閉じる
+    await logging_service.flush_cloudwatch_logs()
     await db_manager.close_pool()
     logger.info("アプリケーションが終了されました")
 
@@ -334,8 +336,8 @@ async def generate_minutes_endpoint(request: TranscriptRequest, auth_context: Di
         minutes = await generate_minutes(request.transcript)
         await manager.broadcast({"type": "minutes", "text": minutes})
         
-        # 使用回数をインクリメント
-        await db_manager.increment_usage_count(user.cognito_user_sub, 1)
+        # 使用回数をインクリメント（書き込みは予約してまとめて行う）
+        db_manager.queue_usage_count(user.cognito_user_sub, 1)
         
         # 課金処理成功ログ（実際の課金額は0円だが、将来の拡張のため）
         await logging_service.log_billing_service_execution(
@@ -1214,8 +1216,11 @@ async def websocket_endpoint(websocket: WebSocket):
             # --- 最終的な使用量をDBから差し引く ---
             if user_context["user"] and user_context["session_usage"] > 0:
                 used = user_context["session_usage"]
-                await db_manager.deduct_balance(user_context["user"].cognito_user_sub, used)
-                logger.info(f"Session closed. Deducted {used:.2f} seconds.")
+                remaining = await db_manager.deduct_balance(user_context["user"].cognito_user_sub, used)
+                if remaining is not None:
+                    logger.info(f"Session closed. Deducted {used:.2f} seconds. Remaining {remaining:.2f} seconds.")
+                else:
+                    logger.warning(f"Session closed. Failed to deduct {used:.2f} seconds.")
             
             manager.disconnect(websocket)
                 
@@ -1318,17 +1323,14 @@ async def update_user_profile(request: UserProfileUpdateRequest, auth_context: D
         if request.timezone is not None:
             profile_updates['timezone'] = request.timezone
         
-        # プロフィールを更新
-        success = await db_manager.update_app_user_profile(user.cognito_user_sub, profile_updates)
+        # プロフィールを更新（更新後のプロフィールも同時に取得）
+        profile_data = await db_manager.update_app_user_profile(user.cognito_user_sub, profile_updates)
         
-        if success:
-            # 更新後のプロフィールを取得
-            updated_data = await db_manager.get_app_user_data_by_cognito_sub(user.cognito_user_sub)
-            
+        if profile_data is not None:
             return {
                 'success': True,
                 'message': 'プロフィールを更新しました。',
-                'profile_data': updated_data.get('profile_data', {}) if updated_data else {}
+                'profile_data': profile_data
             }
         else:
             return {
@@ -1360,17 +1362,14 @@ async def update_user_preferences(request: UserPreferencesUpdateRequest, auth_co
         if request.notifications is not None:
             preferences_updates['notifications'] = request.notifications
         
-        # 設定を更新
-        success = await db_manager.update_app_user_preferences(user.cognito_user_sub, preferences_updates)
+        # 設定を更新（更新後の設定も同時に取得）
+        preferences = await db_manager.update_app_user_preferences(user.cognito_user_sub, preferences_updates)
         
-        if success:
-            # 更新後の設定を取得
-            updated_data = await db_manager.get_app_user_data_by_cognito_sub(user.cognito_user_sub)
-            
+        if preferences is not None:
             return {
                 'success': True,
                 'message': 'ユーザー設定を更新しました。',
-                'preferences': updated_data.get('preferences', {}) if updated_data else {}
+                'preferences': preferences
             }
         else:
             return {
@@ -1484,4 +1483,5 @@ async def get_user_app_data(auth_context: Dict = Depends(require_auth)):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # uvloop がインストールされていれば uvicorn が自動的に使用する
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="auto")
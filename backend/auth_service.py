@@ -509,7 +509,7 @@ class AuthService:
                     expires_in=auth_result.get('ExpiresIn', 86400)  # 24時間
                 )
                 
-                db_session = await db_manager.create_session(session_data)
+                db_session = await db_manager.login_transaction(session_data)
                 if not db_session:
                     await logging_service.log_session_operation(
                         normalized_phone, "created", "failure", 
@@ -522,9 +522,6 @@ class AuthService:
                         'message': 'セッション作成に失敗しました。'
                     }
                 
-                # ユーザーのログイン情報を更新
-                await db_manager.update_user_login(user.user_id)
-                
                 await logging_service.log_auth_attempt(
                     normalized_phone, "success", 
                     {"attempt_type": "signin_success", "session_id": db_session.session_id}, 
@@ -767,7 +764,7 @@ class AuthService:
                 expires_in=auth_result.get('expires_in', 86400)
             )
             
-            db_session = await db_manager.create_session(session_data)
+            db_session = await db_manager.login_transaction(session_data)
             if not db_session:
                 await logging_service.log_session_operation(
                     normalized_phone, "created", "failure", 
@@ -780,9 +777,6 @@ class AuthService:
                     'message': 'セッション作成に失敗しました。'
                 }
             
-            # ユーザーのログイン情報を更新
-            await db_manager.update_user_login(user.user_id)
-            
             await logging_service.log_auth_attempt(
                 normalized_phone, "success", 
                 {"attempt_type": "signup_success", "session_id": db_session.session_id}, 
@@ -5,13 +5,13 @@ import re
 import boto3
 import logging
 import json
-import aiomysql
+from asyncmy.cursors import DictCursor
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 from botocore.exceptions import ClientError
 import os
 from dotenv import load_dotenv
-from database import db_manager
+from database import db_manager, token_digest
 from models import UserCreate, SessionCreate, AuthLogCreate, CognitoRegisterRequest, CognitoLoginRequest, UserSession
 from logging_service import logging_service
 from cognito_token_service import cognito_token_service
@@ -722,7 +722,7 @@ class CognitoService:
                     existing_user = await db_manager.get_user_by_cognito_sub(cognito_user_sub)
                     
                     if not existing_user:
-                        user_data = UserCreate(cognito_user_sub=cognito_user_sub)
+                        user_data = UserCreate(cognito_user_sub=cognito_user_sub, email=email)
                         user = await db_manager.create_user(user_data)
                         
                         if user:
@@ -1159,7 +1159,8 @@ class CognitoService:
                 )
                 
                 # セッションマネージャーでセッションを永続化
-                db_session = await session_manager.persist_session(session_data)
+                # セッション作成とログイン時刻の更新は1回の往復で実行
+                db_session = await session_manager.persist_session(session_data, record_login=True)
                 if not db_session:
                     await logging_service.log_cognito_session_operation(
                         login_data.email, "created", "failure", 
@@ -1172,9 +1173,6 @@ class CognitoService:
                         'message': 'セッション作成に失敗しました。'
                     }
                 
-                # ユーザーのログイン情報を更新
-                await db_manager.update_user_login(user.user_id)
-                
                 await logging_service.log_cognito_user_login(
                     login_data.email, "success", 
                     {
@@ -1353,12 +1351,10 @@ class CognitoService:
             Optional[UserSession]: セッション
         """
         try:
-            import hashlib
-            
-            refresh_token_hash = hashlib.sha256(refresh_token.encode()).hexdigest()
+            refresh_token_hash = token_digest(refresh_token)
             
             async with db_manager.pool.acquire() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                async with conn.cursor(DictCursor) as cursor:
                     await cursor.execute("""
                         SELECT * FROM user_sessions 
                         WHERE refresh_token_hash = %s AND is_active = TRUE
@@ -1367,7 +1363,7 @@ class CognitoService:
                     row = await cursor.fetchone()
                     if row:
                         # トークンを復元（実際のトークンは保存していないので、引数のトークンを使用）
-                        session_dict = dict(row)
+                        session_dict = row
                         session_dict['refresh_token'] = refresh_token
                         return UserSession(**session_dict)
                     return None
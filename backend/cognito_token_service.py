@@ -3,23 +3,125 @@ Cognito トークン管理サービス
 ID Token、Access Token、Refresh Token の管理、検証、リフレッシュ機能
 """
 import os
+import asyncio
+import base64
+import binascii
+import hashlib
 import jwt
 import boto3
 import logging
 import json
-import requests
-from typing import Optional, Dict, Any, List
+import random
+import time
+import httpx
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Optional, Dict, Any, List, Mapping, Tuple
 from datetime import datetime, timedelta
+from jwt.algorithms import RSAAlgorithm
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv
-from database import db_manager
-from models import UserSession, SessionCreate
+from database import db_manager, token_digest
+from models import UserSession, UserCreate, SessionCreate
 from logging_service import logging_service
+from encryption_utils import encryption_utils
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# セッションの非アクティブタイムアウト（2時間、秒）
+SESSION_INACTIVE_TIMEOUT = 2 * 3600
+
+# セッション自動延長の対象とする最終活動からの経過時間（秒）
+AUTO_EXTEND_ACTIVITY_WINDOW = 3600
+
+# セッションのトークン更新SQL
+# 未指定のトークンは既存値を維持（SQL文の形を固定してプランを再利用させる）
+# 入れ替え前のAccess Tokenは有効期限まで使われ続けるため、そのハッシュを previous_access_token_hash に残す
+# （MySQLのUPDATEは左から順に代入するため、先に旧値を退避する）
+SESSION_TOKEN_UPDATE_SQL = """
+    UPDATE user_sessions 
+    SET previous_access_token_hash = access_token_hash,
+        access_token_hash = %s,
+        id_token_hash = COALESCE(%s, id_token_hash),
+        refresh_token_hash = COALESCE(%s, refresh_token_hash),
+        encrypted_refresh_token = COALESCE(%s, encrypted_refresh_token),
+        expires_at = %s,
+        last_activity = %s
+    WHERE session_id = %s AND is_active = TRUE
+"""
+
+# 暗号化Refresh Token取得SQL（主キー検索のみ、呼び出しごとに同一の文字列を送る）
+ENCRYPTED_REFRESH_TOKEN_SELECT_SQL = (
+    "SELECT encrypted_refresh_token FROM user_sessions "
+    "WHERE session_id = %s AND is_active = TRUE"
+)
+
+# 定期クリーンアップが停止している場合の保険として、リフレッシュ時に不要セッションを削除する確率
+SESSION_PURGE_PROBABILITY = 0.01
+
+# Cognito のスロットリング時に再試行するエラーコードと最大試行回数
+THROTTLING_ERROR_CODES = frozenset({
+    'TooManyRequestsException',
+    'ThrottlingException',
+    'LimitExceededException'
+})
+REFRESH_MAX_ATTEMPTS = 3
+
+# 受け付けるJWTの最大長（これを超えるものは検証せずに拒否）
+MAX_TOKEN_LENGTH = 8192
+
+
+def _hash_token(token: Optional[str]) -> Optional[bytes]:
+    """トークンのSHA-256ダイジェストを算出（未指定の場合はNone）"""
+    return token_digest(token) if token else None
+
+
+def _b64url_decode(segment: str) -> bytes:
+    """パディングなしのBase64URL文字列をデコード"""
+    try:
+        return base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+    except (binascii.Error, ValueError) as e:
+        raise jwt.DecodeError("Invalid base64 padding") from e
+
+
+# (ヘッダー, ペイロード, 署名対象バイト列, 署名部分)
+ParsedToken = Tuple[Dict[str, Any], Dict[str, Any], bytes, str]
+
+
+def _parse_jwt(token: str) -> ParsedToken:
+    """
+    JWTを一度だけ分割し、署名を検証せずにヘッダーとペイロードをデコード
+
+    Args:
+        token: JWT文字列
+
+    Returns:
+        ParsedToken: ヘッダー、ペイロード、署名対象バイト列、署名部分
+    """
+    try:
+        header_b64, payload_b64, signature_b64 = token.split('.')
+    except ValueError:
+        raise jwt.DecodeError("Not enough segments")
+
+    try:
+        header = json.loads(_b64url_decode(header_b64))
+        payload = json.loads(_b64url_decode(payload_b64))
+    except ValueError as e:
+        raise jwt.DecodeError(f"Invalid token segment: {e}")
+
+    if not isinstance(header, dict) or not isinstance(payload, dict):
+        raise jwt.DecodeError("Invalid token segment")
+
+    return header, payload, f"{header_b64}.{payload_b64}".encode(), signature_b64
+
+
 class CognitoTokenService:
     """Cognito トークン管理サービス"""
     
@@ -33,12 +135,88 @@ class CognitoTokenService:
             raise ValueError("Cognito 設定が不完全です。環境変数を確認してください。")
         
         # Cognito クライアントを初期化
-        self.cognito_client = boto3.client('cognito-idp', region_name=self.region)
+        self.cognito_client = boto3.client(
+            'cognito-idp',
+            region_name=self.region,
+            config=Config(retries={'max_attempts': 5, 'mode': 'adaptive'})
+        )
         
-        # JWKSエンドポイントURL
-        self.jwks_url = f"https://cognito-idp.{self.region}.amazonaws.com/{self.user_pool_id}/.well-known/jwks.json"
+        # トークン発行者（iss）とJWKSエンドポイントURL
+        self.issuer = f"https://cognito-idp.{self.region}.amazonaws.com/{self.user_pool_id}"
+        self.jwks_url = f"{self.issuer}/.well-known/jwks.json"
         self.jwks_cache = None
+        # kid ごとのJWKと構築済みRSA公開キー（更新時は新しい読み取り専用辞書に差し替える）
+        self.jwks_by_kid: Mapping[str, Dict[str, Any]] = MappingProxyType({})
+        self.public_keys_by_kid: Mapping[str, RSAPublicKey] = MappingProxyType({})
         self.jwks_cache_expiry = None
+        self.jwks_etag = None
+        self.jwks_last_modified = None
+        # 同時に期限切れを検知したリクエストのJWKS取得を1回にまとめるためのロック
+        self._jwks_refresh_lock = asyncio.Lock()
+        # JWKS取得用HTTPクライアント（初回取得時に生成し、接続を再利用）
+        self._http_client: Optional[httpx.AsyncClient] = None
+        
+        # 時刻ずれを吸収するためのJWT検証の猶予（秒）
+        self.jwt_leeway = int(os.getenv('JWT_LEEWAY', 30))
+        
+        # トークン検証・セッション同期結果の短期キャッシュ（キー: Access TokenのSHA-256）
+        self.validation_cache_ttl = int(os.getenv('VALIDATION_CACHE_TTL', 30))
+        self.validation_cache_size = int(os.getenv('VALIDATION_CACHE_SIZE', 1024))
+        self._validation_cache: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        
+        # 署名検証済みトークンの検証結果キャッシュ（キー: (トークン種別, BLAKE2bダイジェスト)）
+        # トークンの有効期限まで保持し、同じトークンのRSA署名検証を省略する
+        self.claims_cache_size = int(os.getenv('JWT_CLAIMS_CACHE_SIZE', 50000))
+        self._claims_cache: "OrderedDict[Tuple[str, bytes], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        
+        # JWKSキャッシュのTTL（秒）: Cache-Control の max-age をこの範囲に収める
+        self.jwks_min_ttl = int(os.getenv('JWKS_MIN_TTL', 300))
+        self.jwks_max_ttl = int(os.getenv('JWKS_MAX_TTL', 3600))
+        
+        # セッションごとに実行中の自動リフレッシュ（同時リクエストは同じ結果を待つ）
+        self._refresh_inflight: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+        # 直近の自動リフレッシュ結果
+        # （キー: 更新前Access TokenのSHA-256、値: (新しいAccess Tokenの期限, セッションID, ユーザーID, 結果)）
+        self._recent_refreshes: "OrderedDict[bytes, Tuple[float, str, str, Dict[str, Any]]]" = OrderedDict()
+        # 更新前Access Tokenでリフレッシュ結果を引き継げる、そのトークンの期限切れ後の猶予（秒）
+        self.recent_refresh_grace = int(os.getenv('RECENT_REFRESH_GRACE', 60))
+        # 復号済みRefresh Tokenのキャッシュ（キー: セッションID、値: (有効期限, Refresh Token)）
+        # 暗号化はDB保存時のみ行い、自動リフレッシュ時のSELECTと復号を省略する
+        self.refresh_token_cache_ttl = int(os.getenv('REFRESH_TOKEN_CACHE_TTL', 3600))
+        self.refresh_token_cache_size = int(os.getenv('REFRESH_TOKEN_CACHE_SIZE', 1024))
+        self._refresh_token_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        # 期限が近いトークンを事前にリフレッシュする猶予（秒）
+        self.refresh_stale_window = int(os.getenv('TOKEN_REFRESH_STALE_WINDOW', 300))
+        # リフレッシュ時に確率的に起動する不要セッション削除タスク
+        self._purge_task: Optional[asyncio.Task] = None
+        # 実行中のバックグラウンドリフレッシュ（キー: セッションID、完了前にGCされないよう参照を保持）
+        self._background_refreshes: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
+    
+    def _get_jwks_ttl(self, cache_control: Optional[str]) -> int:
+        """
+        Cache-Control ヘッダーからJWKSキャッシュのTTLを算出
+        
+        Args:
+            cache_control: Cache-Control ヘッダーの値
+            
+        Returns:
+            int: キャッシュTTL（秒）
+        """
+        max_age = None
+        if cache_control:
+            for directive in cache_control.split(','):
+                name, _, value = directive.strip().partition('=')
+                if name.lower() == 'max-age':
+                    try:
+                        max_age = int(value.strip('"'))
+                    except ValueError:
+                        max_age = None
+                    break
+        
+        if max_age is None:
+            return self.jwks_max_ttl
+        
+        return min(max(max_age, self.jwks_min_ttl), self.jwks_max_ttl)
     
     async def get_jwks(self) -> Dict[str, Any]:
         """
@@ -49,25 +227,91 @@ class CognitoTokenService:
         """
         try:
             # キャッシュが有効かチェック
-            if (self.jwks_cache and self.jwks_cache_expiry and 
-                datetime.utcnow() < self.jwks_cache_expiry):
+            if self._is_jwks_cache_valid():
                 return self.jwks_cache
             
-            # JWKSを取得
-            response = requests.get(self.jwks_url, timeout=10)
-            response.raise_for_status()
-            
-            self.jwks_cache = response.json()
-            # 1時間キャッシュ
-            self.jwks_cache_expiry = datetime.utcnow() + timedelta(hours=1)
-            
-            logger.debug("Cognito JWKSを取得しました")
-            return self.jwks_cache
+            async with self._jwks_refresh_lock:
+                # ロック待ちの間に他のリクエストが取得済みであればそれを使用
+                if self._is_jwks_cache_valid():
+                    return self.jwks_cache
+                
+                return await self._fetch_jwks()
             
         except Exception as e:
-            logger.error(f"JWKS取得エラー: {e}")
+            logger.error("JWKS取得エラー: %s", e)
             raise
     
+    def _is_jwks_cache_valid(self) -> bool:
+        """JWKSキャッシュが有効かチェック"""
+        return bool(self.jwks_cache and self.jwks_cache_expiry and
+                    time.time() < self.jwks_cache_expiry)
+    
+    async def _fetch_jwks(self) -> Dict[str, Any]:
+        """
+        Cognito JWKSをエンドポイントから取得してキャッシュを更新
+        
+        Returns:
+            Dict: JWKS データ
+        """
+        # 前回の応答がある場合は条件付きGETで取得
+        headers = {}
+        if self.jwks_cache:
+            if self.jwks_etag:
+                headers['If-None-Match'] = self.jwks_etag
+            if self.jwks_last_modified:
+                headers['If-Modified-Since'] = self.jwks_last_modified
+        
+        # JWKSを取得（イベントループをブロックしないよう非同期クライアントを使用）
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(timeout=10)
+        response = await self._http_client.get(self.jwks_url, headers=headers)
+        ttl = self._get_jwks_ttl(response.headers.get('Cache-Control'))
+        
+        # 変更がない場合はキャッシュの有効期限のみ延長
+        if response.status_code == 304 and self.jwks_cache:
+            self.jwks_cache_expiry = time.time() + ttl
+            logger.debug("Cognito JWKSは更新されていません")
+            return self.jwks_cache
+        
+        response.raise_for_status()
+        
+        self.jwks_cache = response.json()
+        self._publish_jwks_keys(self.jwks_cache)
+        self.jwks_etag = response.headers.get('ETag')
+        self.jwks_last_modified = response.headers.get('Last-Modified')
+        self.jwks_cache_expiry = time.time() + ttl
+        
+        logger.debug("Cognito JWKSを取得しました")
+        return self.jwks_cache
+    
+    def _publish_jwks_keys(self, jwks: Dict[str, Any]) -> None:
+        """
+        JWKSからkid索引と公開キーを構築し、読み取り専用の辞書として一括で差し替え
+        
+        読み取り側はロックなしで参照でき、更新途中の状態を見ることはない
+        
+        Args:
+            jwks: JWKS データ
+        """
+        jwks_by_kid = {}
+        public_keys_by_kid = {}
+        for key in jwks.get('keys', []):
+            kid = key.get('kid')
+            if not kid:
+                continue
+            jwks_by_kid[kid] = key
+            try:
+                public_keys_by_kid[kid] = RSAAlgorithm.from_jwk(key)
+            except Exception as e:
+                logger.warning("JWKから公開キーを構築できません (kid=%s): %s", kid, e)
+        
+        # 署名キーが入れ替わった場合は、旧キーで検証済みの結果を破棄
+        if public_keys_by_kid.keys() != self.public_keys_by_kid.keys():
+            self._claims_cache.clear()
+        
+        self.jwks_by_kid = MappingProxyType(jwks_by_kid)
+        self.public_keys_by_kid = MappingProxyType(public_keys_by_kid)
+    
     def get_jwk_key(self, token_header: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         JWTヘッダーからJWKキーを取得
@@ -79,23 +323,86 @@ class CognitoTokenService:
             Optional[Dict]: JWKキー
         """
         try:
-            if not self.jwks_cache:
-                return None
-            
-            kid = token_header.get('kid')
-            if not kid:
-                return None
-            
-            for key in self.jwks_cache.get('keys', []):
-                if key.get('kid') == kid:
-                    return key
-            
-            return None
+            return self.jwks_by_kid.get(token_header.get('kid'))
             
         except Exception as e:
-            logger.error(f"JWKキー取得エラー: {e}")
+            logger.error("JWKキー取得エラー: %s", e)
             return None
     
+    def _decode_rs256(self, parsed_token: ParsedToken, public_key: RSAPublicKey, issuer: str,
+                      require: List[str], audience: Optional[str] = None,
+                      exp_leeway: Optional[int] = None) -> Dict[str, Any]:
+        """
+        RS256署名のJWTを cryptography で直接検証し、クレームを確認
+        
+        PyJWT の jwt.decode と同じ例外（jwt.InvalidTokenError のサブクラス）を送出する
+        
+        Args:
+            parsed_token: _parse_jwt で分割済みのJWT
+            public_key: RSA公開キー
+            issuer: 期待するissuer
+            require: 必須クレーム
+            audience: 期待するaudience（Noneの場合は検証しない）
+            exp_leeway: expに対する猶予（秒、Noneの場合は jwt_leeway）
+            
+        Returns:
+            Dict: 検証済みペイロード
+        """
+        header, payload, signing_input, signature_b64 = parsed_token
+        
+        if header.get('alg') != 'RS256':
+            raise jwt.InvalidAlgorithmError("The specified alg value is not allowed")
+        
+        # 署名を検証
+        try:
+            public_key.verify(
+                _b64url_decode(signature_b64),
+                signing_input,
+                padding.PKCS1v15(),
+                hashes.SHA256()
+            )
+        except InvalidSignature:
+            raise jwt.InvalidSignatureError("Signature verification failed")
+        
+        # 必須クレームを確認
+        for claim in require:
+            if payload.get(claim) is None:
+                raise jwt.MissingRequiredClaimError(claim)
+        
+        now = int(time.time())
+        
+        # 時刻クレームを確認（leeway 付き）
+        for claim in ('exp', 'iat', 'nbf'):
+            if claim in payload and not isinstance(payload[claim], (int, float)):
+                raise jwt.DecodeError(f"{claim} claim must be an integer.")
+        
+        if exp_leeway is None:
+            exp_leeway = self.jwt_leeway
+        if 'exp' in payload and payload['exp'] <= now - exp_leeway:
+            raise jwt.ExpiredSignatureError("Signature has expired")
+        if 'iat' in payload and payload['iat'] > now + self.jwt_leeway:
+            raise jwt.ImmatureSignatureError("The token is not yet valid (iat)")
+        if 'nbf' in payload and payload['nbf'] > now + self.jwt_leeway:
+            raise jwt.ImmatureSignatureError("The token is not yet valid (nbf)")
+        
+        # issuer を確認
+        if 'iss' not in payload:
+            raise jwt.MissingRequiredClaimError('iss')
+        if payload['iss'] != issuer:
+            raise jwt.InvalidIssuerError("Invalid issuer")
+        
+        # audience を確認
+        if audience is not None:
+            if 'aud' not in payload:
+                raise jwt.MissingRequiredClaimError('aud')
+            audience_claims = payload['aud']
+            if isinstance(audience_claims, str):
+                audience_claims = [audience_claims]
+            if not isinstance(audience_claims, list) or audience not in audience_claims:
+                raise jwt.InvalidAudienceError("Audience doesn't match")
+        
+        return payload
+    
     async def verify_id_token(self, id_token: str) -> Dict[str, Any]:
         """
         Cognito ID Tokenを検証
@@ -114,12 +421,24 @@ class CognitoTokenService:
                     'message': 'ID Tokenが提供されていません。'
                 }
             
-            # JWKSを取得
-            await self.get_jwks()
+            # JWTとして明らかに不正な形式のものはJWKS取得や署名検証の前に拒否
+            if len(id_token) > MAX_TOKEN_LENGTH or id_token.count('.') != 2:
+                return {
+                    'valid': False,
+                    'error': 'invalid_token_format',
+                    'message': 'ID Tokenの形式が無効です。'
+                }
+            
+            # 検証済みのトークンであれば署名検証を省略
+            claims_key = ('id', hashlib.blake2b(id_token.encode(), digest_size=16).digest())
+            cached_result = self._get_cached_claims(claims_key)
+            if cached_result:
+                return cached_result
             
             # JWTヘッダーをデコード
             try:
-                header = jwt.get_unverified_header(id_token)
+                parsed_token = _parse_jwt(id_token)
+                header = parsed_token[0]
             except jwt.InvalidTokenError as e:
                 return {
                     'valid': False,
@@ -127,37 +446,29 @@ class CognitoTokenService:
                     'message': 'ID Tokenの形式が無効です。'
                 }
             
-            # JWKキーを取得
-            jwk_key = self.get_jwk_key(header)
-            if not jwk_key:
+            # JWKSを取得
+            await self.get_jwks()
+            
+            # JWKSの更新時に構築済みのRSA公開キーを取得
+            public_key = self.public_keys_by_kid.get(header.get('kid'))
+            if not public_key:
                 return {
                     'valid': False,
                     'error': 'jwk_key_not_found',
                     'message': 'JWKキーが見つかりません。'
                 }
             
-            # RSA公開キーを構築
-            from jwt.algorithms import RSAAlgorithm
-            public_key = RSAAlgorithm.from_jwk(json.dumps(jwk_key))
-            
             # JWTを検証
             try:
-                payload = jwt.decode(
-                    id_token,
+                # ID Tokenの audience (aud) は client_id と一致する必要があるため、
+                # 必須クレームと合わせて一度の検証で確認する
+                payload = self._decode_rs256(
+                    parsed_token,
                     public_key,
-                    algorithms=['RS256'],
-                    options={"verify_aud": False}, # audクレームの検証を個別に行うため一旦スキップ
-                    issuer=f"https://cognito-idp.{self.region}.amazonaws.com/{self.user_pool_id}"
+                    self.issuer,
+                    ["exp", "iat", "sub", "token_use", "aud"],
+                    audience=self.client_id
                 )
-                
-                # ID Tokenの audience (aud) は client_id と一致する必要がある
-                # クレームが存在しない場合や一致しない場合にエラーを出す
-                if payload.get('aud') != self.client_id:
-                    return {
-                        'valid': False,
-                        'error': 'invalid_audience',
-                        'message': 'ID Tokenのaudienceが無効です。'
-                    }
             except jwt.ExpiredSignatureError:
                 return {
                     'valid': False,
@@ -191,7 +502,7 @@ class CognitoTokenService:
                     'message': 'ID Tokenではありません。'
                 }
             
-            return {
+            result = {
                 'valid': True,
                 'payload': payload,
                 'user_sub': payload.get('sub'),
@@ -202,9 +513,11 @@ class CognitoTokenService:
                 'exp': payload.get('exp'),
                 'iat': payload.get('iat')
             }
+            self._cache_claims(claims_key, result)
+            return result
             
         except Exception as e:
-            logger.error(f"ID Token検証エラー: {e}")
+            logger.error("ID Token検証エラー: %s", e)
             return {
                 'valid': False,
                 'error': 'verification_error',
@@ -229,12 +542,24 @@ class CognitoTokenService:
                     'message': 'Access Tokenが提供されていません。'
                 }
             
-            # JWKSを取得
-            await self.get_jwks()
+            # JWTとして明らかに不正な形式のものはJWKS取得や署名検証の前に拒否
+            if len(access_token) > MAX_TOKEN_LENGTH or access_token.count('.') != 2:
+                return {
+                    'valid': False,
+                    'error': 'invalid_token_format',
+                    'message': 'Access Tokenの形式が無効です。'
+                }
+            
+            # 検証済みのトークンであれば署名検証を省略
+            claims_key = ('access', hashlib.blake2b(access_token.encode(), digest_size=16).digest())
+            cached_result = self._get_cached_claims(claims_key)
+            if cached_result:
+                return cached_result
             
             # JWTヘッダーをデコード
             try:
-                header = jwt.get_unverified_header(access_token)
+                parsed_token = _parse_jwt(access_token)
+                header, unverified_payload = parsed_token[0], parsed_token[1]
             except jwt.InvalidTokenError as e:
                 return {
                     'valid': False,
@@ -242,29 +567,36 @@ class CognitoTokenService:
                     'message': 'Access Tokenの形式が無効です。'
                 }
             
-            # JWKキーを取得
-            jwk_key = self.get_jwk_key(header)
-            if not jwk_key:
+            # 期限切れのトークンはRSA署名検証を行わずに早期に判定
+            exp = unverified_payload.get('exp')
+            if isinstance(exp, int) and exp < int(time.time()) - self.jwt_leeway:
+                return {
+                    'valid': False,
+                    'error': 'token_expired',
+                    'message': 'Access Tokenの有効期限が切れています。'
+                }
+            
+            # JWKSを取得
+            await self.get_jwks()
+            
+            # JWKSの更新時に構築済みのRSA公開キーを取得
+            public_key = self.public_keys_by_kid.get(header.get('kid'))
+            if not public_key:
                 return {
                     'valid': False,
                     'error': 'jwk_key_not_found',
                     'message': 'JWKキーが見つかりません。'
                 }
             
-            # RSA公開キーを構築
-            from jwt.algorithms import RSAAlgorithm
-            public_key = RSAAlgorithm.from_jwk(json.dumps(jwk_key))
-            
             # JWTを検証
             try:
                 # Access Tokenには標準的な 'aud' クレームが含まれていないため、
                 # audience の検証をスキップし、代わりに client_id クレームを確認する
-                payload = jwt.decode(
-                    access_token,
+                payload = self._decode_rs256(
+                    parsed_token,
                     public_key,
-                    algorithms=['RS256'],
-                    options={"verify_aud": False},
-                    issuer=f"https://cognito-idp.{self.region}.amazonaws.com/{self.user_pool_id}"
+                    self.issuer,
+                    ["exp", "iat", "sub", "token_use", "client_id"]
                 )
                 
                 # client_id クレームの検証
@@ -308,7 +640,7 @@ class CognitoTokenService:
                     'message': 'Access Tokenではありません。'
                 }
             
-            return {
+            result = {
                 'valid': True,
                 'payload': payload,
                 'user_sub': payload.get('sub'),
@@ -318,15 +650,53 @@ class CognitoTokenService:
                 'exp': payload.get('exp'),
                 'iat': payload.get('iat')
             }
+            self._cache_claims(claims_key, result)
+            return result
             
         except Exception as e:
-            logger.error(f"Access Token検証エラー: {e}")
+            logger.error("Access Token検証エラー: %s", e)
             return {
                 'valid': False,
                 'error': 'verification_error',
                 'message': 'Access Token検証中にエラーが発生しました。'
             }
     
+    def _get_cached_claims(self, claims_key: Tuple[str, bytes]) -> Optional[Dict[str, Any]]:
+        """
+        検証済みトークンの検証結果を取得（有効期限切れのものは破棄）
+        
+        Args:
+            claims_key: (トークン種別, トークンのダイジェスト)
+            
+        Returns:
+            Optional[Dict]: 検証結果のコピー
+        """
+        entry = self._claims_cache.get(claims_key)
+        if entry is None:
+            return None
+        
+        expires_at, result = entry
+        if time.time() > expires_at:
+            del self._claims_cache[claims_key]
+            return None
+        
+        self._claims_cache.move_to_end(claims_key)
+        return dict(result)
+    
+    def _cache_claims(self, claims_key: Tuple[str, bytes], result: Dict[str, Any]) -> None:
+        """
+        検証結果をトークンの有効期限（猶予込み）までキャッシュ
+        
+        Args:
+            claims_key: (トークン種別, トークンのダイジェスト)
+            result: 検証結果
+        """
+        self._claims_cache[claims_key] = (result['exp'] + self.jwt_leeway, dict(result))
+        self._claims_cache.move_to_end(claims_key)
+        
+        while len(self._claims_cache) > self.claims_cache_size:
+            self._claims_cache.popitem(last=False)
+    
     async def refresh_tokens(self, refresh_token: str, ip_address: Optional[str] = None) -> Dict[str, Any]:
         """
         Refresh Tokenを使用してトークンをリフレッシュ
@@ -347,14 +717,7 @@ class CognitoTokenService:
                 }
             
             # Cognito でトークンをリフレッシュ
-            response = self.cognito_client.admin_initiate_auth(
-                UserPoolId=self.user_pool_id,
-                ClientId=self.client_id,
-                AuthFlow='REFRESH_TOKEN_AUTH',
-                AuthParameters={
-                    'REFRESH_TOKEN': refresh_token
-                }
-            )
+            response = await self._initiate_refresh_auth(refresh_token)
             
             if 'AuthenticationResult' in response:
                 auth_result = response['AuthenticationResult']
@@ -386,7 +749,7 @@ class CognitoTokenService:
                 
         except ClientError as e:
             error_code = e.response['Error']['Code']
-            logger.error(f"Cognitoトークンリフレッシュエラー: {error_code} - {e}")
+            logger.error("Cognitoトークンリフレッシュエラー: %s - %s", error_code, e)
             
             if error_code == 'NotAuthorizedException':
                 return {
@@ -408,13 +771,44 @@ class CognitoTokenService:
                 }
                 
         except Exception as e:
-            logger.error(f"予期しないエラー: {e}")
+            logger.error("予期しないエラー: %s", e)
             return {
                 'success': False,
                 'error': 'unexpected_error',
                 'message': 'システムエラーが発生しました。'
             }
     
+    async def _initiate_refresh_auth(self, refresh_token: str) -> Dict[str, Any]:
+        """
+        REFRESH_TOKEN_AUTH フローを実行（スロットリング時は指数バックオフで再試行）
+        
+        Args:
+            refresh_token: リフレッシュトークン
+            
+        Returns:
+            Dict: admin_initiate_auth のレスポンス
+        """
+        for attempt in range(REFRESH_MAX_ATTEMPTS):
+            try:
+                # boto3 は同期APIのため、イベントループをブロックしないようスレッドで実行
+                return await asyncio.to_thread(
+                    self.cognito_client.admin_initiate_auth,
+                    UserPoolId=self.user_pool_id,
+                    ClientId=self.client_id,
+                    AuthFlow='REFRESH_TOKEN_AUTH',
+                    AuthParameters={
+                        'REFRESH_TOKEN': refresh_token
+                    }
+                )
+            except ClientError as e:
+                error_code = e.response['Error']['Code']
+                if error_code not in THROTTLING_ERROR_CODES or attempt == REFRESH_MAX_ATTEMPTS - 1:
+                    raise
+                
+                delay = min(2 ** attempt * 0.1 + random.random() * 0.1, 2.0)
+                logger.warning("Cognitoトークンリフレッシュがスロットリングされました。%.2f秒後に再試行します: %s", delay, error_code)
+                await asyncio.sleep(delay)
+    
     async def validate_and_sync_session(self, access_token: str, ip_address: Optional[str] = None) -> Dict[str, Any]:
         """
         Cognitoトークンを検証し、ローカルセッションと同期
@@ -428,11 +822,34 @@ class CognitoTokenService:
             Dict: 検証・同期結果
         """
         try:
-            # Access Tokenを検証
-            access_validation = await self.verify_access_token(access_token)
+            # 直近の検証結果がキャッシュにあれば署名検証とDB参照を省略
+            cache_key = token_digest(access_token)
+            cached_result = self._get_cached_validation(cache_key)
+            if cached_result:
+                db_manager.queue_session_activity(cached_result['session'].session_id)
+                return dict(cached_result)
+            
+            # セッション照会に使うトークン（リフレッシュ後は新しいAccess Token）
+            current_token = access_token
+            # この呼び出しでリフレッシュしたセッション（DBを再参照せずに使う）
+            refreshed_session = None
+            
+            # このトークンが既にリフレッシュ済みであれば、新しいトークンで検証を続ける
+            # （提示されたトークン自体が正当で、期限切れ後の猶予内である場合のみ）
+            refresh_result = self._get_recent_refresh(cache_key)
+            if refresh_result and not await self._verify_superseded_token(access_token):
+                self._recent_refreshes.pop(cache_key, None)
+                refresh_result = None
+            if refresh_result:
+                access_validation = await self._verify_refreshed_token(refresh_result)
+                if access_validation['valid']:
+                    current_token = refresh_result['new_access_token']
+            else:
+                # Access Tokenを検証
+                access_validation = await self.verify_access_token(access_token)
             
             # トークンが期限切れの場合、自動リフレッシュを試行
-            if not access_validation['valid'] and access_validation['error'] == 'token_expired':
+            if not refresh_result and not access_validation['valid'] and access_validation['error'] == 'token_expired':
                 logger.info("Access Tokenが期限切れです。自動リフレッシュを試行します。")
                 
                 # ローカルセッションからRefresh Tokenを取得
@@ -440,20 +857,15 @@ class CognitoTokenService:
                 # 属性の存在を安全にチェック
                 if session and hasattr(session, 'refresh_token_hash') and session.refresh_token_hash:
                     # Refresh Tokenでトークンを更新
-                    refresh_result = await self._auto_refresh_session_tokens(session, ip_address)
+                    refresh_result = await self._auto_refresh_session_tokens(session, ip_address, cache_key)
                     if refresh_result['success']:
-                        # 新しいAccess Tokenで再検証
-                        access_validation = await self.verify_access_token(refresh_result['new_access_token'])
+                        access_validation = await self._verify_refreshed_token(refresh_result)
                         if access_validation['valid']:
                             logger.info("自動トークンリフレッシュが成功しました。")
-                            # 新しいトークンを返す
-                            access_validation['token_refreshed'] = True
-                            access_validation['new_access_token'] = refresh_result['new_access_token']
-                            access_validation['new_id_token'] = refresh_result.get('new_id_token')
-                        else:
-                            logger.warning("リフレッシュ後のトークン検証に失敗しました。")
+                            current_token = refresh_result['new_access_token']
+                            refreshed_session = self._apply_refresh_to_session(session, refresh_result)
                     else:
-                        logger.warning(f"自動トークンリフレッシュに失敗しました: {refresh_result['error']}")
+                        logger.warning("自動トークンリフレッシュに失敗しました: %s", refresh_result['error'])
             
             if not access_validation['valid']:
                 return {
@@ -464,14 +876,13 @@ class CognitoTokenService:
             
             user_sub = access_validation['user_sub']
             
-            # ローカルセッションを取得
-            session = await db_manager.get_session_by_token(access_token)
+            # ローカルセッションを取得（リフレッシュ直後は更新内容を反映済みのものを使う）
+            session = refreshed_session or await db_manager.get_session_by_token(current_token)
             if not session:
-                logger.info(f"ローカルセッションが見つかりません。新規作成します (JIT): user_sub={user_sub}")
+                logger.info("ローカルセッションが見つかりません。新規作成します (JIT): user_sub=%s", user_sub)
                 # ユーザーがデータベースに存在するか確認、なければ作成
                 user = await db_manager.get_user_by_cognito_sub(user_sub)
                 if not user:
-                    from models import UserCreate
                     user = await db_manager.create_user(UserCreate(cognito_user_sub=user_sub))
                 
                 if not user:
@@ -482,21 +893,20 @@ class CognitoTokenService:
                     }
 
                 # 新しいセッションを作成
-                from models import SessionCreate
                 # 有効期限をトークンのexpから計算
-                expires_in = access_validation['exp'] - int(datetime.utcnow().timestamp())
+                expires_in = access_validation['exp'] - int(time.time())
                 if expires_in <= 0:
                     expires_in = 3600 # フォールバック
 
                 session_data = SessionCreate(
                     user_id=user.user_id,
                     cognito_user_sub=user_sub,
-                    access_token=access_token,
+                    access_token=current_token,
                     expires_in=expires_in,
                     client_ip=ip_address
                 )
                 session = await db_manager.create_session(session_data)
-                logger.info(f"JITセッション作成完了: {session.session_id if session else '失敗'}")
+                logger.info("JITセッション作成完了: %s", session.session_id if session else '失敗')
                 
                 if not session:
                     return {
@@ -505,8 +915,10 @@ class CognitoTokenService:
                         'message': 'セッションの自動作成に失敗しました。'
                     }
             
+            now_ts = int(time.time())
+            
             # セッション期限をチェック（24時間）
-            if datetime.utcnow() > session.expires_at:
+            if now_ts > session.expires_at_ts:
                 # セッション期限切れの場合、自動延長を試行
                 logger.info("セッションが期限切れです。自動延長を試行します。")
                 extension_result = await self._auto_extend_session(session, ip_address)
@@ -519,13 +931,19 @@ class CognitoTokenService:
                     }
                 else:
                     logger.info("セッションの自動延長が成功しました。")
-                    # 延長されたセッション情報を再取得
-                    session = await db_manager.get_session_by_id(session.session_id)
+                    # 延長されたセッション情報を再取得（呼び出し元のAccess Tokenを保持するためトークンで取得）
+                    session = await db_manager.get_session_by_token(current_token)
+                    if not session:
+                        return {
+                            'success': False,
+                            'error': 'session_not_found',
+                            'message': 'セッションが見つかりません。'
+                        }
             
             # 非アクティブタイムアウトをチェック（2時間）
-            if datetime.utcnow() > session.last_activity + timedelta(hours=2):
+            if now_ts - session.last_activity_ts > SESSION_INACTIVE_TIMEOUT:
                 await db_manager.invalidate_session(session.session_id)
-                await logging_service.log_cognito_session_operation(
+                logging_service.queue_cognito_session_operation(
                     "cognito_user", "auto_logout", "success",
                     {
                         "session_id": session.session_id,
@@ -549,8 +967,8 @@ class CognitoTokenService:
                     'message': 'ユーザー情報が一致しません。'
                 }
             
-            # セッションの最終活動時刻を更新
-            await db_manager.update_session_activity(session.session_id)
+            # セッションの最終活動時刻を更新（バッチ書き込み）
+            db_manager.queue_session_activity(session.session_id)
             
             # ユーザー情報を取得
             user = await db_manager.get_user_by_id(session.user_id)
@@ -582,17 +1000,146 @@ class CognitoTokenService:
                 result['token_refreshed'] = True
                 result['new_access_token'] = access_validation['new_access_token']
                 result['new_id_token'] = access_validation.get('new_id_token')
+            elif (self._token_state(access_validation['exp']) == 'stale'
+                  and getattr(session, 'refresh_token_hash', None)):
+                # 期限間近: 現在のトークンで応答し、リフレッシュはバックグラウンドで実行
+                # （新しいトークンは次のリクエストで返すため、この結果はキャッシュしない）
+                self._schedule_background_refresh(session, ip_address, cache_key)
+            else:
+                self._cache_validation(cache_key, result, access_validation['exp'])
             
             return result
             
         except Exception as e:
-            logger.error(f"トークン検証・セッション同期エラー: {e}")
+            logger.error("トークン検証・セッション同期エラー: %s", e)
             return {
                 'success': False,
                 'error': 'validation_error',
                 'message': 'トークン検証・セッション同期中にエラーが発生しました。'
             }
     
+    def _apply_refresh_to_session(self, session: UserSession, refresh_result: Dict[str, Any]) -> Optional[UserSession]:
+        """
+        リフレッシュ結果をセッションに反映したコピーを作成（DBへの再SELECTを省略するため）
+        
+        Args:
+            session: リフレッシュ前のユーザーセッション
+            refresh_result: 自動リフレッシュ結果
+            
+        Returns:
+            Optional[UserSession]: 更新後のセッション（有効期限が不明な場合はNone）
+        """
+        if not refresh_result.get('expires_at'):
+            return None
+        
+        updates = {
+            'access_token': refresh_result['new_access_token'],
+            'expires_at': datetime.fromisoformat(refresh_result['expires_at']),
+            'last_activity': datetime.utcnow()
+        }
+        if refresh_result.get('new_id_token'):
+            updates['id_token'] = refresh_result['new_id_token']
+        
+        return session.model_copy(update=updates)
+    
+    async def _verify_refreshed_token(self, refresh_result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        リフレッシュで得た新しいAccess Tokenを検証
+        
+        Args:
+            refresh_result: 自動リフレッシュ結果
+            
+        Returns:
+            Dict: 検証結果（成功時は新しいトークンを含む）
+        """
+        access_validation = await self.verify_access_token(refresh_result['new_access_token'])
+        if access_validation['valid']:
+            access_validation['token_refreshed'] = True
+            access_validation['new_access_token'] = refresh_result['new_access_token']
+            access_validation['new_id_token'] = refresh_result.get('new_id_token')
+        else:
+            logger.warning("リフレッシュ後のトークン検証に失敗しました。")
+        
+        return access_validation
+    
+    def _get_cached_validation(self, cache_key: bytes) -> Optional[Dict[str, Any]]:
+        """
+        キャッシュ済みのトークン検証・セッション同期結果を取得
+        
+        Args:
+            cache_key: Access TokenのSHA-256ダイジェスト
+            
+        Returns:
+            Optional[Dict]: 有効期限内のキャッシュ結果
+        """
+        entry = self._validation_cache.get(cache_key)
+        if entry is None:
+            return None
+        
+        expires_at, result = entry
+        if time.time() >= expires_at:
+            del self._validation_cache[cache_key]
+            return None
+        
+        self._validation_cache.move_to_end(cache_key)
+        return result
+    
+    def _cache_validation(self, cache_key: bytes, result: Dict[str, Any], token_exp: int) -> None:
+        """
+        トークン検証・セッション同期結果をキャッシュ（トークンの有効期限を超えない範囲）
+        
+        Args:
+            cache_key: Access TokenのSHA-256ダイジェスト
+            result: 検証・同期結果
+            token_exp: Access Tokenの有効期限（UNIX時刻）
+        """
+        if self.validation_cache_ttl <= 0:
+            return
+        
+        expires_at = min(time.time() + self.validation_cache_ttl, token_exp)
+        self._validation_cache[cache_key] = (expires_at, result)
+        self._validation_cache.move_to_end(cache_key)
+        
+        while len(self._validation_cache) > self.validation_cache_size:
+            self._validation_cache.popitem(last=False)
+    
+    def invalidate_validation_cache(self, session_id: Optional[str] = None, user_id: Optional[str] = None) -> None:
+        """
+        セッション無効化時に該当する検証結果・リフレッシュ結果・Refresh Tokenのキャッシュを破棄
+        DatabaseManager のセッション無効化リスナーとして登録し、どの経路の無効化でも呼び出される
+        session_id, user_id とも未指定の場合は全て破棄する（期限切れセッションの一括無効化時）
+        
+        Args:
+            session_id: 対象のセッションID
+            user_id: 対象のユーザーID（全セッション無効化時）
+        """
+        if session_id is None and user_id is None:
+            self._validation_cache.clear()
+            self._recent_refreshes.clear()
+            self._refresh_token_cache.clear()
+            return
+        
+        stale_keys = [
+            key for key, (_, result) in self._validation_cache.items()
+            if result['session'].session_id == session_id or result['session'].user_id == user_id
+        ]
+        for key in stale_keys:
+            del self._validation_cache[key]
+        
+        # 無効化されたセッションの新しいトークンを再配布しないよう、リフレッシュ結果も破棄
+        stale_refresh_keys = [
+            key for key, (_, sid, uid, _) in self._recent_refreshes.items()
+            if sid == session_id or uid == user_id
+        ]
+        for key in stale_refresh_keys:
+            del self._recent_refreshes[key]
+        
+        # 復号済みRefresh Tokenはセッション単位でのみ保持しているため、ユーザー単位の無効化時は全て破棄
+        if user_id is not None:
+            self._refresh_token_cache.clear()
+        elif session_id is not None:
+            self._refresh_token_cache.pop(session_id, None)
+    
     async def update_session_tokens(self, session_id: str, new_access_token: str, 
                                   new_id_token: Optional[str] = None, 
                                   new_refresh_token: Optional[str] = None,
@@ -611,51 +1158,18 @@ class CognitoTokenService:
             Dict: 更新結果
         """
         try:
-            import hashlib
-            from encryption_utils import encryption_utils
-            
             # 新しい有効期限を計算
-            new_expires_at = datetime.utcnow() + timedelta(seconds=expires_in)
-            
-            # トークンをハッシュ化
-            access_token_hash = hashlib.sha256(new_access_token.encode()).hexdigest()
-            id_token_hash = hashlib.sha256(new_id_token.encode()).hexdigest() if new_id_token else None
-            refresh_token_hash = hashlib.sha256(new_refresh_token.encode()).hexdigest() if new_refresh_token else None
+            current_time = datetime.utcnow()
+            new_expires_at = current_time + timedelta(seconds=expires_in)
             
-            # Refresh Tokenを暗号化
-            encrypted_refresh_token = None
-            if new_refresh_token:
-                try:
-                    encrypted_refresh_token = encryption_utils.encrypt_token(new_refresh_token)
-                except Exception as e:
-                    logger.error(f"新しいRefresh Token暗号化エラー: {e}")
+            params = self._build_token_update_params(
+                session_id, new_access_token, new_id_token, new_refresh_token, new_expires_at, current_time
+            )
             
             # データベースを更新
             async with db_manager.pool.acquire() as conn:
                 async with conn.cursor() as cursor:
-                    # 更新するフィールドを動的に構築
-                    update_fields = ["access_token_hash = %s", "expires_at = %s", "last_activity = %s"]
-                    update_values = [access_token_hash, new_expires_at, datetime.utcnow()]
-                    
-                    if id_token_hash:
-                        update_fields.append("id_token_hash = %s")
-                        update_values.append(id_token_hash)
-                    
-                    if refresh_token_hash:
-                        update_fields.append("refresh_token_hash = %s")
-                        update_values.append(refresh_token_hash)
-                    
-                    if encrypted_refresh_token:
-                        update_fields.append("encrypted_refresh_token = %s")
-                        update_values.append(encrypted_refresh_token)
-                    
-                    update_values.append(session_id)
-                    
-                    await cursor.execute(f"""
-                        UPDATE user_sessions 
-                        SET {', '.join(update_fields)}
-                        WHERE session_id = %s AND is_active = TRUE
-                    """, update_values)
+                    await cursor.execute(SESSION_TOKEN_UPDATE_SQL, params)
                     
                     if cursor.rowcount == 0:
                         return {
@@ -664,7 +1178,14 @@ class CognitoTokenService:
                             'message': 'セッションが見つかりません。'
                         }
             
-            logger.info(f"セッショントークンを更新しました: {session_id}")
+            # 古いトークンで参照したセッションをキャッシュから破棄
+            db_manager.invalidate_cached_session(session_id=session_id)
+            
+            # ローテーションされたRefresh Tokenでキャッシュを更新
+            if new_refresh_token:
+                self._cache_refresh_token(session_id, new_refresh_token)
+            
+            logger.info("セッショントークンを更新しました: %s", session_id)
             
             return {
                 'success': True,
@@ -673,13 +1194,48 @@ class CognitoTokenService:
             }
             
         except Exception as e:
-            logger.error(f"セッショントークン更新エラー: {e}")
+            logger.error("セッショントークン更新エラー: %s", e)
             return {
                 'success': False,
                 'error': 'update_error',
                 'message': 'セッショントークン更新中にエラーが発生しました。'
             }
     
+    def _build_token_update_params(self, session_id: str, new_access_token: str,
+                                   new_id_token: Optional[str], new_refresh_token: Optional[str],
+                                   new_expires_at: datetime, current_time: datetime) -> Tuple:
+        """
+        セッショントークン更新SQLのパラメータを構築（トークンのハッシュ化・暗号化）
+        
+        Args:
+            session_id: セッションID
+            new_access_token: 新しいAccess Token
+            new_id_token: 新しいID Token
+            new_refresh_token: 新しいRefresh Token
+            new_expires_at: 新しい有効期限
+            current_time: 現在時刻
+            
+        Returns:
+            Tuple: SESSION_TOKEN_UPDATE_SQL のパラメータ
+        """
+        # Refresh Tokenを暗号化
+        encrypted_refresh_token = None
+        if new_refresh_token:
+            try:
+                encrypted_refresh_token = encryption_utils.encrypt_token(new_refresh_token)
+            except Exception as e:
+                logger.error("新しいRefresh Token暗号化エラー: %s", e)
+        
+        return (
+            token_digest(new_access_token),
+            _hash_token(new_id_token),
+            _hash_token(new_refresh_token),
+            encrypted_refresh_token,
+            new_expires_at,
+            current_time,
+            session_id
+        )
+    
     async def get_token_expiry_info(self, access_token: str) -> Dict[str, Any]:
         """
         トークンの有効期限情報を取得
@@ -712,19 +1268,16 @@ class CognitoTokenService:
                     'message': 'トークンに有効期限情報がありません。'
                 }
             
-            exp_datetime = datetime.utcfromtimestamp(exp_timestamp)
-            iat_datetime = datetime.utcfromtimestamp(iat_timestamp) if iat_timestamp else None
-            current_time = datetime.utcnow()
+            now = int(time.time())
             
             # 残り時間を計算
-            time_remaining = exp_datetime - current_time
-            seconds_remaining = max(0, int(time_remaining.total_seconds()))
+            seconds_remaining = max(0, int(exp_timestamp) - now)
             
             return {
                 'success': True,
-                'issued_at': iat_datetime.isoformat() if iat_datetime else None,
-                'expires_at': exp_datetime.isoformat(),
-                'current_time': current_time.isoformat(),
+                'issued_at': datetime.utcfromtimestamp(iat_timestamp).isoformat() if iat_timestamp else None,
+                'expires_at': datetime.utcfromtimestamp(exp_timestamp).isoformat(),
+                'current_time': datetime.utcfromtimestamp(now).isoformat(),
                 'seconds_remaining': seconds_remaining,
                 'is_expired': seconds_remaining == 0,
                 'needs_refresh': seconds_remaining < 300,  # 5分以内
@@ -732,16 +1285,165 @@ class CognitoTokenService:
             }
             
         except Exception as e:
-            logger.error(f"トークン有効期限情報取得エラー: {e}")
+            logger.error("トークン有効期限情報取得エラー: %s", e)
             return {
                 'success': False,
                 'error': 'expiry_check_error',
                 'message': 'トークン有効期限情報取得中にエラーが発生しました。'
             }
     
-    async def _auto_refresh_session_tokens(self, session: UserSession, ip_address: Optional[str] = None) -> Dict[str, Any]:
+    def _token_state(self, exp: int) -> str:
+        """
+        Access Tokenの有効期限から状態を判定
+        
+        Args:
+            exp: トークンの有効期限（UNIX時刻）
+            
+        Returns:
+            str: 'fresh'（有効）、'stale'（期限間近）、'expired'（期限切れ）
+        """
+        remaining = exp - time.time()
+        if remaining <= 0:
+            return 'expired'
+        if remaining <= self.refresh_stale_window:
+            return 'stale'
+        return 'fresh'
+    
+    def _schedule_background_refresh(self, session: UserSession, ip_address: Optional[str], token_key: bytes) -> None:
+        """
+        期限間近のトークンのリフレッシュをバックグラウンドで開始
+        結果は更新前トークンに紐付けて保存され、次のリクエストで新しいトークンとして返される
+        
+        Args:
+            session: ユーザーセッション
+            ip_address: クライアントのIPアドレス
+            token_key: 更新前Access TokenのSHA-256
+        """
+        session_id = session.session_id
+        if session_id in self._background_refreshes or session_id in self._refresh_inflight:
+            return
+        
+        task = asyncio.create_task(self._auto_refresh_session_tokens(session, ip_address, token_key))
+        self._background_refreshes[session_id] = task
+        task.add_done_callback(lambda _: self._background_refreshes.pop(session_id, None))
+    
+    async def _auto_refresh_session_tokens(self, session: UserSession, ip_address: Optional[str] = None,
+                                           token_key: Optional[bytes] = None) -> Dict[str, Any]:
         """
         セッションのトークンを自動リフレッシュ
+        同一セッションへの同時リフレッシュは1回のCognito呼び出しにまとめる
+        
+        Args:
+            session: ユーザーセッション
+            ip_address: クライアントのIPアドレス
+            token_key: 更新前Access TokenのSHA-256（指定時は結果を保存し、同じトークンからの再リフレッシュを防ぐ）
+            
+        Returns:
+            Dict: リフレッシュ結果
+        """
+        session_id = session.session_id
+        
+        # 実行中のリフレッシュがあれば、その結果を待って再利用
+        inflight = self._refresh_inflight.get(session_id)
+        if inflight is not None:
+            return dict(await asyncio.shield(inflight))
+        
+        future = asyncio.get_running_loop().create_future()
+        self._refresh_inflight[session_id] = future
+        try:
+            # 直前に別のリクエストが同じトークンをリフレッシュ済みであれば、その結果を返す
+            result = self._get_recent_refresh(token_key) if token_key else None
+            if result is None:
+                result = await self._refresh_session_tokens(session, ip_address)
+                if result['success'] and token_key:
+                    self._store_recent_refresh(token_key, session, result)
+            
+            future.set_result(result)
+            return dict(result)
+        finally:
+            if not future.done():
+                future.set_result({
+                    'success': False,
+                    'error': 'auto_refresh_error',
+                    'message': '自動トークンリフレッシュ中にエラーが発生しました。'
+                })
+            del self._refresh_inflight[session_id]
+    
+    def _get_recent_refresh(self, token_key: bytes) -> Optional[Dict[str, Any]]:
+        """
+        直近の自動リフレッシュ結果を取得（新しいAccess Tokenが有効な間のみ）
+        
+        Args:
+            token_key: 更新前Access TokenのSHA-256
+            
+        Returns:
+            Optional[Dict]: リフレッシュ結果
+        """
+        entry = self._recent_refreshes.get(token_key)
+        if entry is None:
+            return None
+        
+        expires_at, _, _, result = entry
+        if time.time() >= expires_at - self.jwt_leeway:
+            del self._recent_refreshes[token_key]
+            return None
+        
+        return result
+    
+    async def _verify_superseded_token(self, access_token: str) -> bool:
+        """
+        リフレッシュ済みの更新前Access Tokenを検証
+        署名・issuer・client_idを確認し、期限切れは recent_refresh_grace 以内のみ許容する
+        
+        Args:
+            access_token: 提示された更新前Access Token
+            
+        Returns:
+            bool: リフレッシュ結果を引き継げる場合True
+        """
+        if len(access_token) > MAX_TOKEN_LENGTH or access_token.count('.') != 2:
+            return False
+        
+        try:
+            parsed_token = _parse_jwt(access_token)
+            await self.get_jwks()
+            public_key = self.public_keys_by_kid.get(parsed_token[0].get('kid'))
+            if not public_key:
+                return False
+            
+            payload = self._decode_rs256(
+                parsed_token,
+                public_key,
+                self.issuer,
+                ["exp", "iat", "sub", "token_use", "client_id"],
+                exp_leeway=max(self.jwt_leeway, self.recent_refresh_grace)
+            )
+        except jwt.InvalidTokenError:
+            return False
+        except Exception as e:
+            logger.error("更新前Access Token検証エラー: %s", e)
+            return False
+        
+        return payload.get('client_id') == self.client_id and payload.get('token_use') == 'access'
+    
+    def _store_recent_refresh(self, token_key: bytes, session: UserSession, result: Dict[str, Any]) -> None:
+        """
+        自動リフレッシュ結果を保存（上限を超えた場合は古いものから削除）
+        
+        Args:
+            token_key: 更新前Access TokenのSHA-256
+            session: ユーザーセッション
+            result: リフレッシュ結果
+        """
+        expires_at = time.time() + result.get('expires_in', 3600)
+        self._recent_refreshes[token_key] = (expires_at, session.session_id, session.user_id, result)
+        self._recent_refreshes.move_to_end(token_key)
+        while len(self._recent_refreshes) > self.validation_cache_size:
+            self._recent_refreshes.popitem(last=False)
+    
+    async def _refresh_session_tokens(self, session: UserSession, ip_address: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Refresh Tokenでセッションのトークンを更新し、DBに保存
         
         Args:
             session: ユーザーセッション
@@ -762,8 +1464,10 @@ class CognitoTokenService:
             # 注意: セキュリティ上、Refresh Tokenは暗号化して保存すべき
             # ここでは簡略化のため、セッションテーブルに暗号化されたRefresh Tokenを保存する想定
             
-            # データベースから暗号化されたRefresh Tokenを取得
-            refresh_token = await self._get_encrypted_refresh_token(session.session_id)
+            # 暗号化されたRefresh Tokenを取得（セッション取得時に読み込み済みであれば再SELECTしない）
+            refresh_token = await self._get_encrypted_refresh_token(
+                session.session_id, getattr(session, 'encrypted_refresh_token', None)
+            )
             if not refresh_token:
                 return {
                     'success': False,
@@ -786,8 +1490,10 @@ class CognitoTokenService:
             )
             
             if update_result['success']:
+                self._maybe_purge_sessions()
+                
                 # 自動リフレッシュログ
-                await logging_service.log_cognito_session_operation(
+                logging_service.queue_cognito_session_operation(
                     "cognito_user", "auto_refresh", "success",
                     {
                         "session_id": session.session_id,
@@ -801,19 +1507,141 @@ class CognitoTokenService:
                     'new_access_token': refresh_result['access_token'],
                     'new_id_token': refresh_result.get('id_token'),
                     'expires_in': refresh_result.get('expires_in', 3600),
+                    'expires_at': update_result['expires_at'],
                     'message': 'トークンを自動リフレッシュしました。'
                 }
             else:
                 return update_result
                 
         except Exception as e:
-            logger.error(f"自動トークンリフレッシュエラー: {e}")
+            logger.error("自動トークンリフレッシュエラー: %s", e)
             return {
                 'success': False,
                 'error': 'auto_refresh_error',
                 'message': '自動トークンリフレッシュ中にエラーが発生しました。'
             }
     
+    async def refresh_many(self, sessions: List[UserSession], concurrency: int = 32,
+                           ip_address: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        複数セッションのトークンを並行してリフレッシュし、DB更新をまとめて行う
+        定期処理や管理操作で多数のセッションを一括更新する場合に使用
+        
+        Args:
+            sessions: 対象のユーザーセッション
+            concurrency: Cognitoへの同時リクエスト数の上限
+            ip_address: 操作元のIPアドレス
+            
+        Returns:
+            List[Dict]: セッションごとのリフレッシュ結果（sessions と同じ順序）
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def refresh_one(session: UserSession) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+            """(確定した結果, DB保存が必要なCognitoのリフレッシュ結果) を返す"""
+            # 実行中の自動リフレッシュがあれば、その結果を再利用（DB更新済み）
+            inflight = self._refresh_inflight.get(session.session_id)
+            if inflight is not None:
+                return dict(await asyncio.shield(inflight)), None
+            
+            async with semaphore:
+                refresh_token = await self._get_encrypted_refresh_token(
+                    session.session_id, getattr(session, 'encrypted_refresh_token', None)
+                )
+                if not refresh_token:
+                    return {
+                        'success': False,
+                        'error': 'refresh_token_not_found',
+                        'message': '暗号化されたRefresh Tokenが見つかりません。'
+                    }, None
+                
+                refresh_result = await self.refresh_tokens(refresh_token, ip_address)
+                if not refresh_result['success']:
+                    return refresh_result, None
+                return None, refresh_result
+        
+        outcomes = await asyncio.gather(*[refresh_one(session) for session in sessions], return_exceptions=True)
+        
+        results: List[Dict[str, Any]] = []
+        updates = []
+        current_time = datetime.utcnow()
+        for session, outcome in zip(sessions, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error("一括トークンリフレッシュエラー: %s", outcome)
+                results.append({
+                    'success': False,
+                    'error': 'auto_refresh_error',
+                    'message': '自動トークンリフレッシュ中にエラーが発生しました。'
+                })
+                continue
+            
+            result, refresh_result = outcome
+            if refresh_result:
+                expires_in = refresh_result.get('expires_in', 3600)
+                new_expires_at = current_time + timedelta(seconds=expires_in)
+                updates.append((len(results), session, refresh_result, self._build_token_update_params(
+                    session.session_id,
+                    refresh_result['access_token'],
+                    refresh_result.get('id_token'),
+                    refresh_result.get('refresh_token'),
+                    new_expires_at,
+                    current_time
+                )))
+                result = {
+                    'success': True,
+                    'new_access_token': refresh_result['access_token'],
+                    'new_id_token': refresh_result.get('id_token'),
+                    'expires_in': expires_in,
+                    'expires_at': new_expires_at.isoformat(),
+                    'message': 'トークンを自動リフレッシュしました。'
+                }
+            results.append(result)
+        
+        if not updates:
+            return results
+        
+        # Cognitoから取得したトークンを1回のexecutemanyでまとめて保存
+        try:
+            async with db_manager.pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.executemany(SESSION_TOKEN_UPDATE_SQL, [update[3] for update in updates])
+        except Exception as e:
+            logger.error("セッショントークン一括更新エラー: %s", e)
+            for index, _, _, _ in updates:
+                results[index] = {
+                    'success': False,
+                    'error': 'update_error',
+                    'message': 'セッショントークン更新中にエラーが発生しました。'
+                }
+            return results
+        
+        for _, session, refresh_result, _ in updates:
+            db_manager.invalidate_cached_session(session_id=session.session_id)
+            if refresh_result.get('refresh_token'):
+                self._cache_refresh_token(session.session_id, refresh_result['refresh_token'])
+            logging_service.queue_cognito_session_operation(
+                "cognito_user", "batch_refresh", "success",
+                {
+                    "session_id": session.session_id,
+                    "expires_in": refresh_result.get('expires_in', 3600)
+                },
+                session.user_id, ip_address
+            )
+        
+        return results
+    
+    def _maybe_purge_sessions(self) -> None:
+        """
+        一定確率で無効化済みセッションの削除をバックグラウンドで開始
+        通常は SessionManager の定期クリーンアップが削除するため、ここでは待機しない
+        """
+        if random.random() >= SESSION_PURGE_PROBABILITY:
+            return
+        if self._purge_task is not None and not self._purge_task.done():
+            return
+        
+        self._purge_task = asyncio.create_task(db_manager.purge_inactive_sessions())
+    
     async def _auto_extend_session(self, session: UserSession, ip_address: Optional[str] = None) -> Dict[str, Any]:
         """
         セッションを自動延長
@@ -826,10 +1654,10 @@ class CognitoTokenService:
             Dict: 延長結果
         """
         try:
-            # セッションが最近アクティブだった場合のみ自動延長
-            last_activity_threshold = datetime.utcnow() - timedelta(hours=1)  # 1時間以内にアクティブ
+            # セッションが最近アクティブだった場合のみ自動延長（1時間以内にアクティブ）
+            now_ts = int(time.time())
             
-            if session.last_activity < last_activity_threshold:
+            if now_ts - session.last_activity_ts > AUTO_EXTEND_ACTIVITY_WINDOW:
                 return {
                     'success': False,
                     'error': 'session_too_old',
@@ -842,7 +1670,7 @@ class CognitoTokenService:
             
             if extension_result['success']:
                 # 自動延長ログ
-                await logging_service.log_cognito_session_operation(
+                logging_service.queue_cognito_session_operation(
                     "cognito_user", "auto_extend", "success",
                     {
                         "session_id": session.session_id,
@@ -852,57 +1680,77 @@ class CognitoTokenService:
                     session.user_id, ip_address
                 )
                 
-                logger.info(f"セッションを自動延長しました: {session.session_id}")
+                logger.info("セッションを自動延長しました: %s", session.session_id)
             
             return extension_result
             
         except Exception as e:
-            logger.error(f"セッション自動延長エラー: {e}")
+            logger.error("セッション自動延長エラー: %s", e)
             return {
                 'success': False,
                 'error': 'auto_extend_error',
                 'message': 'セッション自動延長中にエラーが発生しました。'
             }
     
-    async def _get_encrypted_refresh_token(self, session_id: str) -> Optional[str]:
+    async def _get_encrypted_refresh_token(self, session_id: str,
+                                           encrypted_token: Optional[str] = None) -> Optional[str]:
         """
         暗号化されたRefresh Tokenを取得
         
         Args:
             session_id: セッションID
+            encrypted_token: 取得済みの暗号化Refresh Token（指定時はDBを参照しない）
             
         Returns:
             Optional[str]: 復号化されたRefresh Token
         """
+        cached = self._refresh_token_cache.get(session_id)
+        if cached:
+            expires_at, refresh_token = cached
+            if time.time() < expires_at:
+                self._refresh_token_cache.move_to_end(session_id)
+                return refresh_token
+            del self._refresh_token_cache[session_id]
+        
         try:
-            from encryption_utils import encryption_utils
-            
-            async with db_manager.pool.acquire() as conn:
-                async with conn.cursor() as cursor:
-                    await cursor.execute("""
-                        SELECT encrypted_refresh_token 
-                        FROM user_sessions 
-                        WHERE session_id = %s AND is_active = TRUE
-                    """, (session_id,))
-                    
-                    row = await cursor.fetchone()
-                    if row and row[0]:
-                        encrypted_token = row[0]
-                        
-                        # 暗号化されたトークンを復号化
-                        try:
-                            decrypted_token = encryption_utils.decrypt_token(encrypted_token)
-                            return decrypted_token
-                        except Exception as e:
-                            logger.error(f"Refresh Token復号化エラー: {e}")
-                            return None
-                    
+            if not encrypted_token:
+                async with db_manager.pool.acquire() as conn:
+                    async with conn.cursor() as cursor:
+                        await cursor.execute(ENCRYPTED_REFRESH_TOKEN_SELECT_SQL, (session_id,))
+                        row = await cursor.fetchone()
+                
+                if not row or not row[0]:
                     return None
-                    
+                encrypted_token = row[0]
+                
         except Exception as e:
-            logger.error(f"暗号化Refresh Token取得エラー: {e}")
+            logger.error("暗号化Refresh Token取得エラー: %s", e)
             return None
+        
+        # 暗号化されたトークンを復号化（DB接続は返却済み）
+        try:
+            decrypted_token = encryption_utils.decrypt_token(encrypted_token)
+            self._cache_refresh_token(session_id, decrypted_token)
+            return decrypted_token
+        except Exception as e:
+            logger.error("Refresh Token復号化エラー: %s", e)
+            return None
+    
+    def _cache_refresh_token(self, session_id: str, refresh_token: str) -> None:
+        """
+        復号済みRefresh Tokenをキャッシュ（上限を超えた場合は古いものから削除）
+        
+        Args:
+            session_id: セッションID
+            refresh_token: Refresh Token
+        """
+        self._refresh_token_cache[session_id] = (time.time() + self.refresh_token_cache_ttl, refresh_token)
+        self._refresh_token_cache.move_to_end(session_id)
+        
+        while len(self._refresh_token_cache) > self.refresh_token_cache_size:
+            self._refresh_token_cache.popitem(last=False)
 
 
 # グローバルインスタンス
 cognito_token_service = CognitoTokenService()
+db_manager.add_session_invalidation_listener(cognito_token_service.invalidate_validation_cache)
@@ -2,19 +2,22 @@
 pytest設定とフィクスチャ
 """
 import pytest
+import pytest_asyncio
 import asyncio
 from test_database_setup import test_db_manager, setup_test_db, cleanup_test_db, teardown_test_db
 
 
 @pytest.fixture(scope="session")
-def event_loop():
-    """セッション全体で使用するイベントループ"""
-    loop = asyncio.new_event_loop()
-    yield loop
-    loop.close()
+def event_loop_policy():
+    """セッション全体のイベントループポリシー（本番と同じ uvloop を優先）"""
+    try:
+        import uvloop
+        return uvloop.EventLoopPolicy()
+    except ImportError:
+        return asyncio.DefaultEventLoopPolicy()
 
 
-@pytest.fixture(scope="session", autouse=True)
+@pytest_asyncio.fixture(scope="session", autouse=True)
 async def setup_test_database():
     """テストセッション開始時にデータベースをセットアップ"""
     await setup_test_db()
@@ -22,14 +25,17 @@ async def setup_test_database():
     await teardown_test_db()
 
 
-@pytest.fixture(autouse=True)
-async def cleanup_database():
+@pytest_asyncio.fixture(autouse=True)
+async def cleanup_database(request):
     """各テスト後にデータベースをクリーンアップ"""
     yield
+    # モックのみを使うテストではクリーンアップのDELETEを発行しない
+    if request.node.get_closest_marker("no_db") is not None:
+        return
     await cleanup_test_db()
 
 
-@pytest.fixture
+@pytest_asyncio.fixture(scope="session")
 async def db_manager():
     """テスト用データベースマネージャーを提供"""
     return test_db_manager
\ No newline at end of file
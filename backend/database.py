@@ -4,25 +4,95 @@
 import os
 import logging
 import json
-from typing import Optional, List, Dict, Any
+import hashlib
+import uuid
+from typing import Optional, List, Dict, Any, Tuple, Callable, Awaitable
+from collections import OrderedDict
+from cachetools import TTLCache
 from datetime import datetime, timedelta
 import asyncio
-import aiomysql
+import threading
+import time
+import asyncmy
+from asyncmy.constants import CLIENT
 from dotenv import load_dotenv
 from models import User, UserSession, AuthLog, UserCreate, SessionCreate, AuthLogCreate
+from encryption_utils import encryption_utils
+import boto3
+from botocore.exceptions import ClientError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-import boto3
-import json
-from botocore.exceptions import ClientError
+
+def _json_dumps(value: Any) -> str:
+    """JSONカラムに保存する文字列を生成（orjsonがあれば使用）"""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(value)
+
+
+def _json_loads(value):
+    """JSONカラムの値をパース（orjsonがあれば使用）"""
+    if orjson is not None:
+        return orjson.loads(value)
+    return json.loads(value)
+
+
+# Secrets Manager の取得結果キャッシュ（(secret_name, region_name) -> (値, 取得時刻)）
+SECRET_CACHE_TTL = int(os.getenv('SECRET_CACHE_TTL', 600))
+_secret_cache: Dict[tuple, tuple] = {}
+_secrets_clients: Dict[str, Any] = {}
+_secret_cache_lock = threading.Lock()
+
+
+def _get_secrets_client(region_name: str):
+    """
+    リージョンごとのSecrets Managerクライアントを取得（初回のみ作成）
+    
+    Args:
+        region_name: リージョン名
+        
+    Returns:
+        Secrets Managerクライアント
+    """
+    client = _secrets_clients.get(region_name)
+    if client is None:
+        session = boto3.session.Session()
+        client = session.client(
+            service_name='secretsmanager',
+            region_name=region_name
+        )
+        _secrets_clients[region_name] = client
+    return client
+
+
+def invalidate_secret_cache(secret_name: Optional[str] = None) -> None:
+    """
+    シークレットのキャッシュを破棄（ローテーション時に使用）
+    
+    Args:
+        secret_name: 破棄するシークレット名（未指定時はすべて破棄）
+    """
+    with _secret_cache_lock:
+        if secret_name is None:
+            _secret_cache.clear()
+            return
+        for key in [key for key in _secret_cache if key[0] == secret_name]:
+            del _secret_cache[key]
+
 
 # AWS Secrets Managerからシークレットを取得する関数
 def get_aws_secret(secret_name: str, region_name: str = "ap-northeast-1"):
     """
     AWS Secrets Managerから値を取得する関数
+    取得結果は SECRET_CACHE_TTL 秒間プロセス内にキャッシュする
     
     Args:
         secret_name: Secrets Managerで作成したシークレットの名前
@@ -32,14 +102,31 @@ def get_aws_secret(secret_name: str, region_name: str = "ap-northeast-1"):
         dict: シークレットのキーと値の辞書 (JSONの場合)
         str:  単なる文字列として保存されている場合は文字列
     """
+    cache_key = (secret_name, region_name)
+    with _secret_cache_lock:
+        cached = _secret_cache.get(cache_key)
+        if cached and time.monotonic() - cached[1] < SECRET_CACHE_TTL:
+            value = cached[0]
+            return dict(value) if isinstance(value, dict) else value
+        
+        client = _get_secrets_client(region_name)
+        value = _fetch_aws_secret(client, secret_name)
+        _secret_cache[cache_key] = (value, time.monotonic())
+    
+    return dict(value) if isinstance(value, dict) else value
 
-    # セッションの作成
-    session = boto3.session.Session()
-    client = session.client(
-        service_name='secretsmanager',
-        region_name=region_name
-    )
 
+def _fetch_aws_secret(client, secret_name: str):
+    """
+    Secrets Managerからシークレットを取得してデコード
+    
+    Args:
+        client: Secrets Managerクライアント
+        secret_name: シークレット名
+        
+    Returns:
+        dict | str | bytes: シークレットの値
+    """
     try:
         get_secret_value_response = client.get_secret_value(
             SecretId=secret_name
@@ -64,6 +151,455 @@ def get_aws_secret(secret_name: str, region_name: str = "ap-northeast-1"):
         return get_secret_value_response['SecretBinary']
 
 
+# テーブル作成DDL（起動時に1回の往復でまとめて実行する）
+SCHEMA_SQL = ";\n".join([
+    # Cognito中心管理ユーザーテーブル（最小限の情報のみ）
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        user_id VARCHAR(36) PRIMARY KEY,
+        cognito_user_sub VARCHAR(255) UNIQUE NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        last_login TIMESTAMP NULL,
+        is_active BOOLEAN DEFAULT TRUE,
+        email_hash CHAR(64) NULL,
+    
+        INDEX idx_cognito_user_sub (cognito_user_sub),
+        INDEX idx_created_at (created_at),
+        UNIQUE INDEX idx_email_hash (email_hash)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+""",
+    # Cognito統合セッションテーブル
+    """
+    CREATE TABLE IF NOT EXISTS user_sessions (
+        session_id VARCHAR(36) PRIMARY KEY,
+        user_id VARCHAR(36) NOT NULL,
+        cognito_user_sub VARCHAR(255) NOT NULL,
+        access_token_hash BINARY(32) NOT NULL,
+        previous_access_token_hash BINARY(32) NULL,
+        id_token_hash BINARY(32) NULL,
+        refresh_token_hash BINARY(32) NULL,
+        encrypted_refresh_token TEXT NULL,
+        expires_at TIMESTAMP NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        is_active BOOLEAN DEFAULT TRUE,
+        client_ip VARCHAR(45) NULL,
+        user_agent TEXT NULL,
+    
+        FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+        INDEX idx_user_id (user_id),
+        INDEX idx_cognito_user_sub (cognito_user_sub),
+        INDEX idx_expires_at (expires_at),
+        INDEX idx_access_token_hash_active (access_token_hash, is_active),
+        INDEX idx_previous_access_token_hash_active (previous_access_token_hash, is_active),
+        INDEX idx_active_expires (is_active, expires_at)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+""",
+    # 認証ログテーブル（Cognito対応）
+    """
+    CREATE TABLE IF NOT EXISTS auth_logs (
+        log_id VARCHAR(36) PRIMARY KEY,
+        user_id VARCHAR(36) NULL,
+        email VARCHAR(255) NULL,
+        event_type VARCHAR(50) NOT NULL,
+        result VARCHAR(20) NOT NULL,
+        details JSON NULL,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        ip_address VARCHAR(45) NULL,
+    
+        FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE SET NULL,
+        INDEX idx_user_id (user_id),
+        INDEX idx_email (email),
+        INDEX idx_event_type (event_type),
+        INDEX idx_result (result),
+        INDEX idx_timestamp (timestamp)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+""",
+    # アプリケーションユーザーデータテーブル（ビジネスデータ管理）
+    """
+    CREATE TABLE IF NOT EXISTS app_user_data (
+        app_user_id VARCHAR(36) PRIMARY KEY,
+        cognito_sub VARCHAR(36) UNIQUE NOT NULL,
+        subscription_status ENUM('free', 'premium') DEFAULT 'free',
+        usage_count INT DEFAULT 0,
+        monthly_usage_count INT DEFAULT 0,
+        last_usage_reset TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        preferences JSON NULL,
+        profile_data JSON NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    
+        INDEX idx_subscription_status (subscription_status),
+        INDEX idx_created_at (created_at),
+        INDEX idx_usage_count (usage_count)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+""",
+])
+
+# 既存テーブルのマイグレーション要否を判定するため、対象カラム・インデックスの有無を1回で取得
+SCHEMA_PROBE_SQL = """
+    SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE()
+      AND (TABLE_NAME, COLUMN_NAME) IN (
+          ('users', 'email_hash'),
+          ('user_sessions', 'access_token_hash'),
+          ('user_sessions', 'previous_access_token_hash'),
+          ('user_sessions', 'id_token_hash'),
+          ('user_sessions', 'refresh_token_hash'),
+          ('user_sessions', 'encrypted_refresh_token'),
+          ('app_user_data', 'seconds_balance')
+      )
+    UNION ALL
+    SELECT DISTINCT TABLE_NAME, INDEX_NAME, 'index' FROM information_schema.STATISTICS
+    WHERE TABLE_SCHEMA = DATABASE()
+      AND (TABLE_NAME, INDEX_NAME) IN (
+          ('user_sessions', 'idx_active_expires'),
+          ('user_sessions', 'idx_access_token_hash_active'),
+          ('user_sessions', 'idx_access_token_hash'),
+          ('user_sessions', 'idx_is_active'),
+          ('app_user_data', 'idx_cognito_sub')
+      )
+"""
+
+def email_digest(email: str) -> str:
+    """
+    メールアドレスのSHA-256ハッシュ（16進文字列）を算出
+    
+    Args:
+        email: メールアドレス（大文字小文字・前後の空白は区別しない）
+        
+    Returns:
+        str: SHA-256ハッシュ
+    """
+    return hashlib.sha256(email.strip().lower().encode()).hexdigest()
+
+
+def token_digest(token: str) -> bytes:
+    """
+    トークンのSHA-256ダイジェストを算出
+    生のトークンをメモリに残さないよう、結果はキャッシュしない
+    
+    Args:
+        token: Access Token
+        
+    Returns:
+        bytes: SHA-256ダイジェスト（32バイト）
+    """
+    return hashlib.sha256(token.encode()).digest()
+
+
+# ユーザー・セッション取得時に読み込むカラム（モデルのフィールドに対応するもののみ）
+USER_COLUMNS = "user_id, cognito_user_sub, created_at, last_login, is_active"
+SESSION_COLUMNS = (
+    "session_id, user_id, cognito_user_sub, refresh_token_hash, encrypted_refresh_token, "
+    "expires_at, created_at, last_activity, is_active, client_ip, user_agent"
+)
+
+# リクエストごとに実行される参照SQL（呼び出しごとに組み立てず、同一の文字列を送る）
+USER_BY_COGNITO_SUB_SQL = f"SELECT {USER_COLUMNS} FROM users WHERE cognito_user_sub = %s LIMIT 1"
+USER_BY_ID_SQL = f"SELECT {USER_COLUMNS} FROM users WHERE user_id = %s"
+USER_BY_EMAIL_HASH_SQL = f"SELECT {USER_COLUMNS} FROM users WHERE email_hash = %s LIMIT 1"
+USER_INSERT_SQL = """
+    INSERT INTO users (user_id, cognito_user_sub, created_at, is_active)
+    VALUES (%s, %s, %s, %s)
+"""
+# メールアドレスのハッシュを指定ユーザーに付け替える（同じメールで再登録された場合は新しいユーザーに移す）
+USER_EMAIL_HASH_ASSIGN_SQL = """
+    UPDATE users SET email_hash = NULL WHERE email_hash = %s AND user_id <> %s;
+    UPDATE users SET email_hash = %s WHERE user_id = %s
+"""
+# リフレッシュでAccess Tokenを入れ替えた後も、有効期限内の旧トークンで同じセッションを引けるよう
+# 直前のトークンのハッシュも照合する（各カラムのインデックスを使うため UNION ALL で分ける）
+SESSION_BY_TOKEN_SQL = (
+    f"(SELECT {SESSION_COLUMNS} FROM user_sessions "
+    "WHERE access_token_hash = %s AND is_active = TRUE LIMIT 1) "
+    "UNION ALL "
+    f"(SELECT {SESSION_COLUMNS} FROM user_sessions "
+    "WHERE previous_access_token_hash = %s AND is_active = TRUE LIMIT 1) "
+    "LIMIT 1"
+)
+SESSION_BY_ID_SQL = (
+    f"SELECT {SESSION_COLUMNS} FROM user_sessions "
+    "WHERE session_id = %s AND is_active = TRUE"
+)
+
+# 残高を消費し、消費後の残高を同じ往復で返す
+# (接続は再利用されるため、該当行がない場合に前回の値が残らないよう最初に変数をクリア)
+BALANCE_DEDUCT_SQL = """
+    SET @new_balance = NULL;
+    UPDATE app_user_data 
+    SET seconds_balance = (@new_balance := GREATEST(0, seconds_balance - %s)),
+        usage_count = usage_count + 1,
+        monthly_usage_count = monthly_usage_count + 1,
+        updated_at = UTC_TIMESTAMP()
+    WHERE cognito_sub = %s;
+    SELECT @new_balance
+"""
+
+SESSION_INSERT_SQL = """
+    INSERT INTO user_sessions 
+    (session_id, user_id, cognito_user_sub, access_token_hash, id_token_hash, 
+     refresh_token_hash, encrypted_refresh_token, expires_at, created_at, last_activity, is_active, 
+     client_ip, user_agent)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+# ログイン時のセッション作成とログイン時刻の更新（どちらかが失敗した場合は両方とも反映しない）
+LOGIN_TRANSACTION_SQL = f"""
+    START TRANSACTION;
+    {SESSION_INSERT_SQL};
+    UPDATE users SET last_login = UTC_TIMESTAMP() WHERE user_id = %s;
+    COMMIT
+"""
+
+# Freeプランの残り時間（秒）。app_user_data作成時の初期値と月次リセット時の補充額
+FREE_SECONDS_BALANCE = 300.0
+
+# app_user_dataの取得カラム（返却するdictのキー順）
+APP_USER_DATA_COLUMNS = (
+    'app_user_id', 'cognito_sub', 'seconds_balance', 'subscription_status', 'usage_count',
+    'monthly_usage_count', 'last_usage_reset', 'preferences', 'profile_data',
+    'created_at', 'updated_at'
+)
+APP_USER_DATA_SELECT_SQL = f"SELECT {', '.join(APP_USER_DATA_COLUMNS)} FROM app_user_data"
+APP_USER_DATA_BY_APP_ID_SQL = f"{APP_USER_DATA_SELECT_SQL} WHERE app_user_id = %s"
+# 月次リセット（取得と同じ往復で実行する）
+# 前回リセットから月が変わっていれば、Freeプラン分(300秒)を下回っている残高を300秒まで補充
+# (購入分は持ち越すが、Free枠は毎月リセットという考え方で、最低300秒を保証)
+_APP_USER_DATA_MONTHLY_RESET_SQL = f"""
+    UPDATE app_user_data 
+    SET monthly_usage_count = 0, last_usage_reset = UTC_TIMESTAMP(),
+        seconds_balance = GREATEST(COALESCE(seconds_balance, 0), {FREE_SECONDS_BALANCE})
+    WHERE cognito_sub = %s
+      AND (YEAR(last_usage_reset) < YEAR(UTC_TIMESTAMP()) OR MONTH(last_usage_reset) < MONTH(UTC_TIMESTAMP()))
+"""
+APP_USER_DATA_BY_COGNITO_SUB_SQL = f"""
+    {_APP_USER_DATA_MONTHLY_RESET_SQL};
+    {APP_USER_DATA_SELECT_SQL} WHERE cognito_sub = %s
+"""
+# 使用統計に必要なカラムのみ取得（JSONカラムは読まない）
+USAGE_STATISTICS_SQL = f"""
+    {_APP_USER_DATA_MONTHLY_RESET_SQL};
+    SELECT usage_count, monthly_usage_count, subscription_status, last_usage_reset, created_at
+    FROM app_user_data WHERE cognito_sub = %s
+"""
+APP_USER_DATA_INSERT_SQL = """
+    INSERT INTO app_user_data 
+    (app_user_id, cognito_sub, subscription_status, usage_count, 
+     monthly_usage_count, seconds_balance, preferences, profile_data, created_at, updated_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+# データがなければ初期値で作成し、あれば指定カラムだけを更新する（事前のSELECTを不要にする）
+# パラメータは _app_user_data_upsert_params の後に各UPDATE句の値を続ける（app_user_idはサーバー側で採番）
+_APP_USER_DATA_UPSERT_PREFIX = f"""
+    INSERT INTO app_user_data 
+    (app_user_id, cognito_sub, subscription_status, usage_count, 
+     monthly_usage_count, seconds_balance, preferences, profile_data, created_at, updated_at)
+    VALUES (UUID(), %s, %s, %s, %s, {FREE_SECONDS_BALANCE}, %s, %s, UTC_TIMESTAMP(), UTC_TIMESTAMP())
+    ON DUPLICATE KEY UPDATE
+"""
+# JSONカラムは更新するトップレベルのキーだけをサーバー側で置き換え、更新後の値を同じ往復で返す
+# {value} には _json_set_expression で構築した式が入る
+APP_USER_PROFILE_UPSERT_SQL = _APP_USER_DATA_UPSERT_PREFIX + """
+        profile_data = {value},
+        updated_at = UTC_TIMESTAMP();
+    SELECT profile_data FROM app_user_data WHERE cognito_sub = %s
+"""
+APP_USER_PREFERENCES_UPSERT_SQL = _APP_USER_DATA_UPSERT_PREFIX + """
+        preferences = {value},
+        updated_at = UTC_TIMESTAMP();
+    SELECT preferences FROM app_user_data WHERE cognito_sub = %s
+"""
+APP_USER_USAGE_UPSERT_SQL = _APP_USER_DATA_UPSERT_PREFIX + """
+        usage_count = usage_count + %s,
+        monthly_usage_count = monthly_usage_count + %s,
+        updated_at = UTC_TIMESTAMP()
+"""
+APP_USER_SUBSCRIPTION_UPSERT_SQL = _APP_USER_DATA_UPSERT_PREFIX + """
+        subscription_status = %s,
+        updated_at = UTC_TIMESTAMP()
+"""
+# 予約した使用回数の一括加算用（VALUES句をすべてプレースホルダーにし、UPDATE句にパラメータを置かないことで
+# executemanyが1つの複数行INSERTに書き換える。加算値は各行の VALUES(usage_count) から取る）
+APP_USER_USAGE_BATCH_UPSERT_SQL = """
+    INSERT INTO app_user_data 
+    (app_user_id, cognito_sub, subscription_status, usage_count, 
+     monthly_usage_count, seconds_balance, preferences, profile_data, created_at, updated_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        usage_count = usage_count + VALUES(usage_count),
+        monthly_usage_count = monthly_usage_count + VALUES(monthly_usage_count),
+        updated_at = VALUES(updated_at)
+"""
+
+# app_user_data作成時の初期値
+DEFAULT_APP_USER_PREFERENCES = {
+    "language": "ja",
+    "theme": "light",
+    "notifications": True
+}
+DEFAULT_APP_USER_PROFILE = {
+    "display_name": "",
+    "avatar_url": "",
+    "timezone": "Asia/Tokyo"
+}
+_DEFAULT_APP_USER_PREFERENCES_JSON = _json_dumps(DEFAULT_APP_USER_PREFERENCES)
+_DEFAULT_APP_USER_PROFILE_JSON = _json_dumps(DEFAULT_APP_USER_PROFILE)
+
+
+def _row_to_user(row: tuple) -> User:
+    """USER_COLUMNS順の行からユーザーを構築"""
+    user_id, cognito_user_sub, created_at, last_login, is_active = row
+    return User(
+        user_id=user_id,
+        cognito_user_sub=cognito_user_sub,
+        created_at=created_at,
+        last_login=last_login,
+        is_active=is_active
+    )
+
+
+def _row_to_session(row: tuple, access_token: str) -> UserSession:
+    """SESSION_COLUMNS順の行からセッションを構築（トークン本体は保存していないため呼び出し元が渡す）"""
+    (session_id, user_id, cognito_user_sub, refresh_token_hash, encrypted_refresh_token,
+     expires_at, created_at, last_activity, is_active, client_ip, user_agent) = row
+    return UserSession(
+        session_id=session_id,
+        user_id=user_id,
+        cognito_user_sub=cognito_user_sub,
+        access_token=access_token,
+        refresh_token_hash=refresh_token_hash,
+        encrypted_refresh_token=encrypted_refresh_token,
+        expires_at=expires_at,
+        created_at=created_at,
+        last_activity=last_activity,
+        is_active=is_active,
+        client_ip=client_ip,
+        user_agent=user_agent
+    )
+
+
+def _row_to_app_user_data(row: tuple) -> dict:
+    """APP_USER_DATA_COLUMNS順の行からdictを構築（JSONカラムはパース済みで返す）"""
+    data = dict(zip(APP_USER_DATA_COLUMNS, row))
+    if data['preferences'] and isinstance(data['preferences'], str):
+        data['preferences'] = _json_loads(data['preferences'])
+    if data['profile_data'] and isinstance(data['profile_data'], str):
+        data['profile_data'] = _json_loads(data['profile_data'])
+    return data
+
+
+def _app_user_data_upsert_params(cognito_sub: str, subscription_status: str = 'free', usage_count: int = 0,
+                                 preferences: Optional[dict] = None, profile_data: Optional[dict] = None) -> tuple:
+    """
+    app_user_dataのUPSERT文で、行がない場合に作成する初期値のパラメータを構築
+    
+    Args:
+        cognito_sub: Cognito Sub
+        subscription_status: サブスクリプション状態
+        usage_count: 使用回数（月次使用回数も同じ値で作成）
+        preferences: 初期値に上書きする設定
+        profile_data: 初期値に上書きするプロフィール
+        
+    Returns:
+        tuple: _APP_USER_DATA_UPSERT_PREFIX のパラメータ
+    """
+    return (
+        cognito_sub,
+        subscription_status,
+        usage_count,
+        usage_count,
+        # 上書きがなければ直列化済みの初期値をそのまま使う
+        _json_dumps({**DEFAULT_APP_USER_PREFERENCES, **preferences})
+        if preferences else _DEFAULT_APP_USER_PREFERENCES_JSON,
+        _json_dumps({**DEFAULT_APP_USER_PROFILE, **profile_data})
+        if profile_data else _DEFAULT_APP_USER_PROFILE_JSON
+    )
+
+
+def _json_set_expression(column: str, updates: dict) -> Tuple[str, tuple]:
+    """
+    JSONカラムのトップレベルのキーを置き換える式とパラメータを構築
+    dict.update と同じく、入れ子のオブジェクトは丸ごと置き換え、値がNoneのキーはnullとして残す
+    
+    Args:
+        column: JSONカラム名
+        updates: 更新する項目
+        
+    Returns:
+        Tuple[str, tuple]: SQL式と、式中のプレースホルダーに対応するパラメータ
+    """
+    current = f"COALESCE({column}, JSON_OBJECT())"
+    if not updates:
+        return current, ()
+    
+    params = []
+    for key, value in updates.items():
+        params.append('$.' + _json_dumps(str(key)))
+        params.append(_json_dumps(value))
+    return f"JSON_SET({current}{', %s, CAST(%s AS JSON)' * len(updates)})", tuple(params)
+
+
+def _app_user_usage_batch_params(cognito_sub: str, increment: int, now: datetime) -> tuple:
+    """
+    APP_USER_USAGE_BATCH_UPSERT_SQL の1行分のパラメータを構築
+    
+    Args:
+        cognito_sub: Cognito Sub
+        increment: 加算する使用回数（行がない場合はこの値で作成）
+        now: 作成・更新時刻（UTC）
+        
+    Returns:
+        tuple: APP_USER_USAGE_BATCH_UPSERT_SQL のパラメータ
+    """
+    _, subscription_status, usage_count, monthly_usage_count, preferences, profile_data = (
+        _app_user_data_upsert_params(cognito_sub, usage_count=increment)
+    )
+    return (
+        str(uuid.uuid4()),
+        cognito_sub,
+        subscription_status,
+        usage_count,
+        monthly_usage_count,
+        FREE_SECONDS_BALANCE,
+        preferences,
+        profile_data,
+        now,
+        now
+    )
+
+
+# 記録の遅延・欠落を許容せず、その場でINSERTする認証ログのイベント種別
+SYNC_AUTH_LOG_EVENT_TYPES = frozenset({
+    'security_error',
+    'cognito_brute_force_attack',
+    'cognito_unauthorized_access',
+    'cognito_security_error',
+})
+
+# executemanyはINSERT ... VALUES (...) の形の文だけを1つの複数行INSERTに書き換える
+# （末尾のセミコロンやコメント、INSERT ... SET形式では1行ずつの実行になるため、この形を保つこと）
+AUTH_LOG_INSERT_SQL = """
+    INSERT INTO auth_logs 
+    (log_id, user_id, email, event_type, result, details, timestamp, ip_address)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+def _auth_log_params(log: AuthLog) -> tuple:
+    """認証ログのINSERTパラメータを構築（detailsはJSON文字列）"""
+    return (
+        log.log_id,
+        log.user_id,
+        log.email,
+        log.event_type,
+        log.result,
+        log.details,
+        log.timestamp,
+        log.ip_address
+    )
+
+
 class DatabaseManager:
     """データベース管理クラス"""
     
@@ -79,26 +615,85 @@ class DatabaseManager:
             self.port = int(secrets.get('port', 3306))        
 
         self.pool = None
+        self._init_runtime_state()
+    
+    def _init_runtime_state(self):
+        """プール以外の実行時状態（プール設定・書き込みバッファ等）を初期化"""
+        # コネクションプール設定（minsize 分は作成時に接続を確立してウォームアップする）
+        self.pool_minsize = int(os.getenv('DB_POOL_MINSIZE', 8))
+        self.pool_maxsize = int(os.getenv('DB_POOL_MAXSIZE', 32))
+        self.pool_recycle = int(os.getenv('DB_POOL_RECYCLE', 1800))
+        
+        # last_activity の更新をまとめて書き込むためのバッファ
+        self.activity_flush_interval = int(os.getenv('ACTIVITY_FLUSH_INTERVAL', 5))
+        self._pending_activity = set()
+        self._activity_flush_task = None
+        
+        # 認証ログの書き込みバッファ（上限を超えた分は破棄して件数のみ記録）
+        self.auth_log_queue_size = int(os.getenv('AUTH_LOG_QUEUE_SIZE', 10000))
+        self.auth_log_batch_size = int(os.getenv('AUTH_LOG_BATCH_SIZE', 500))
+        self.auth_log_flush_delay = int(os.getenv('AUTH_LOG_FLUSH_DELAY_MS', 50)) / 1000
+        self._pending_auth_logs: List[AuthLog] = []
+        self._auth_log_flush_task = None
+        self.dropped_auth_logs = 0
+        
+        # 使用回数の書き込みバッファ（cognito_sub -> 未書き込みの加算値、同一ユーザー分は合算して1行で更新）
+        self.usage_batch_size = int(os.getenv('USAGE_BATCH_SIZE', 500))
+        self.usage_flush_delay = int(os.getenv('USAGE_FLUSH_DELAY_MS', 50)) / 1000
+        self._pending_usage: Dict[str, int] = {}
+        self._usage_flush_task = None
+        
+        # 一括更新で1回のUPDATEにまとめる最大件数
+        self.bulk_update_batch_size = int(os.getenv('BULK_UPDATE_BATCH_SIZE', 1000))
+        
+        # セッション・ユーザー参照結果のキャッシュ（キー -> (有効期限, ID, モデル)）
+        self.lookup_cache_ttl = int(os.getenv('LOOKUP_CACHE_TTL', 30))
+        self.lookup_cache_size = int(os.getenv('LOOKUP_CACHE_SIZE', 10000))
+        self._session_cache: OrderedDict = OrderedDict()
+        self._session_cache_keys: Dict[str, bytes] = {}
+        self._user_cache: OrderedDict = OrderedDict()
+        self._user_cache_keys: Dict[str, str] = {}
+        self._inflight_lookups: Dict[Any, asyncio.Future] = {}
+        # 無効化のたびに進め、参照中に無効化された結果をキャッシュしない
+        self._lookup_cache_generation = 0
+        # 使用統計のキャッシュ（cognito_sub -> 統計）
+        self._usage_stats_cache = TTLCache(
+            maxsize=self.lookup_cache_size,
+            ttl=int(os.getenv('USAGE_STATS_CACHE_TTL', 60))
+        )
+        # セッション無効化時に呼び出すリスナー（上位層のキャッシュを無効化と同時に破棄する）
+        self._session_invalidation_listeners: List[Callable[[Optional[str], Optional[str]], None]] = []
     
     async def init_pool(self):
         """コネクションプールを初期化"""
         try:
-            self.pool = await aiomysql.create_pool(
+            self.pool = await asyncmy.create_pool(
                 host=self.host,
                 port=self.port,
                 user=self.user,
                 password=self.password,
-                db=self.database,
+                database=self.database,
                 charset='utf8mb4',
                 autocommit=True,
-                maxsize=10,
-                minsize=1
+                # スキーマ作成・マイグレーションを1回の往復で実行するため
+                client_flag=CLIENT.MULTI_STATEMENTS,
+                maxsize=self.pool_maxsize,
+                minsize=min(self.pool_minsize, self.pool_maxsize),
+                pool_recycle=self.pool_recycle,
+                echo=False
+            )
+            logger.info(
+                f"データベース接続プールを初期化しました "
+                f"(minsize={self.pool.minsize}, maxsize={self.pool.maxsize}, recycle={self.pool_recycle}s)"
             )
-            logger.info("データベース接続プールを初期化しました")
             
             # テーブルを作成
             await self._create_tables()
             
+            # last_activity のバッチ書き込みタスクを開始
+            if self._activity_flush_task is None or self._activity_flush_task.done():
+                self._activity_flush_task = asyncio.create_task(self._activity_flush_loop())
+            
         except Exception as e:
             logger.error(f"データベース接続プール初期化エラー: {e}")
             raise
@@ -107,117 +702,259 @@ class DatabaseManager:
         """必要なテーブルを作成（Cognito中心管理）"""
         async with self.pool.acquire() as conn:
             async with conn.cursor() as cursor:
-                # Cognito中心管理ユーザーテーブル（最小限の情報のみ）
-                await cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS users (
-                        user_id VARCHAR(36) PRIMARY KEY,
-                        cognito_user_sub VARCHAR(255) UNIQUE NOT NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                        last_login TIMESTAMP NULL,
-                        is_active BOOLEAN DEFAULT TRUE,
-                        
-                        INDEX idx_cognito_user_sub (cognito_user_sub),
-                        INDEX idx_created_at (created_at)
-                    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-                """)
+                # テーブル作成と既存スキーマの確認を1回の往復で実行
+                await cursor.execute(f"{SCHEMA_SQL};\n{SCHEMA_PROBE_SQL}")
+                existing = {
+                    (table_name, name): data_type
+                    for table_name, name, data_type in await self._drain_results(cursor)
+                }
                 
-                # Cognito統合セッションテーブル
-                await cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS user_sessions (
-                        session_id VARCHAR(36) PRIMARY KEY,
-                        user_id VARCHAR(36) NOT NULL,
-                        cognito_user_sub VARCHAR(255) NOT NULL,
-                        access_token_hash VARCHAR(255) NOT NULL,
-                        id_token_hash VARCHAR(255) NULL,
-                        refresh_token_hash VARCHAR(255) NULL,
-                        encrypted_refresh_token TEXT NULL,
-                        expires_at TIMESTAMP NOT NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                        is_active BOOLEAN DEFAULT TRUE,
-                        client_ip VARCHAR(45) NULL,
-                        user_agent TEXT NULL,
-                        
-                        FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
-                        INDEX idx_user_id (user_id),
-                        INDEX idx_cognito_user_sub (cognito_user_sub),
-                        INDEX idx_expires_at (expires_at),
-                        INDEX idx_access_token_hash (access_token_hash),
-                        INDEX idx_is_active (is_active)
-                    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-                """)
+                migrations = []
+                messages = []
+                
+                # トークンのハッシュを16進文字列からSHA-256ダイジェスト(BINARY(32))へ移行（既存テーブルの場合）
+                for column, nullability in (
+                    ('access_token_hash', 'NOT NULL'),
+                    ('id_token_hash', 'NULL'),
+                    ('refresh_token_hash', 'NULL'),
+                ):
+                    if existing.get(('user_sessions', column), 'binary') != 'binary':
+                        migrations += [
+                            f"ALTER TABLE user_sessions MODIFY {column} VARBINARY(255) {nullability}",
+                            f"UPDATE user_sessions SET {column} = UNHEX({column}) WHERE LENGTH({column}) = 64",
+                            f"ALTER TABLE user_sessions MODIFY {column} BINARY(32) {nullability}",
+                        ]
+                        messages.append(f"user_sessions.{column}をBINARY(32)に移行しました")
                 
                 # encrypted_refresh_tokenカラムを追加（既存テーブルの場合）
-                try:
-                    await cursor.execute("""
-                        ALTER TABLE user_sessions 
-                        ADD COLUMN encrypted_refresh_token TEXT NULL
-                    """)
-                    logger.info("user_sessionsテーブルにencrypted_refresh_tokenカラムを追加しました")
-                except Exception as e:
-                    # カラムが既に存在する場合はエラーを無視
-                    if "Duplicate column name" not in str(e):
-                        logger.warning(f"encrypted_refresh_tokenカラム追加でエラー: {e}")
-                    pass
-                # 認証ログテーブル（Cognito対応）
-                await cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS auth_logs (
-                        log_id VARCHAR(36) PRIMARY KEY,
-                        user_id VARCHAR(36) NULL,
-                        email VARCHAR(255) NULL,
-                        event_type VARCHAR(50) NOT NULL,
-                        result VARCHAR(20) NOT NULL,
-                        details JSON NULL,
-                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        ip_address VARCHAR(45) NULL,
-                        
-                        FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE SET NULL,
-                        INDEX idx_user_id (user_id),
-                        INDEX idx_email (email),
-                        INDEX idx_event_type (event_type),
-                        INDEX idx_result (result),
-                        INDEX idx_timestamp (timestamp)
-                    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-                """)
+                if ('user_sessions', 'encrypted_refresh_token') not in existing:
+                    migrations.append("ALTER TABLE user_sessions ADD COLUMN encrypted_refresh_token TEXT NULL")
+                    messages.append("user_sessionsテーブルにencrypted_refresh_tokenカラムを追加しました")
+                
+                # リフレッシュ前のAccess Tokenでもセッションを引けるようにするカラムを追加（既存テーブルの場合）
+                if ('user_sessions', 'previous_access_token_hash') not in existing:
+                    migrations.append(
+                        "ALTER TABLE user_sessions "
+                        "ADD COLUMN previous_access_token_hash BINARY(32) NULL AFTER access_token_hash, "
+                        "ADD INDEX idx_previous_access_token_hash_active (previous_access_token_hash, is_active)"
+                    )
+                    messages.append("user_sessionsテーブルにprevious_access_token_hashカラムを追加しました")
+                
+                # 期限切れセッション検索用の複合インデックスを追加（既存テーブルの場合）
+                if ('user_sessions', 'idx_active_expires') not in existing:
+                    migrations.append("ALTER TABLE user_sessions ADD INDEX idx_active_expires (is_active, expires_at)")
+                    messages.append("user_sessionsテーブルにidx_active_expiresインデックスを追加しました")
+                
+                # トークン検索用の複合インデックスに置き換え、重複する単一カラムインデックスを削除（既存テーブルの場合）
+                # (idx_is_activeはidx_active_expiresの先頭カラムと重複し、選択性も低い)
+                index_changes = []
+                if ('user_sessions', 'idx_access_token_hash_active') not in existing:
+                    index_changes.append("ADD INDEX idx_access_token_hash_active (access_token_hash, is_active)")
+                for index_name in ('idx_access_token_hash', 'idx_is_active'):
+                    if ('user_sessions', index_name) in existing:
+                        index_changes.append(f"DROP INDEX {index_name}")
+                if index_changes:
+                    migrations.append(f"ALTER TABLE user_sessions {', '.join(index_changes)}")
+                    messages.append("user_sessionsテーブルのトークン検索インデックスを(access_token_hash, is_active)に置き換えました")
+                
+                # メールアドレスのハッシュでユーザーを引くためのカラムを追加（既存テーブルの場合）
+                if ('users', 'email_hash') not in existing:
+                    migrations.append(
+                        "ALTER TABLE users ADD COLUMN email_hash CHAR(64) NULL, "
+                        "ADD UNIQUE INDEX idx_email_hash (email_hash)"
+                    )
+                    messages.append("usersテーブルにemail_hashカラムを追加しました")
+                
+                # UNIQUE制約のインデックスと重複するidx_cognito_subを削除（既存テーブルの場合）
+                if ('app_user_data', 'idx_cognito_sub') in existing:
+                    migrations.append("ALTER TABLE app_user_data DROP INDEX idx_cognito_sub")
+                    messages.append("app_user_dataテーブルから重複インデックスidx_cognito_subを削除しました")
                 
-                # アプリケーションユーザーデータテーブル（ビジネスデータ管理）
-                await cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS app_user_data (
-                        app_user_id VARCHAR(36) PRIMARY KEY,
-                        cognito_sub VARCHAR(36) UNIQUE NOT NULL,
-                        subscription_status ENUM('free', 'premium') DEFAULT 'free',
-                        usage_count INT DEFAULT 0,
-                        monthly_usage_count INT DEFAULT 0,
-                        last_usage_reset TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        preferences JSON NULL,
-                        profile_data JSON NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                        
-                        INDEX idx_cognito_sub (cognito_sub),
-                        INDEX idx_subscription_status (subscription_status),
-                        INDEX idx_created_at (created_at),
-                        INDEX idx_usage_count (usage_count)
-                    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-                """)
                 # seconds_balanceカラムを追加（既存テーブルの場合）
-                try:
-                    await cursor.execute("""
-                        ALTER TABLE app_user_data 
-                        ADD COLUMN seconds_balance FLOAT DEFAULT 300.0
-                    """)
-                    logger.info("app_user_dataテーブルにseconds_balanceカラムを追加しました")
-                except Exception as e:
-                    if "Duplicate column name" not in str(e):
-                        logger.warning(f"seconds_balanceカラム追加でエラー: {e}")
-                    pass
+                if ('app_user_data', 'seconds_balance') not in existing:
+                    migrations.append("ALTER TABLE app_user_data ADD COLUMN seconds_balance FLOAT DEFAULT 300.0")
+                    messages.append("app_user_dataテーブルにseconds_balanceカラムを追加しました")
+                
+                # 必要なマイグレーションのみ1回の往復で実行
+                if migrations:
+                    await cursor.execute(";\n".join(migrations))
+                    await self._drain_results(cursor)
+                    for message in messages:
+                        logger.info(message)
                 
                 logger.info("Cognito中心管理データベーステーブルを作成しました")
     
+    @staticmethod
+    async def _drain_results(cursor) -> List[tuple]:
+        """
+        マルチステートメント実行後の結果セットをすべて読み切る
+        
+        Args:
+            cursor: 実行済みのカーソル
+            
+        Returns:
+            List[tuple]: 最後に行を返した文の結果
+        """
+        rows = []
+        while True:
+            if cursor.description:
+                rows = list(await cursor.fetchall())
+            if not await cursor.nextset():
+                return rows
+    
+    async def _cached_lookup(self, cache: OrderedDict, reverse_keys: Dict[str, Any], key: Any,
+                             owner_id: Callable[[Any], str], loader: Callable[[], Awaitable[Any]]):
+        """
+        キャッシュ付きで参照（同一キーへの同時参照は1回のDBアクセスにまとめる）
+        
+        Args:
+            cache: 参照結果のキャッシュ
+            reverse_keys: ID（セッションID・ユーザーID）からキャッシュキーへの対応表
+            key: キャッシュキー
+            owner_id: 参照結果からIDを取り出す関数
+            loader: DBから参照する関数
+            
+        Returns:
+            参照結果のコピー（見つからない場合はNone）
+        """
+        entry = cache.get(key)
+        if entry:
+            expires_at, _, value = entry
+            if time.monotonic() < expires_at:
+                cache.move_to_end(key)
+                return value.model_copy()
+            self._evict_cached(cache, reverse_keys, key)
+        
+        inflight = self._inflight_lookups.get((id(cache), key))
+        if inflight is not None:
+            value = await asyncio.shield(inflight)
+            return value.model_copy() if value is not None else None
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight_lookups[(id(cache), key)] = future
+        generation = self._lookup_cache_generation
+        value = None
+        try:
+            value = await loader()
+            # 見つからなかった結果はキャッシュしない（直後の作成をすぐ反映するため）
+            if value is not None and generation == self._lookup_cache_generation:
+                owner = owner_id(value)
+                # 1つのIDにつき1エントリのみ保持する（リフレッシュ前後のトークンで同じセッションを引いた場合も、
+                # ID指定の無効化で確実に破棄できるようにする）
+                previous_key = reverse_keys.get(owner)
+                if previous_key is not None and previous_key != key and previous_key in cache:
+                    self._evict_cached(cache, reverse_keys, previous_key)
+                cache[key] = (time.monotonic() + self.lookup_cache_ttl, owner, value)
+                reverse_keys[owner] = key
+                while len(cache) > self.lookup_cache_size:
+                    self._evict_cached(cache, reverse_keys, next(iter(cache)))
+            future.set_result(value)
+        finally:
+            if not future.done():
+                future.set_result(None)
+            del self._inflight_lookups[(id(cache), key)]
+        
+        return value.model_copy() if value is not None else None
+    
+    @staticmethod
+    def _evict_cached(cache: OrderedDict, reverse_keys: Dict[str, Any], key: Any) -> None:
+        """キャッシュエントリと対応表を削除"""
+        _, owner, _ = cache.pop(key)
+        if reverse_keys.get(owner) == key:
+            del reverse_keys[owner]
+    
+    def invalidate_cached_session(self, session_id: Optional[str] = None, user_id: Optional[str] = None) -> None:
+        """
+        セッション参照キャッシュを破棄（トークン更新・無効化・延長時）
+        
+        Args:
+            session_id: 対象のセッションID
+            user_id: 対象のユーザーID（全セッション無効化時）
+        """
+        self._lookup_cache_generation += 1
+        if session_id is not None:
+            key = self._session_cache_keys.get(session_id)
+            if key is not None:
+                self._evict_cached(self._session_cache, self._session_cache_keys, key)
+        if user_id is not None:
+            stale_keys = [key for key, (_, _, session) in self._session_cache.items() if session.user_id == user_id]
+            for key in stale_keys:
+                self._evict_cached(self._session_cache, self._session_cache_keys, key)
+    
+    def add_session_invalidation_listener(self, listener: Callable[[Optional[str], Optional[str]], None]) -> None:
+        """
+        セッション無効化時に呼び出すリスナーを登録
+        
+        Args:
+            listener: (session_id, user_id) を受け取る関数（両方Noneの場合は全セッションが対象）
+        """
+        self._session_invalidation_listeners.append(listener)
+    
+    def _notify_session_invalidated(self, session_id: Optional[str] = None, user_id: Optional[str] = None) -> None:
+        """登録済みのリスナーにセッション無効化を通知"""
+        for listener in self._session_invalidation_listeners:
+            try:
+                listener(session_id, user_id)
+            except Exception as e:
+                logger.error(f"セッション無効化リスナーエラー: {e}")
+    
+    def invalidate_cached_user(self, user_id: str) -> None:
+        """
+        ユーザー参照キャッシュを破棄
+        
+        Args:
+            user_id: 対象のユーザーID
+        """
+        self._lookup_cache_generation += 1
+        key = self._user_cache_keys.get(user_id)
+        if key is not None:
+            self._evict_cached(self._user_cache, self._user_cache_keys, key)
+    
+    def invalidate_cached_usage_statistics(self, cognito_sub: str) -> None:
+        """
+        使用統計のキャッシュを破棄
+        
+        Args:
+            cognito_sub: 対象のCognito Sub
+        """
+        self._lookup_cache_generation += 1
+        self._usage_stats_cache.pop(cognito_sub, None)
+    
+    def clear_lookup_caches(self) -> None:
+        """セッション・ユーザー参照・使用統計キャッシュを全て破棄"""
+        self._lookup_cache_generation += 1
+        self._session_cache.clear()
+        self._session_cache_keys.clear()
+        self._user_cache.clear()
+        self._user_cache_keys.clear()
+        self._usage_stats_cache.clear()
+    
+    def _touch_cached_session(self, session_id: str, last_activity: datetime) -> None:
+        """キャッシュ済みセッションの最終活動時刻を更新（非アクティブ判定がキャッシュで遅れないようにする）"""
+        key = self._session_cache_keys.get(session_id)
+        if key is not None:
+            self._session_cache[key][2].last_activity = last_activity
+    
     async def close_pool(self):
         """コネクションプールを閉じる"""
+        if self._activity_flush_task and not self._activity_flush_task.done():
+            self._activity_flush_task.cancel()
+            try:
+                await self._activity_flush_task
+            except asyncio.CancelledError:
+                pass
+        
+        # 書き込み中の認証ログ・使用回数があれば完了を待つ
+        if self._auth_log_flush_task and not self._auth_log_flush_task.done():
+            await self._auth_log_flush_task
+        if self._usage_flush_task and not self._usage_flush_task.done():
+            await self._usage_flush_task
+        
         if self.pool:
+            # 未書き込みの last_activity・認証ログ・使用回数を反映してから閉じる
+            await self.flush_session_activity()
+            await self.flush_auth_logs()
+            await self.flush_usage_counts()
             self.pool.close()
             await self.pool.wait_closed()
             logger.info("データベース接続プールを閉じました")
@@ -232,16 +969,16 @@ class DatabaseManager:
             
             async with self.pool.acquire() as conn:
                 async with conn.cursor() as cursor:
-                    await cursor.execute("""
-                        INSERT INTO users (user_id, cognito_user_sub, created_at, is_active)
-                        VALUES (%s, %s, %s, %s)
-                    """, (
+                    await cursor.execute(USER_INSERT_SQL, (
                         user.user_id,
                         user.cognito_user_sub,
                         user.created_at,
                         user.is_active
                     ))
                     
+                    if user_data.email:
+                        await self._assign_email_hash(cursor, user.user_id, user_data.email)
+                    
             logger.info(f"Cognitoユーザーを作成しました: {user.user_id} (Sub: {user.cognito_user_sub})")
             return user
             
@@ -250,24 +987,62 @@ class DatabaseManager:
             return None
     
     async def get_user_by_cognito_sub(self, cognito_user_sub: str) -> Optional[User]:
-        """Cognito User Subでユーザーを取得"""
+        """Cognito User Subでユーザーを取得（短時間キャッシュ付き）"""
+        return await self._cached_lookup(
+            self._user_cache, self._user_cache_keys, cognito_user_sub,
+            lambda user: user.user_id,
+            lambda: self._fetch_user_by_cognito_sub(cognito_user_sub)
+        )
+    
+    async def _fetch_user_by_cognito_sub(self, cognito_user_sub: str) -> Optional[User]:
+        """Cognito User SubでユーザーをDBから取得"""
         try:
             async with self.pool.acquire() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cursor:
-                    await cursor.execute("""
-                        SELECT * FROM users WHERE cognito_user_sub = %s
-                    """, (cognito_user_sub,))
+                async with conn.cursor() as cursor:
+                    await cursor.execute(USER_BY_COGNITO_SUB_SQL, (cognito_user_sub,))
                     
                     row = await cursor.fetchone()
                     if row:
-                        return User(**row)
+                        return _row_to_user(row)
                     return None
                     
         except Exception as e:
             logger.error(f"Cognitoユーザー取得エラー: {e}")
             return None
     
+    @staticmethod
+    async def _assign_email_hash(cursor, user_id: str, email: str) -> None:
+        """メールアドレスのハッシュをユーザーに設定（1回の往復で付け替える、失敗しても処理は継続）"""
+        try:
+            email_hash = email_digest(email)
+            await cursor.execute(USER_EMAIL_HASH_ASSIGN_SQL, (email_hash, user_id, email_hash, user_id))
+            await DatabaseManager._drain_results(cursor)
+        except Exception as e:
+            logger.warning(f"メールアドレスハッシュ設定エラー: {e}")
+    
     async def get_user_by_email(self, email: str) -> Optional[User]:
+        """メールアドレスでユーザーを取得（DBで見つからない場合のみCognito経由）"""
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(USER_BY_EMAIL_HASH_SQL, (email_digest(email),))
+                    row = await cursor.fetchone()
+                    if row:
+                        return _row_to_user(row)
+            
+            user = await self._get_user_by_email_from_cognito(email)
+            if user:
+                # 次回以降はDBのみで引けるようハッシュを保存
+                async with self.pool.acquire() as conn:
+                    async with conn.cursor() as cursor:
+                        await self._assign_email_hash(cursor, user.user_id, email)
+            return user
+            
+        except Exception as e:
+            logger.error(f"メールアドレスでのユーザー取得エラー: {e}")
+            return None
+    
+    async def _get_user_by_email_from_cognito(self, email: str) -> Optional[User]:
         """メールアドレスでユーザーを取得（Cognito経由）"""
         try:
             # Cognitoでユーザーを検索してUser Subを取得
@@ -305,14 +1080,12 @@ class DatabaseManager:
         """ユーザーIDでユーザーを取得"""
         try:
             async with self.pool.acquire() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cursor:
-                    await cursor.execute("""
-                        SELECT * FROM users WHERE user_id = %s
-                    """, (user_id,))
+                async with conn.cursor() as cursor:
+                    await cursor.execute(USER_BY_ID_SQL, (user_id,))
                     
                     row = await cursor.fetchone()
                     if row:
-                        return User(**row)
+                        return _row_to_user(row)
                     return None
                     
         except Exception as e:
@@ -326,10 +1099,11 @@ class DatabaseManager:
                 async with conn.cursor() as cursor:
                     await cursor.execute("""
                         UPDATE users 
-                        SET last_login = %s
+                        SET last_login = UTC_TIMESTAMP()
                         WHERE user_id = %s
-                    """, (datetime.utcnow(), user_id))
+                    """, (user_id,))
                     
+            self.invalidate_cached_user(user_id)
             return True
             
         except Exception as e:
@@ -337,62 +1111,69 @@ class DatabaseManager:
             return False
     
     # セッション関連操作（Cognito統合）
+    def _build_session(self, session_data: SessionCreate) -> tuple:
+        """
+        セッション作成データから保存するセッションとINSERTパラメータを構築
+        
+        Args:
+            session_data: セッション作成データ
+            
+        Returns:
+            tuple: (UserSession, SESSION_INSERT_SQL のパラメータ)
+        """
+        expires_at = datetime.utcnow() + timedelta(seconds=session_data.expires_in)
+        
+        # トークンをハッシュ化して保存
+        access_token_hash = token_digest(session_data.access_token)
+        id_token_hash = token_digest(session_data.id_token) if session_data.id_token else None
+        refresh_token_hash = token_digest(session_data.refresh_token) if session_data.refresh_token else None
+        
+        # Refresh Tokenを暗号化して保存
+        # (AES-GCMでの暗号化は数マイクロ秒で、スレッドへの受け渡し(約100マイクロ秒)より軽いためイベントループ上で実行)
+        encrypted_refresh_token = None
+        if session_data.refresh_token:
+            try:
+                encrypted_refresh_token = encryption_utils.encrypt_token(session_data.refresh_token)
+            except Exception as e:
+                logger.error(f"Refresh Token暗号化エラー: {e}")
+                # 暗号化に失敗してもセッション作成は継続
+        
+        session = UserSession(
+            user_id=session_data.user_id,
+            cognito_user_sub=session_data.cognito_user_sub,
+            access_token=session_data.access_token,
+            id_token=session_data.id_token,
+            refresh_token=session_data.refresh_token,
+            expires_at=expires_at,
+            client_ip=session_data.client_ip,
+            user_agent=session_data.user_agent
+        )
+        
+        params = (
+            session.session_id,
+            session.user_id,
+            session.cognito_user_sub,
+            access_token_hash,
+            id_token_hash,
+            refresh_token_hash,
+            encrypted_refresh_token,
+            session.expires_at,
+            session.created_at,
+            session.last_activity,
+            session.is_active,
+            session.client_ip,
+            session.user_agent
+        )
+        return session, params
+    
     async def create_session(self, session_data: SessionCreate) -> Optional[UserSession]:
         """新しいセッションを作成（Cognito統合）"""
         try:
-            import hashlib
-            from encryption_utils import encryption_utils
-            
-            expires_at = datetime.utcnow() + timedelta(seconds=session_data.expires_in)
-            
-            # トークンをハッシュ化して保存
-            access_token_hash = hashlib.sha256(session_data.access_token.encode()).hexdigest()
-            id_token_hash = hashlib.sha256(session_data.id_token.encode()).hexdigest() if session_data.id_token else None
-            refresh_token_hash = hashlib.sha256(session_data.refresh_token.encode()).hexdigest() if session_data.refresh_token else None
-            
-            # Refresh Tokenを暗号化して保存
-            encrypted_refresh_token = None
-            if session_data.refresh_token:
-                try:
-                    encrypted_refresh_token = encryption_utils.encrypt_token(session_data.refresh_token)
-                except Exception as e:
-                    logger.error(f"Refresh Token暗号化エラー: {e}")
-                    # 暗号化に失敗してもセッション作成は継続
-            
-            session = UserSession(
-                user_id=session_data.user_id,
-                cognito_user_sub=session_data.cognito_user_sub,
-                access_token=session_data.access_token,
-                id_token=session_data.id_token,
-                refresh_token=session_data.refresh_token,
-                expires_at=expires_at,
-                client_ip=session_data.client_ip,
-                user_agent=session_data.user_agent
-            )
+            session, params = self._build_session(session_data)
             
             async with self.pool.acquire() as conn:
                 async with conn.cursor() as cursor:
-                    await cursor.execute("""
-                        INSERT INTO user_sessions 
-                        (session_id, user_id, cognito_user_sub, access_token_hash, id_token_hash, 
-                         refresh_token_hash, encrypted_refresh_token, expires_at, created_at, last_activity, is_active, 
-                         client_ip, user_agent)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """, (
-                        session.session_id,
-                        session.user_id,
-                        session.cognito_user_sub,
-                        access_token_hash,
-                        id_token_hash,
-                        refresh_token_hash,
-                        encrypted_refresh_token,
-                        session.expires_at,
-                        session.created_at,
-                        session.last_activity,
-                        session.is_active,
-                        session.client_ip,
-                        session.user_agent
-                    ))
+                    await cursor.execute(SESSION_INSERT_SQL, params)
                     
             logger.info(f"Cognitoセッションを作成しました: {session.session_id}")
             return session
@@ -401,26 +1182,60 @@ class DatabaseManager:
             logger.error(f"Cognitoセッション作成エラー: {e}")
             return None
     
-    async def get_session_by_token(self, access_token: str) -> Optional[UserSession]:
-        """アクセストークンでセッションを取得（Cognito統合）"""
+    async def login_transaction(self, session_data: SessionCreate) -> Optional[UserSession]:
+        """
+        ログイン時のセッション作成とログイン時刻の更新を1つのトランザクション・1回の往復で実行
+        
+        Args:
+            session_data: セッション作成データ
+            
+        Returns:
+            Optional[UserSession]: 作成されたセッション（失敗時はNone、どちらの変更も残らない）
+        """
         try:
-            import hashlib
+            session, params = self._build_session(session_data)
             
-            access_token_hash = hashlib.sha256(access_token.encode()).hexdigest()
+            async with self.pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    try:
+                        await cursor.execute(
+                            LOGIN_TRANSACTION_SQL,
+                            params + (session.user_id,)
+                        )
+                        await self._drain_results(cursor)
+                    except Exception:
+                        # 途中の文で失敗した場合は開いたままのトランザクションを破棄してから接続を返す
+                        await conn.rollback()
+                        raise
+                    
+            self.invalidate_cached_user(session.user_id)
+            logger.info(f"Cognitoセッションを作成しました: {session.session_id}")
+            return session
             
+        except Exception as e:
+            logger.error(f"ログインセッション作成エラー: {e}")
+            return None
+    
+    async def get_session_by_token(self, access_token: str) -> Optional[UserSession]:
+        """アクセストークンでセッションを取得（Cognito統合、短時間キャッシュ付き）"""
+        access_token_hash = token_digest(access_token)
+        return await self._cached_lookup(
+            self._session_cache, self._session_cache_keys, access_token_hash,
+            lambda session: session.session_id,
+            lambda: self._fetch_session_by_token(access_token, access_token_hash)
+        )
+    
+    async def _fetch_session_by_token(self, access_token: str, access_token_hash: bytes) -> Optional[UserSession]:
+        """アクセストークンのハッシュでセッションをDBから取得"""
+        try:
             async with self.pool.acquire() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cursor:
-                    await cursor.execute("""
-                        SELECT * FROM user_sessions 
-                        WHERE access_token_hash = %s AND is_active = TRUE
-                    """, (access_token_hash,))
+                async with conn.cursor() as cursor:
+                    await cursor.execute(SESSION_BY_TOKEN_SQL, (access_token_hash, access_token_hash))
                     
                     row = await cursor.fetchone()
                     if row:
                         # トークンを復元（実際のトークンは保存していないので、引数のトークンを使用）
-                        session_dict = dict(row)
-                        session_dict['access_token'] = access_token
-                        return UserSession(**session_dict)
+                        return _row_to_session(row, access_token)
                     return None
                     
         except Exception as e:
@@ -428,21 +1243,56 @@ class DatabaseManager:
             return None
     
     async def update_session_activity(self, session_id: str) -> bool:
-        """セッションの最終活動時刻を更新"""
+        """
+        セッションの最終活動時刻を更新
+        リクエストごとにUPDATEせず、書き込みを予約して定期的にまとめて反映する
+        """
+        self.queue_session_activity(session_id)
+        return True
+    
+    def queue_session_activity(self, session_id: str) -> None:
+        """セッションの最終活動時刻の更新を予約（一定間隔でまとめて書き込む）"""
+        self._pending_activity.add(session_id)
+        self._touch_cached_session(session_id, datetime.utcnow())
+    
+    async def flush_session_activity(self) -> int:
+        """予約された最終活動時刻の更新を1回のUPDATEで書き込む"""
+        if not self._pending_activity:
+            return 0
+        
+        # イベントループ上で入れ替えるため、書き込み中の追加分は次回に回る
+        session_ids, self._pending_activity = list(self._pending_activity), set()
+        
         try:
+            placeholders = ', '.join(['%s'] * len(session_ids))
             async with self.pool.acquire() as conn:
                 async with conn.cursor() as cursor:
-                    await cursor.execute("""
+                    await cursor.execute(f"""
                         UPDATE user_sessions 
-                        SET last_activity = %s
-                        WHERE session_id = %s AND is_active = TRUE
-                    """, (datetime.utcnow(), session_id))
+                        SET last_activity = UTC_TIMESTAMP()
+                        WHERE session_id IN ({placeholders}) AND is_active = TRUE
+                    """, session_ids)
                     
-            return True
+            return len(session_ids)
             
         except Exception as e:
-            logger.error(f"セッション活動更新エラー: {e}")
-            return False
+            logger.error(f"セッション活動一括更新エラー: {e}")
+            # 失敗した分は次回の書き込みで再試行
+            self._pending_activity.update(session_ids)
+            return 0
+    
+    async def _activity_flush_loop(self):
+        """最終活動時刻・認証ログ・使用回数のバッチ書き込みループ"""
+        while True:
+            try:
+                await asyncio.sleep(self.activity_flush_interval)
+                await self.flush_session_activity()
+                await self.flush_auth_logs()
+                await self.flush_usage_counts()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"セッション活動書き込みループエラー: {e}")
     
     async def invalidate_session(self, session_id: str) -> bool:
         """セッションを無効化"""
@@ -455,6 +1305,8 @@ class DatabaseManager:
                         WHERE session_id = %s
                     """, (session_id,))
                     
+            self.invalidate_cached_session(session_id=session_id)
+            self._notify_session_invalidated(session_id=session_id)
             logger.info(f"セッションを無効化しました: {session_id}")
             return True
             
@@ -473,6 +1325,8 @@ class DatabaseManager:
                         WHERE user_id = %s
                     """, (user_id,))
                     
+            self.invalidate_cached_session(user_id=user_id)
+            self._notify_session_invalidated(user_id=user_id)
             logger.info(f"ユーザーの全セッションを無効化しました: {user_id}")
             return True
             
@@ -480,31 +1334,54 @@ class DatabaseManager:
             logger.error(f"ユーザーセッション無効化エラー: {e}")
             return False
     
+    async def purge_inactive_sessions(self, batch_size: int = 10000) -> int:
+        """無効化済みかつ期限切れのセッション行を一定件数ずつ削除"""
+        try:
+            purge_before = datetime.utcnow()
+            total_deleted = 0
+            
+            async with self.pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    # 1回の削除件数を制限し、ロック保持時間とDB負荷を抑える
+                    while True:
+                        await cursor.execute("""
+                            DELETE FROM user_sessions
+                            WHERE is_active = FALSE AND expires_at < %s
+                            LIMIT %s
+                        """, (purge_before, batch_size))
+                        
+                        total_deleted += cursor.rowcount
+                        if cursor.rowcount < batch_size:
+                            break
+            
+            if total_deleted > 0:
+                logger.info(f"無効化済みセッションを削除しました: {total_deleted}件")
+            
+            return total_deleted
+            
+        except Exception as e:
+            logger.error(f"無効化済みセッション削除エラー: {e}")
+            return 0
+    
     async def cleanup_expired_sessions(self) -> int:
         """期限切れセッションをクリーンアップ"""
         try:
             async with self.pool.acquire() as conn:
                 async with conn.cursor() as cursor:
-                    # 24時間経過したセッションを無効化
+                    # 有効期限切れまたは2時間非アクティブなセッションを1回のUPDATEで無効化
+                    now = datetime.utcnow()
                     await cursor.execute("""
                         UPDATE user_sessions 
                         SET is_active = FALSE
-                        WHERE expires_at < %s AND is_active = TRUE
-                    """, (datetime.utcnow(),))
+                        WHERE is_active = TRUE AND (expires_at < %s OR last_activity < %s)
+                    """, (now, now - timedelta(hours=2)))
                     
-                    expired_count = cursor.rowcount
+                    total_cleaned = cursor.rowcount
                     
-                    # 2時間非アクティブなセッションを無効化
-                    await cursor.execute("""
-                        UPDATE user_sessions 
-                        SET is_active = FALSE
-                        WHERE last_activity < %s AND is_active = TRUE
-                    """, (datetime.utcnow() - timedelta(hours=2),))
-                    
-                    inactive_count = cursor.rowcount
-                    
-            total_cleaned = expired_count + inactive_count
             if total_cleaned > 0:
+                # どのセッションが無効化されたかは分からないため、キャッシュを全て破棄
+                self.clear_lookup_caches()
+                self._notify_session_invalidated()
                 logger.info(f"期限切れセッションをクリーンアップしました: {total_cleaned}件")
             
             return total_cleaned
@@ -520,10 +1397,11 @@ class DatabaseManager:
                 async with conn.cursor() as cursor:
                     await cursor.execute("""
                         UPDATE user_sessions 
-                        SET expires_at = %s, last_activity = %s
+                        SET expires_at = %s, last_activity = UTC_TIMESTAMP()
                         WHERE session_id = %s AND is_active = TRUE
-                    """, (new_expires_at, datetime.utcnow(), session_id))
+                    """, (new_expires_at, session_id))
                     
+            self.invalidate_cached_session(session_id=session_id)
             logger.info(f"セッション有効期限を延長しました: {session_id}")
             return True
             
@@ -535,15 +1413,13 @@ class DatabaseManager:
         """セッションIDでセッションを取得"""
         try:
             async with self.pool.acquire() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cursor:
-                    await cursor.execute("""
-                        SELECT * FROM user_sessions 
-                        WHERE session_id = %s AND is_active = TRUE
-                    """, (session_id,))
+                async with conn.cursor() as cursor:
+                    await cursor.execute(SESSION_BY_ID_SQL, (session_id,))
                     
                     row = await cursor.fetchone()
                     if row:
-                        return UserSession(**row)
+                        # Access Token本体は保存していないため空文字列とする
+                        return _row_to_session(row, access_token='')
                     return None
                     
         except Exception as e:
@@ -551,85 +1427,128 @@ class DatabaseManager:
             return None
     
     # ログ関連操作（Cognito統合）
+    def _build_auth_log(self, log_data: AuthLogCreate) -> AuthLog:
+        """認証ログ作成用データから保存するログを構築"""
+        # log_data.details は辞書の可能性があり、JSON文字列に変換が必要
+        details_json = _json_dumps(log_data.details) if isinstance(log_data.details, dict) else log_data.details
+        
+        return AuthLog(
+            user_id=log_data.user_id,
+            email=log_data.email,  # phone_numberからemailに変更
+            event_type=log_data.event_type,
+            result=log_data.result,
+            details=details_json,
+            ip_address=log_data.ip_address
+        )
+    
     async def create_auth_log(self, log_data: AuthLogCreate) -> Optional[AuthLog]:
-        """認証ログを作成（Cognito統合）"""
-        try:
-            # log_data.details は辞書の可能性があり、JSON文字列に変換が必要
-            details_json = json.dumps(log_data.details) if isinstance(log_data.details, dict) else log_data.details
-
-            log = AuthLog(
-                user_id=log_data.user_id,
-                email=log_data.email,  # phone_numberからemailに変更
-                event_type=log_data.event_type,
-                result=log_data.result,
-                details=details_json,
-                ip_address=log_data.ip_address
-            )
+        """
+        認証ログを作成（Cognito統合）
+        通常は書き込みを予約して複数行INSERTにまとめ、セキュリティイベントのみ即座にINSERTする
+        """
+        # バッファが上限に達している場合は破棄せずにその場で書き込む
+        if (log_data.event_type not in SYNC_AUTH_LOG_EVENT_TYPES
+                and len(self._pending_auth_logs) < self.auth_log_queue_size):
+            return self.queue_auth_log(log_data)
+        
+        return await self._insert_auth_log(log_data)
+    
+    async def _insert_auth_log(self, log_data: AuthLogCreate) -> Optional[AuthLog]:
+        """認証ログを1件INSERT"""
+        try:
+            log = self._build_auth_log(log_data)
             
             async with self.pool.acquire() as conn:
                 async with conn.cursor() as cursor:
-                    await cursor.execute("""
-                        INSERT INTO auth_logs 
-                        (log_id, user_id, email, event_type, result, details, timestamp, ip_address)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    """, (
-                        log.log_id,
-                        log.user_id,
-                        log.email,
-                        log.event_type,
-                        log.result,
-                        details_json, # JSON文字列を使用
-                        log.timestamp,
-                        log.ip_address
-                    ))
+                    await cursor.execute(AUTH_LOG_INSERT_SQL, _auth_log_params(log))
                     
             return log
             
         except Exception as e:
             logger.error(f"認証ログ作成エラー: {e}")
             return None
+    
+    def queue_auth_log(self, log_data: AuthLogCreate) -> Optional[AuthLog]:
+        """認証ログの書き込みを予約（一定間隔または一定件数ごとにまとめてINSERTする）"""
+        if len(self._pending_auth_logs) >= self.auth_log_queue_size:
+            self.dropped_auth_logs += 1
+            return None
+        
+        # タイムスタンプは予約時点で確定させ、書き込みが遅れても時系列を保つ
+        log = self._build_auth_log(log_data)
+        self._pending_auth_logs.append(log)
+        
+        # 定期書き込みを待たず、バッチサイズに達したら即座に、それ以外は短い遅延の後にまとめて書き込む
+        if self._auth_log_flush_task is None or self._auth_log_flush_task.done():
+            delay = 0 if len(self._pending_auth_logs) >= self.auth_log_batch_size else self.auth_log_flush_delay
+            self._auth_log_flush_task = asyncio.create_task(self._flush_auth_logs_after(delay))
+        
+        return log
+    
+    async def _flush_auth_logs_after(self, delay: float):
+        """指定秒数待ってから予約済みの認証ログを書き込む（書き込み中に追加された分も続けて書き込む）"""
+        try:
+            while self._pending_auth_logs:
+                await asyncio.sleep(delay)
+                if not await self.flush_auth_logs():
+                    # 書き込み失敗時の再試行は定期書き込みループに任せる
+                    break
+        except Exception as e:
+            logger.error(f"認証ログ書き込みタスクエラー: {e}")
+    
+    async def flush_auth_logs(self) -> int:
+        """予約された認証ログを複数行INSERTでまとめて書き込む"""
+        if not self._pending_auth_logs:
+            return 0
+        
+        # イベントループ上で入れ替えるため、書き込み中の追加分は次回に回る
+        logs, self._pending_auth_logs = self._pending_auth_logs, []
+        
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    for start in range(0, len(logs), self.auth_log_batch_size):
+                        batch = logs[start:start + self.auth_log_batch_size]
+                        await cursor.executemany(AUTH_LOG_INSERT_SQL, [_auth_log_params(log) for log in batch])
+                        
+            return len(logs)
+            
+        except Exception as e:
+            logger.error(f"認証ログ一括作成エラー: {e}")
+            # 失敗した分は上限の範囲で次回の書き込みで再試行
+            room = self.auth_log_queue_size - len(self._pending_auth_logs)
+            self.dropped_auth_logs += max(0, len(logs) - room)
+            self._pending_auth_logs[:0] = logs[:max(0, room)]
+            return 0
 
     # アプリケーションユーザーデータ関連操作
     async def create_app_user_data(self, cognito_sub: str, initial_data: dict = None) -> Optional[dict]:
         """アプリケーションユーザーデータを作成"""
         try:
-            import uuid
             app_user_id = str(uuid.uuid4())
+            # 保存値と返却値で同じ作成時刻を使う
+            now = datetime.utcnow()
             
             # デフォルトの初期データ
-            default_preferences = {
-                "language": "ja",
-                "theme": "light",
-                "notifications": True
-            }
-            
-            default_profile = {
-                "display_name": "",
-                "avatar_url": "",
-                "timezone": "Asia/Tokyo"
-            }
+            default_preferences = dict(DEFAULT_APP_USER_PREFERENCES)
+            default_profile = dict(DEFAULT_APP_USER_PROFILE)
             
             preferences = initial_data.get('preferences', default_preferences) if initial_data else default_preferences
             profile_data = initial_data.get('profile_data', default_profile) if initial_data else default_profile
             
             async with self.pool.acquire() as conn:
                 async with conn.cursor() as cursor:
-                    await cursor.execute("""
-                        INSERT INTO app_user_data 
-                        (app_user_id, cognito_sub, subscription_status, usage_count, 
-                         monthly_usage_count, seconds_balance, preferences, profile_data, created_at, updated_at)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """, (
+                    await cursor.execute(APP_USER_DATA_INSERT_SQL, (
                         app_user_id,
                         cognito_sub,
                         'free',
                         0,
                         0,
-                        300.0, # 初期値5分
-                        json.dumps(preferences),
-                        json.dumps(profile_data),
-                        datetime.utcnow(),
-                        datetime.utcnow()
+                        FREE_SECONDS_BALANCE,
+                        _json_dumps(preferences),
+                        _json_dumps(profile_data),
+                        now,
+                        now
                     ))
                     
             logger.info(f"アプリケーションユーザーデータを作成しました: {app_user_id} (Cognito Sub: {cognito_sub})")
@@ -637,14 +1556,14 @@ class DatabaseManager:
             return {
                 'app_user_id': app_user_id,
                 'cognito_sub': cognito_sub,
-                'seconds_balance': 300.0,
+                'seconds_balance': FREE_SECONDS_BALANCE,
                 'subscription_status': 'free',
                 'usage_count': 0,
                 'monthly_usage_count': 0,
                 'preferences': preferences,
                 'profile_data': profile_data,
-                'created_at': datetime.utcnow(),
-                'updated_at': datetime.utcnow()
+                'created_at': now,
+                'updated_at': now
             }
             
         except Exception as e:
@@ -655,39 +1574,13 @@ class DatabaseManager:
         """Cognito Subでアプリケーションユーザーデータを取得（月次リセットチェック付き）"""
         try:
             async with self.pool.acquire() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cursor:
-                    await cursor.execute("""
-                        SELECT * FROM app_user_data WHERE cognito_sub = %s
-                    """, (cognito_sub,))
+                async with conn.cursor() as cursor:
+                    # 月次リセットと取得を1回の往復で実行
+                    await cursor.execute(APP_USER_DATA_BY_COGNITO_SUB_SQL, (cognito_sub, cognito_sub))
                     
-                    row = await cursor.fetchone()
-                    if row:
-                        data = dict(row)
-                        # 月次リセットチェック
-                        last_reset = data.get('last_usage_reset')
-                        now = datetime.utcnow()
-                        # 前回リセットから月が変わっているかチェック
-                        if last_reset and (now.year > last_reset.year or now.month > last_reset.month):
-                            # 月が変わった場合、Freeプラン分(300秒)を下回っていれば300秒まで補充
-                            # (購入分は持ち越すが、Free枠は毎月リセットという考え方で、最低300秒を保証)
-                            new_balance = data['seconds_balance']
-                            if new_balance < 300.0:
-                                new_balance = 300.0
-                            
-                            await cursor.execute("""
-                                UPDATE app_user_data 
-                                SET monthly_usage_count = 0, last_usage_reset = %s, seconds_balance = %s
-                                WHERE cognito_sub = %s
-                            """, (now, new_balance, cognito_sub))
-                            data['seconds_balance'] = new_balance
-                            data['monthly_usage_count'] = 0
-                        
-                        # JSONパース
-                        if data.get('preferences') and isinstance(data['preferences'], str):
-                            data['preferences'] = json.loads(data['preferences'])
-                        if data.get('profile_data') and isinstance(data['profile_data'], str):
-                            data['profile_data'] = json.loads(data['profile_data'])
-                        return data
+                    rows = await self._drain_results(cursor)
+                    if rows:
+                        return _row_to_app_user_data(rows[0])
                     return None
         except Exception as e:
             logger.error(f"データ取得エラー: {e}")
@@ -702,146 +1595,127 @@ class DatabaseManager:
                         UPDATE app_user_data 
                         SET seconds_balance = seconds_balance + %s, 
                             subscription_status = 'premium',
-                            updated_at = %s
+                            updated_at = UTC_TIMESTAMP()
                         WHERE cognito_sub = %s
-                    """, (seconds, datetime.utcnow(), cognito_sub))
+                    """, (seconds, cognito_sub))
+            self.invalidate_cached_usage_statistics(cognito_sub)
             logger.info(f"残高を追加しました: {cognito_sub} (+{seconds}s)")
             return True
         except Exception as e:
             logger.error(f"残高追加エラー: {e}")
             return False
 
-    async def deduct_balance(self, cognito_sub: str, seconds: float) -> bool:
-        """残高を消費（音声認識利用時）"""
+    async def deduct_balance(self, cognito_sub: str, seconds: float) -> Optional[float]:
+        """
+        残高を消費（音声認識利用時）
+        
+        Args:
+            cognito_sub: Cognito Sub
+            seconds: 消費する秒数
+            
+        Returns:
+            Optional[float]: 消費後の残高（対象ユーザーが存在しない・エラー時はNone）
+        """
         try:
             async with self.pool.acquire() as conn:
                 async with conn.cursor() as cursor:
-                    await cursor.execute("""
-                        UPDATE app_user_data 
-                        SET seconds_balance = GREATEST(0, seconds_balance - %s),
-                            usage_count = usage_count + 1,
-                            monthly_usage_count = monthly_usage_count + 1,
-                            updated_at = %s
-                        WHERE cognito_sub = %s
-                    """, (seconds, datetime.utcnow(), cognito_sub))
-            return True
+                    # 更新と消費後残高の取得を1回の往復で実行
+                    await cursor.execute(BALANCE_DEDUCT_SQL, (seconds, cognito_sub))
+                    rows = await self._drain_results(cursor)
+            
+            self.invalidate_cached_usage_statistics(cognito_sub)
+            new_balance = rows[0][0] if rows else None
+            return float(new_balance) if new_balance is not None else None
         except Exception as e:
             logger.error(f"残高消費エラー: {e}")
-            return False
+            return None
     
     async def get_app_user_data_by_app_id(self, app_user_id: str) -> Optional[dict]:
         """アプリケーションユーザーIDでデータを取得"""
         try:
             async with self.pool.acquire() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cursor:
-                    await cursor.execute("""
-                        SELECT * FROM app_user_data WHERE app_user_id = %s
-                    """, (app_user_id,))
+                async with conn.cursor() as cursor:
+                    await cursor.execute(APP_USER_DATA_BY_APP_ID_SQL, (app_user_id,))
                     
                     row = await cursor.fetchone()
                     if row:
-                        # JSONフィールドをパース
-                        result = dict(row)
-                        if result.get('preferences'):
-                            result['preferences'] = json.loads(result['preferences'])
-                        if result.get('profile_data'):
-                            result['profile_data'] = json.loads(result['profile_data'])
-                        return result
+                        return _row_to_app_user_data(row)
                     return None
                     
         except Exception as e:
             logger.error(f"アプリケーションユーザーデータ取得エラー: {e}")
             return None
     
-    async def update_app_user_profile(self, cognito_sub: str, profile_updates: dict) -> bool:
-        """ユーザープロフィールを更新"""
-        try:
-            # 現在のデータを取得
-            current_data = await self.get_app_user_data_by_cognito_sub(cognito_sub)
-            if not current_data:
-                # データが存在しない場合は作成
-                await self.create_app_user_data(cognito_sub)
-                current_data = await self.get_app_user_data_by_cognito_sub(cognito_sub)
-                if not current_data:
-                    return False
-            
-            # プロフィールデータを更新
-            current_profile = current_data.get('profile_data', {})
-            current_profile.update(profile_updates)
+    async def update_app_user_profile(self, cognito_sub: str, profile_updates: dict) -> Optional[dict]:
+        """
+        ユーザープロフィールを更新（データが存在しない場合は初期値で作成）
+        
+        Args:
+            cognito_sub: Cognito Sub
+            profile_updates: 更新する項目
             
+        Returns:
+            Optional[dict]: 更新後のプロフィール（エラー時はNone）
+        """
+        try:
             async with self.pool.acquire() as conn:
                 async with conn.cursor() as cursor:
-                    await cursor.execute("""
-                        UPDATE app_user_data 
-                        SET profile_data = %s, updated_at = %s
-                        WHERE cognito_sub = %s
-                    """, (
-                        json.dumps(current_profile),
-                        datetime.utcnow(),
+                    value, value_params = _json_set_expression('profile_data', profile_updates)
+                    await cursor.execute(APP_USER_PROFILE_UPSERT_SQL.format(value=value), (
+                        *_app_user_data_upsert_params(cognito_sub, profile_data=profile_updates),
+                        *value_params,
                         cognito_sub
                     ))
+                    rows = await self._drain_results(cursor)
                     
             logger.info(f"ユーザープロフィールを更新しました: {cognito_sub}")
-            return True
+            return _json_loads(rows[0][0]) if rows and rows[0][0] else {}
             
         except Exception as e:
             logger.error(f"ユーザープロフィール更新エラー: {e}")
-            return False
+            return None
     
-    async def update_app_user_preferences(self, cognito_sub: str, preferences_updates: dict) -> bool:
-        """ユーザー設定を更新"""
-        try:
-            # 現在のデータを取得
-            current_data = await self.get_app_user_data_by_cognito_sub(cognito_sub)
-            if not current_data:
-                # データが存在しない場合は作成
-                await self.create_app_user_data(cognito_sub)
-                current_data = await self.get_app_user_data_by_cognito_sub(cognito_sub)
-                if not current_data:
-                    return False
-            
-            # 設定データを更新
-            current_preferences = current_data.get('preferences', {})
-            current_preferences.update(preferences_updates)
+    async def update_app_user_preferences(self, cognito_sub: str, preferences_updates: dict) -> Optional[dict]:
+        """
+        ユーザー設定を更新（データが存在しない場合は初期値で作成）
+        
+        Args:
+            cognito_sub: Cognito Sub
+            preferences_updates: 更新する項目
             
+        Returns:
+            Optional[dict]: 更新後の設定（エラー時はNone）
+        """
+        try:
             async with self.pool.acquire() as conn:
                 async with conn.cursor() as cursor:
-                    await cursor.execute("""
-                        UPDATE app_user_data 
-                        SET preferences = %s, updated_at = %s
-                        WHERE cognito_sub = %s
-                    """, (
-                        json.dumps(current_preferences),
-                        datetime.utcnow(),
+                    value, value_params = _json_set_expression('preferences', preferences_updates)
+                    await cursor.execute(APP_USER_PREFERENCES_UPSERT_SQL.format(value=value), (
+                        *_app_user_data_upsert_params(cognito_sub, preferences=preferences_updates),
+                        *value_params,
                         cognito_sub
                     ))
+                    rows = await self._drain_results(cursor)
                     
             logger.info(f"ユーザー設定を更新しました: {cognito_sub}")
-            return True
+            return _json_loads(rows[0][0]) if rows and rows[0][0] else {}
             
         except Exception as e:
             logger.error(f"ユーザー設定更新エラー: {e}")
-            return False
+            return None
     
     async def increment_usage_count(self, cognito_sub: str, increment: int = 1) -> bool:
-        """使用回数をインクリメント"""
+        """使用回数をインクリメント（データが存在しない場合は初期値で作成）"""
         try:
-            # 現在のデータを取得
-            current_data = await self.get_app_user_data_by_cognito_sub(cognito_sub)
-            if not current_data:
-                # データが存在しない場合は作成
-                await self.create_app_user_data(cognito_sub)
-            
             async with self.pool.acquire() as conn:
                 async with conn.cursor() as cursor:
-                    await cursor.execute("""
-                        UPDATE app_user_data 
-                        SET usage_count = usage_count + %s, 
-                            monthly_usage_count = monthly_usage_count + %s,
-                            updated_at = %s
-                        WHERE cognito_sub = %s
-                    """, (increment, increment, datetime.utcnow(), cognito_sub))
+                    await cursor.execute(APP_USER_USAGE_UPSERT_SQL, (
+                        *_app_user_data_upsert_params(cognito_sub, usage_count=increment),
+                        increment,
+                        increment
+                    ))
                     
+            self.invalidate_cached_usage_statistics(cognito_sub)
             logger.info(f"使用回数をインクリメントしました: {cognito_sub} (+{increment})")
             return True
             
@@ -849,27 +1723,78 @@ class DatabaseManager:
             logger.error(f"使用回数インクリメントエラー: {e}")
             return False
     
+    def queue_usage_count(self, cognito_sub: str, increment: int = 1):
+        """使用回数の加算を予約（短い遅延の間の加算をユーザーごとに合算してまとめて書き込む）"""
+        self._pending_usage[cognito_sub] = self._pending_usage.get(cognito_sub, 0) + increment
+        
+        # バッチサイズ（ユーザー数）に達したら即座に、それ以外は短い遅延の後にまとめて書き込む
+        if self._usage_flush_task is None or self._usage_flush_task.done():
+            delay = 0 if len(self._pending_usage) >= self.usage_batch_size else self.usage_flush_delay
+            self._usage_flush_task = asyncio.create_task(self._flush_usage_after(delay))
+    
+    async def _flush_usage_after(self, delay: float):
+        """指定秒数待ってから予約済みの使用回数を書き込む（書き込み中に追加された分も続けて書き込む）"""
+        try:
+            while self._pending_usage:
+                await asyncio.sleep(delay)
+                if not await self.flush_usage_counts():
+                    # 書き込み失敗時の再試行は定期書き込みループに任せる
+                    break
+        except Exception as e:
+            logger.error(f"使用回数書き込みタスクエラー: {e}")
+    
+    async def flush_usage_counts(self) -> int:
+        """予約された使用回数の加算を複数行のUPSERTでまとめて書き込む"""
+        if not self._pending_usage:
+            return 0
+        
+        # イベントループ上で入れ替えるため、書き込み中の追加分は次回に回る
+        pending, self._pending_usage = self._pending_usage, {}
+        items = list(pending.items())
+        # 同じバッチの行は同じ更新時刻で書き込む
+        now = datetime.utcnow()
+        written = 0
+        
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    while written < len(items):
+                        batch = items[written:written + self.usage_batch_size]
+                        await cursor.executemany(APP_USER_USAGE_BATCH_UPSERT_SQL, [
+                            _app_user_usage_batch_params(cognito_sub, increment, now)
+                            for cognito_sub, increment in batch
+                        ])
+                        written += len(batch)
+                        
+            return written
+            
+        except Exception as e:
+            logger.error(f"使用回数一括更新エラー: {e}")
+            # 書き込めなかった分は書き込み中に追加された分と合算して次回の書き込みで再試行
+            # （書き込み済みのバッチは自動コミット済みのため、二重に加算しないよう除く）
+            for cognito_sub, increment in items[written:]:
+                self._pending_usage[cognito_sub] = self._pending_usage.get(cognito_sub, 0) + increment
+            return written
+            
+        finally:
+            for cognito_sub, _ in items[:written]:
+                self.invalidate_cached_usage_statistics(cognito_sub)
+    
     async def update_subscription_status(self, cognito_sub: str, status: str) -> bool:
-        """サブスクリプション状態を更新"""
+        """サブスクリプション状態を更新（データが存在しない場合は初期値で作成）"""
         try:
             if status not in ['free', 'premium']:
                 logger.error(f"無効なサブスクリプション状態: {status}")
                 return False
             
-            # 現在のデータを取得
-            current_data = await self.get_app_user_data_by_cognito_sub(cognito_sub)
-            if not current_data:
-                # データが存在しない場合は作成
-                await self.create_app_user_data(cognito_sub)
-            
             async with self.pool.acquire() as conn:
                 async with conn.cursor() as cursor:
-                    await cursor.execute("""
-                        UPDATE app_user_data 
-                        SET subscription_status = %s, updated_at = %s
-                        WHERE cognito_sub = %s
-                    """, (status, datetime.utcnow(), cognito_sub))
+                    await cursor.execute(APP_USER_SUBSCRIPTION_UPSERT_SQL, (
+                        *_app_user_data_upsert_params(cognito_sub, subscription_status=status),
+                        status
+                    ))
                     
+            self.invalidate_cached_usage_statistics(cognito_sub)
             logger.info(f"サブスクリプション状態を更新しました: {cognito_sub} -> {status}")
             return True
             
@@ -885,11 +1810,12 @@ class DatabaseManager:
                     await cursor.execute("""
                         UPDATE app_user_data 
                         SET monthly_usage_count = 0, 
-                            last_usage_reset = %s,
-                            updated_at = %s
+                            last_usage_reset = UTC_TIMESTAMP(),
+                            updated_at = UTC_TIMESTAMP()
                         WHERE cognito_sub = %s
-                    """, (datetime.utcnow(), datetime.utcnow(), cognito_sub))
+                    """, (cognito_sub,))
                     
+            self.invalidate_cached_usage_statistics(cognito_sub)
             logger.info(f"月次使用回数をリセットしました: {cognito_sub}")
             return True
             
@@ -897,20 +1823,69 @@ class DatabaseManager:
             logger.error(f"月次使用回数リセットエラー: {e}")
             return False
     
+    async def reset_monthly_usage_bulk(self, cognito_subs: List[str]) -> int:
+        """
+        複数ユーザーの月次使用回数をまとめてリセット（一定件数ごとに1回のUPDATEで実行）
+        
+        Args:
+            cognito_subs: 対象のCognito Subのリスト
+            
+        Returns:
+            int: リセットした行数（エラー時はそれまでに反映した行数）
+        """
+        reset_count = 0
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    for start in range(0, len(cognito_subs), self.bulk_update_batch_size):
+                        batch = cognito_subs[start:start + self.bulk_update_batch_size]
+                        placeholders = ', '.join(['%s'] * len(batch))
+                        await cursor.execute(f"""
+                            UPDATE app_user_data 
+                            SET monthly_usage_count = 0, 
+                                last_usage_reset = UTC_TIMESTAMP(),
+                                updated_at = UTC_TIMESTAMP()
+                            WHERE cognito_sub IN ({placeholders})
+                        """, batch)
+                        reset_count += cursor.rowcount
+                        for cognito_sub in batch:
+                            self.invalidate_cached_usage_statistics(cognito_sub)
+                        
+            logger.info(f"月次使用回数をまとめてリセットしました: {reset_count}件")
+            return reset_count
+            
+        except Exception as e:
+            logger.error(f"月次使用回数一括リセットエラー: {e}")
+            return reset_count
+    
     async def get_user_usage_statistics(self, cognito_sub: str) -> Optional[dict]:
-        """ユーザーの使用統計を取得"""
+        """ユーザーの使用統計を取得（短時間キャッシュ）"""
         try:
-            app_data = await self.get_app_user_data_by_cognito_sub(cognito_sub)
-            if not app_data:
+            cached = self._usage_stats_cache.get(cognito_sub)
+            if cached is not None:
+                return dict(cached)
+            
+            generation = self._lookup_cache_generation
+            async with self.pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    # 月次リセットと統計カラムの取得を1回の往復で実行
+                    await cursor.execute(USAGE_STATISTICS_SQL, (cognito_sub, cognito_sub))
+                    rows = await self._drain_results(cursor)
+            if not rows:
                 return None
             
-            return {
-                'total_usage': app_data.get('usage_count', 0),
-                'monthly_usage': app_data.get('monthly_usage_count', 0),
-                'subscription_status': app_data.get('subscription_status', 'free'),
-                'last_usage_reset': app_data.get('last_usage_reset'),
-                'member_since': app_data.get('created_at')
+            usage_count, monthly_usage_count, subscription_status, last_usage_reset, created_at = rows[0]
+            stats = {
+                'total_usage': usage_count or 0,
+                'monthly_usage': monthly_usage_count or 0,
+                'subscription_status': subscription_status or 'free',
+                'last_usage_reset': last_usage_reset,
+                'member_since': created_at
             }
+            # 取得中に更新された場合は古い値をキャッシュしない
+            if generation == self._lookup_cache_generation:
+                self._usage_stats_cache[cognito_sub] = stats
+            return dict(stats)
             
         except Exception as e:
             logger.error(f"使用統計取得エラー: {e}")
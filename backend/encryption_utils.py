@@ -3,9 +3,13 @@
 """
 import os
 import base64
+import binascii
 import logging
+import functools
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from dotenv import load_dotenv
 
@@ -13,6 +17,40 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# AES-GCM形式の暗号化トークンの接頭辞（Base64URLに含まれない文字で旧Fernet形式と区別）
+AESGCM_TOKEN_PREFIX = "v2:"
+
+# AES-GCMのノンス長・認証タグ長（バイト）
+AESGCM_NONCE_SIZE = 12
+AESGCM_TAG_SIZE = 16
+
+# Fernetトークンの先頭（バージョンバイト0x80をBase64エンコードしたもの）
+FERNET_TOKEN_HEADER = b'gAAAAA'
+
+# PBKDF2の固定ソルト（本番環境では動的ソルトを推奨）
+PBKDF2_SALT = b'cognito_refresh_token_salt_2024'
+PBKDF2_ITERATIONS = 100000
+
+
+@functools.lru_cache(maxsize=4)
+def _derive_fernet_key(password: str) -> bytes:
+    """
+    パスワードからFernetキーを導出（同一プロセス内では同じパスワードに対して1回のみ計算）
+    
+    Args:
+        password: パスワード文字列
+        
+    Returns:
+        bytes: 導出されたキー（Base64エンコード）
+    """
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=PBKDF2_SALT,
+        iterations=PBKDF2_ITERATIONS,
+    )
+    return base64.urlsafe_b64encode(kdf.derive(password.encode()))
+
 class EncryptionUtils:
     """暗号化ユーティリティクラス"""
     
@@ -25,9 +63,17 @@ class EncryptionUtils:
             logger.warning("ENCRYPTION_KEYが設定されていません。開発用デフォルトキーを使用します。")
             self.encryption_key = "dev-encryption-key-change-in-production"
         
-        # Fernetキーを生成
-        self.fernet_key = self._derive_key(self.encryption_key)
+        # Fernetキーを生成（旧形式で保存済みのトークンの復号用）
+        # 導出済みのキー（ENCRYPTION_FERNET_KEY）が設定されていればPBKDF2を省略する
+        derived_key = os.getenv('ENCRYPTION_FERNET_KEY')
+        if derived_key:
+            self.fernet_key = derived_key.encode()
+        else:
+            self.fernet_key = self._derive_key(self.encryption_key)
         self.fernet = Fernet(self.fernet_key)
+        
+        # AES-GCMキーを生成（Fernetキーとは用途別に導出）
+        self.aesgcm = AESGCM(self._derive_aesgcm_key(self.fernet_key))
     
     def _derive_key(self, password: str) -> bytes:
         """
@@ -40,42 +86,49 @@ class EncryptionUtils:
             bytes: 導出されたキー
         """
         try:
-            # 固定ソルト（本番環境では動的ソルトを推奨）
-            salt = b'cognito_refresh_token_salt_2024'
-            
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=salt,
-                iterations=100000,
-            )
-            
-            key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
-            return key
+            return _derive_fernet_key(password)
             
         except Exception as e:
             logger.error(f"キー導出エラー: {e}")
             raise
     
+    def _derive_aesgcm_key(self, fernet_key: bytes) -> bytes:
+        """
+        導出済みのキーからAES-GCM用の256ビットキーを導出
+        
+        Args:
+            fernet_key: PBKDF2で導出したキー（Base64エンコード）
+            
+        Returns:
+            bytes: AES-GCMキー
+        """
+        return HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=None,
+            info=b'cognito_refresh_token_aesgcm',
+        ).derive(base64.urlsafe_b64decode(fernet_key))
+    
     def encrypt_token(self, token: str) -> str:
         """
-        トークンを暗号化
+        トークンを暗号化（AES-GCM）
         
         Args:
             token: 暗号化するトークン
             
         Returns:
-            str: 暗号化されたトークン（Base64エンコード）
+            str: 暗号化されたトークン（接頭辞 + Base64エンコード）
         """
         try:
             if not token:
                 return ""
             
-            # トークンを暗号化
-            encrypted_token = self.fernet.encrypt(token.encode())
+            # ノンス(12) || 暗号文 || 認証タグ(16)
+            nonce = os.urandom(AESGCM_NONCE_SIZE)
+            encrypted_token = nonce + self.aesgcm.encrypt(nonce, token.encode(), None)
             
             # Base64エンコードして文字列として返す
-            return base64.urlsafe_b64encode(encrypted_token).decode()
+            return AESGCM_TOKEN_PREFIX + base64.urlsafe_b64encode(encrypted_token).decode()
             
         except Exception as e:
             logger.error(f"トークン暗号化エラー: {e}")
@@ -95,7 +148,11 @@ class EncryptionUtils:
             if not encrypted_token:
                 return ""
             
-            # Base64デコード
+            if encrypted_token.startswith(AESGCM_TOKEN_PREFIX):
+                encrypted_data = base64.urlsafe_b64decode(encrypted_token[len(AESGCM_TOKEN_PREFIX):].encode())
+                return self.decrypt_token_fast(encrypted_data).decode()
+            
+            # 旧Fernet形式（次回のトークン更新時にAES-GCM形式で保存し直される）
             encrypted_data = base64.urlsafe_b64decode(encrypted_token.encode())
             
             # 復号化
@@ -107,9 +164,22 @@ class EncryptionUtils:
             logger.error(f"トークン復号化エラー: {e}")
             raise
     
+    def decrypt_token_fast(self, token_bytes: bytes) -> bytes:
+        """
+        AES-GCM形式の暗号化データを復号化
+        
+        Args:
+            token_bytes: ノンス(12) || 暗号文 || 認証タグ(16)
+            
+        Returns:
+            bytes: 復号化されたデータ
+        """
+        nonce, ciphertext = token_bytes[:AESGCM_NONCE_SIZE], token_bytes[AESGCM_NONCE_SIZE:]
+        return self.aesgcm.decrypt(nonce, ciphertext, None)
+    
     def is_token_encrypted(self, token: str) -> bool:
         """
-        トークンが暗号化されているかチェック
+        トークンが暗号化されているかチェック（形式のみを確認し、復号化は行わない）
         
         Args:
             token: チェックするトークン
@@ -117,21 +187,19 @@ class EncryptionUtils:
         Returns:
             bool: 暗号化されている場合True
         """
+        if not token:
+            return False
+        
         try:
-            if not token:
-                return False
-            
-            # Base64デコードを試行
-            try:
-                encrypted_data = base64.urlsafe_b64decode(token.encode())
-                # 復号化を試行
-                self.fernet.decrypt(encrypted_data)
-                return True
-            except:
-                return False
-                
-        except Exception as e:
-            logger.error(f"暗号化チェックエラー: {e}")
+            if token.startswith(AESGCM_TOKEN_PREFIX):
+                # ノンスと認証タグを含む長さがあるか
+                encrypted_data = base64.urlsafe_b64decode(token[len(AESGCM_TOKEN_PREFIX):].encode())
+                return len(encrypted_data) >= AESGCM_NONCE_SIZE + AESGCM_TAG_SIZE
+            
+            # 旧Fernet形式: Fernetトークン（バージョンバイト0x80のBase64）をさらにBase64エンコードしたもの
+            return base64.urlsafe_b64decode(token.encode()).startswith(FERNET_TOKEN_HEADER)
+            
+        except (binascii.Error, ValueError):
             return False
 
 
@@ -3,29 +3,102 @@
 認証、SMS、セッション、課金、セキュリティに関するログを記録
 CloudWatch Logs統合対応
 """
+import asyncio
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
+import time
 from datetime import datetime
 from database import db_manager
 from models import AuthLogCreate
 import json
 import os
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 # CloudWatch Logs統合設定
 ENABLE_CLOUDWATCH_LOGS = os.getenv("ENABLE_CLOUDWATCH_LOGS", "false").lower() == "true"
 CLOUDWATCH_LOG_GROUP = os.getenv("CLOUDWATCH_LOG_GROUP", "/aws/application/gijiroku-maker")
 CLOUDWATCH_LOG_STREAM = os.getenv("CLOUDWATCH_LOG_STREAM", "authentication-logs")
+# 送信バッファ（上限を超えた分は破棄して件数のみ記録）と、まとめて送信するまでの待ち時間
+CLOUDWATCH_QUEUE_SIZE = int(os.getenv("CLOUDWATCH_QUEUE_SIZE", 10000))
+CLOUDWATCH_FLUSH_DELAY = int(os.getenv("CLOUDWATCH_FLUSH_DELAY_MS", 1000)) / 1000
+
+# PutLogEvents の制限（1回あたりのイベント数・合計バイト数、イベントごとに加算されるバイト数、1イベントの最大バイト数）
+CLOUDWATCH_MAX_BATCH_EVENTS = 10000
+CLOUDWATCH_MAX_BATCH_BYTES = 1048576
+CLOUDWATCH_EVENT_OVERHEAD_BYTES = 26
+CLOUDWATCH_MAX_EVENT_BYTES = 262144 - CLOUDWATCH_EVENT_OVERHEAD_BYTES
+
+# セキュリティエラータイプごとの危険度
+HIGH_SEVERITY_SECURITY_ERROR_TYPES = frozenset({
+    "sql_injection",
+    "xss_attack",
+    "brute_force_attack",
+    "brute_force_token_attack",
+    "security_threshold_exceeded",
+    "account_takeover_attempt",
+    "credential_stuffing",
+    "suspicious_login_pattern"
+})
+MEDIUM_SEVERITY_SECURITY_ERROR_TYPES = frozenset({
+    "csrf_validation_failed",
+    "invalid_websocket_token",
+    "websocket_auth_failed",
+    "token_verification_error",
+    "rate_limit_exceeded",
+    "invalid_token",
+    "expired_session",
+    "unauthorized_endpoint_access"
+})
+
+# 不正アクセスタイプごとの危険度
+HIGH_SEVERITY_ACCESS_TYPES = frozenset({
+    "privilege_escalation",
+    "admin_endpoint_access",
+    "data_exfiltration_attempt",
+    "unauthorized_api_access"
+})
+MEDIUM_SEVERITY_ACCESS_TYPES = frozenset({
+    "invalid_token",
+    "expired_session",
+    "unauthorized_endpoint",
+    "cross_origin_request",
+    "suspicious_user_agent"
+})
+
+# 警告レベルで出力する認証失敗タイプ
+WARNING_AUTH_FAILURE_TYPES = frozenset({"account_locked", "rate_limit_exceeded", "brute_force_detected"})
+
+
+def _json_dumps(value: Any) -> str:
+    """ログ出力用のJSON文字列を生成（orjsonがあれば使用、非対応の型は文字列化）"""
+    if orjson is not None:
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(value, ensure_ascii=False, default=str)
 
 
 class LoggingService:
-    """ログ記録サービスクラス"""
+    """
+    ログ記録サービスクラス
+    
+    AuthLogCreate は内部で組み立てた値のみを渡し、保存時に AuthLog として検証されるため
+    model_construct で検証を省略して構築する
+    """
     
     def __init__(self):
         """ログサービスを初期化"""
         self.db = db_manager
         
+        # CloudWatch Logs の送信バッファ（(タイムスタンプ, メッセージ, バイト数) を予約順に保持）
+        self._pending_cloudwatch_events: List[Tuple[int, str, int]] = []
+        self._cloudwatch_flush_task = None
+        self.dropped_cloudwatch_events = 0
+        
         # CloudWatch Logs クライアントの初期化（オプション）
         self.cloudwatch_client = None
         if ENABLE_CLOUDWATCH_LOGS:
@@ -38,42 +111,110 @@ class LoggingService:
             except Exception as e:
                 logger.error(f"CloudWatch Logs初期化エラー: {e}")
     
-    async def _send_to_cloudwatch(self, log_entry: Dict[str, Any]) -> bool:
+    def _send_to_cloudwatch(self, log_entry: Dict[str, Any]) -> bool:
         """
-        CloudWatch Logsにログエントリを送信
+        CloudWatch Logsへのログエントリ送信を予約（一定間隔ごとにまとめて送信する）
+        バッファへの追加のみで待機しないため同期メソッドとする（無効時は何もせずFalseを返す）
         
         Args:
             log_entry: ログエントリ
             
         Returns:
-            bool: 送信成功/失敗
+            bool: 予約成功/失敗（バッファが満杯の場合は破棄）
         """
         if not self.cloudwatch_client or not ENABLE_CLOUDWATCH_LOGS:
             return False
         
+        if len(self._pending_cloudwatch_events) >= CLOUDWATCH_QUEUE_SIZE:
+            self.dropped_cloudwatch_events += 1
+            return False
+        
         try:
-            # ログメッセージを構築
-            log_message = json.dumps(log_entry, ensure_ascii=False, default=str)
+            # ログメッセージを構築（1イベントの上限を超える分は切り詰める）
+            log_message = _json_dumps(log_entry)
+            encoded = log_message.encode('utf-8')
+            if len(encoded) > CLOUDWATCH_MAX_EVENT_BYTES:
+                encoded = encoded[:CLOUDWATCH_MAX_EVENT_BYTES]
+                log_message = encoded.decode('utf-8', errors='ignore')
             
-            # CloudWatch Logsに送信
-            response = self.cloudwatch_client.put_log_events(
-                logGroupName=CLOUDWATCH_LOG_GROUP,
-                logStreamName=CLOUDWATCH_LOG_STREAM,
-                logEvents=[
-                    {
-                        'timestamp': int(datetime.utcnow().timestamp() * 1000),
-                        'message': log_message
-                    }
-                ]
-            )
+            # タイムスタンプは予約時点で確定させ、送信が遅れても時系列を保つ
+            self._pending_cloudwatch_events.append((
+                time.time_ns() // 1_000_000,
+                log_message,
+                len(encoded) + CLOUDWATCH_EVENT_OVERHEAD_BYTES
+            ))
+            
+            if self._cloudwatch_flush_task is None or self._cloudwatch_flush_task.done():
+                self._cloudwatch_flush_task = asyncio.create_task(self._flush_cloudwatch_after(CLOUDWATCH_FLUSH_DELAY))
             
-            logger.debug(f"CloudWatch Logsに送信成功: {response.get('nextSequenceToken', 'N/A')}")
             return True
             
         except Exception as e:
-            logger.error(f"CloudWatch Logs送信エラー: {e}")
+            logger.error(f"CloudWatch Logs送信予約エラー: {e}")
             return False
     
+    async def _flush_cloudwatch_after(self, delay: float):
+        """指定秒数待ってから予約済みのログを送信する（送信中に追加された分も続けて送信する）"""
+        try:
+            while self._pending_cloudwatch_events:
+                await asyncio.sleep(delay)
+                if not await self.flush_cloudwatch_logs():
+                    # 送信失敗時は次回の予約時に再試行する
+                    break
+        except Exception as e:
+            logger.error(f"CloudWatch Logs送信タスクエラー: {e}")
+    
+    async def flush_cloudwatch_logs(self) -> int:
+        """
+        予約されたログを PutLogEvents の制限内でまとめて送信
+        
+        Returns:
+            int: 送信したイベント数
+        """
+        if not self._pending_cloudwatch_events:
+            return 0
+        
+        # イベントループ上で入れ替えるため、送信中の追加分は次回に回る
+        events, self._pending_cloudwatch_events = self._pending_cloudwatch_events, []
+        # PutLogEvents は1回の呼び出し内でタイムスタンプ順である必要がある
+        events.sort(key=lambda event: event[0])
+        
+        sent = 0
+        try:
+            while sent < len(events):
+                batch_end = sent
+                batch_bytes = 0
+                while (batch_end < len(events)
+                       and batch_end - sent < CLOUDWATCH_MAX_BATCH_EVENTS
+                       and batch_bytes + events[batch_end][2] <= CLOUDWATCH_MAX_BATCH_BYTES):
+                    batch_bytes += events[batch_end][2]
+                    batch_end += 1
+                
+                # boto3 の呼び出しはブロッキングのため、イベントループを止めないようスレッドで実行
+                response = await asyncio.to_thread(
+                    self.cloudwatch_client.put_log_events,
+                    logGroupName=CLOUDWATCH_LOG_GROUP,
+                    logStreamName=CLOUDWATCH_LOG_STREAM,
+                    logEvents=[
+                        {'timestamp': timestamp, 'message': message}
+                        for timestamp, message, _ in events[sent:batch_end]
+                    ]
+                )
+                sent = batch_end
+                
+                logger.debug(f"CloudWatch Logsに送信成功: {response.get('nextSequenceToken', 'N/A')}")
+            
+            return sent
+            
+        except Exception as e:
+            logger.error(f"CloudWatch Logs送信エラー: {e}")
+            # 未送信分は上限の範囲で次回の送信で再試行
+            unsent = events[sent:]
+            room = CLOUDWATCH_QUEUE_SIZE - len(self._pending_cloudwatch_events)
+            self.dropped_cloudwatch_events += max(0, len(unsent) - room)
+            self._pending_cloudwatch_events[:0] = unsent[:max(0, room)]
+            return sent
+    
     async def log_auth_attempt(
         self,
         phone_number: str,
@@ -96,7 +237,7 @@ class LoggingService:
             bool: ログ記録の成功/失敗
         """
         try:
-            log_data = AuthLogCreate(
+            log_data = AuthLogCreate.model_construct(
                 user_id=user_id,
                 phone_number=phone_number,
                 event_type="auth_attempt",
@@ -108,14 +249,16 @@ class LoggingService:
             log = await self.db.create_auth_log(log_data)
             
             if log:
-                logger.info(
-                    f"認証試行ログを記録しました: "
-                    f"電話番号={phone_number}, 結果={result}, "
-                    f"詳細={json.dumps(details, ensure_ascii=False)}"
-                )
+                # 出力されないレベルの場合は詳細のJSON文字列化を省略する
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info(
+                        f"認証試行ログを記録しました: "
+                        f"電話番号={phone_number}, 結果={result}, "
+                        f"詳細={_json_dumps(details)}"
+                    )
                 
                 # CloudWatch Logsに送信
-                await self._send_to_cloudwatch({
+                self._send_to_cloudwatch({
                     "event_type": "auth_attempt",
                     "user_id": user_id,
                     "phone_number": phone_number,
@@ -156,7 +299,7 @@ class LoggingService:
             bool: ログ記録の成功/失敗
         """
         try:
-            log_data = AuthLogCreate(
+            log_data = AuthLogCreate.model_construct(
                 user_id=user_id,
                 phone_number=phone_number,
                 event_type="sms_sent",
@@ -209,7 +352,7 @@ class LoggingService:
             # 操作タイプを詳細に含める
             details_with_operation = {**details, "operation": operation}
             
-            log_data = AuthLogCreate(
+            log_data = AuthLogCreate.model_construct(
                 user_id=user_id,
                 phone_number=phone_number,
                 event_type="session_operation",
@@ -267,7 +410,7 @@ class LoggingService:
                 "processed_at": datetime.utcnow().isoformat()
             }
             
-            log_data = AuthLogCreate(
+            log_data = AuthLogCreate.model_construct(
                 user_id=user_id,
                 phone_number=phone_number,
                 event_type="billing_operation",
@@ -315,15 +458,18 @@ class LoggingService:
             bool: ログ記録の成功/失敗
         """
         try:
+            # 詳細とCloudWatch Logsで同じ検出時刻を使う
+            detected_at = datetime.utcnow().isoformat()
+            
             # エラータイプを詳細に含める
             details_with_error = {
                 **details,
                 "error_type": error_type,
-                "detected_at": datetime.utcnow().isoformat(),
+                "detected_at": detected_at,
                 "severity": self._get_security_severity(error_type)
             }
             
-            log_data = AuthLogCreate(
+            log_data = AuthLogCreate.model_construct(
                 user_id=user_id,
                 email=email,
                 event_type="security_error",
@@ -341,14 +487,14 @@ class LoggingService:
                         f"【高危険度】セキュリティエラーログを記録しました: "
                         f"メールアドレス={email}, エラータイプ={error_type}, "
                         f"IPアドレス={ip_address}, "
-                        f"詳細={json.dumps(details, ensure_ascii=False)}"
+                        f"詳細={_json_dumps(details)}"
                     )
                 elif severity == 'medium':
                     logger.warning(
                         f"【中危険度】セキュリティエラーログを記録しました: "
                         f"メールアドレス={email}, エラータイプ={error_type}, "
                         f"IPアドレス={ip_address}, "
-                        f"詳細={json.dumps(details, ensure_ascii=False)}"
+                        f"詳細={_json_dumps(details)}"
                     )
                 else:
                     logger.info(
@@ -358,7 +504,7 @@ class LoggingService:
                     )
                 
                 # CloudWatch Logsに送信（セキュリティログは重要なので必ず送信）
-                await self._send_to_cloudwatch({
+                self._send_to_cloudwatch({
                     "event_type": "security_error",
                     "user_id": user_id,
                     "email": email,
@@ -366,7 +512,7 @@ class LoggingService:
                     "severity": severity,
                     "details": details,
                     "ip_address": ip_address,
-                    "timestamp": datetime.utcnow().isoformat(),
+                    "timestamp": detected_at,
                     "alert_level": "critical" if severity == "high" else "warning" if severity == "medium" else "info"
                 })
                 
@@ -407,7 +553,7 @@ class LoggingService:
                 "severity": "high"
             }
             
-            log_data = AuthLogCreate(
+            log_data = AuthLogCreate.model_construct(
                 user_id=user_id,
                 email=email,
                 event_type="cognito_brute_force_attack",
@@ -464,7 +610,7 @@ class LoggingService:
                 "severity": self._get_access_severity(access_type)
             }
             
-            log_data = AuthLogCreate(
+            log_data = AuthLogCreate.model_construct(
                 user_id=user_id,
                 email=email,
                 event_type="cognito_unauthorized_access",
@@ -482,7 +628,7 @@ class LoggingService:
                         f"【セキュリティ警告】Cognito不正アクセス試行を検出しました: "
                         f"メールアドレス={email}, アクセスタイプ={access_type}, "
                         f"IPアドレス={ip_address}, "
-                        f"詳細={json.dumps(details, ensure_ascii=False)}"
+                        f"詳細={_json_dumps(details)}"
                     )
                 else:
                     logger.warning(
@@ -529,7 +675,7 @@ class LoggingService:
                 "severity": self._get_security_severity(error_type)
             }
             
-            log_data = AuthLogCreate(
+            log_data = AuthLogCreate.model_construct(
                 user_id=user_id,
                 email=email,
                 event_type="cognito_security_error",
@@ -547,7 +693,7 @@ class LoggingService:
                         f"【高危険度】Cognitoセキュリティエラーを検出しました: "
                         f"メールアドレス={email}, エラータイプ={error_type}, "
                         f"IPアドレス={ip_address}, "
-                        f"詳細={json.dumps(details, ensure_ascii=False)}"
+                        f"詳細={_json_dumps(details)}"
                     )
                 elif severity == 'medium':
                     logger.warning(
@@ -595,17 +741,20 @@ class LoggingService:
             bool: ログ記録の成功/失敗
         """
         try:
+            # 詳細とCloudWatch Logsで同じ処理時刻を使う
+            processed_at = datetime.utcnow().isoformat()
+            
             # 課金金額と詳細を含める
             details_with_billing = {
                 **details,
                 "service_name": service_name,
                 "amount": amount,
                 "currency": "JPY",
-                "processed_at": datetime.utcnow().isoformat(),
+                "processed_at": processed_at,
                 "billing_service": True
             }
             
-            log_data = AuthLogCreate(
+            log_data = AuthLogCreate.model_construct(
                 user_id=user_id,
                 email=user_identifier,
                 event_type="billing_service_execution",
@@ -637,7 +786,7 @@ class LoggingService:
                     )
                 
                 # CloudWatch Logsに送信（課金ログは重要なので必ず送信）
-                await self._send_to_cloudwatch({
+                self._send_to_cloudwatch({
                     "event_type": "billing_service_execution",
                     "user_id": user_id,
                     "user_identifier": user_identifier,
@@ -647,7 +796,7 @@ class LoggingService:
                     "result": result,
                     "details": details,
                     "ip_address": ip_address,
-                    "timestamp": datetime.utcnow().isoformat(),
+                    "timestamp": processed_at,
                     "severity": "high" if result == "failure" else "normal"
                 })
                 
@@ -670,31 +819,9 @@ class LoggingService:
         Returns:
             str: 危険度 ("low", "medium", "high")
         """
-        high_severity_types = [
-            "sql_injection",
-            "xss_attack", 
-            "brute_force_attack",
-            "brute_force_token_attack",
-            "security_threshold_exceeded",
-            "account_takeover_attempt",
-            "credential_stuffing",
-            "suspicious_login_pattern"
-        ]
-        
-        medium_severity_types = [
-            "csrf_validation_failed",
-            "invalid_websocket_token",
-            "websocket_auth_failed",
-            "token_verification_error",
-            "rate_limit_exceeded",
-            "invalid_token",
-            "expired_session",
-            "unauthorized_endpoint_access"
-        ]
-        
-        if error_type in high_severity_types:
+        if error_type in HIGH_SEVERITY_SECURITY_ERROR_TYPES:
             return "high"
-        elif error_type in medium_severity_types:
+        elif error_type in MEDIUM_SEVERITY_SECURITY_ERROR_TYPES:
             return "medium"
         else:
             return "low"
@@ -709,24 +836,9 @@ class LoggingService:
         Returns:
             str: 危険度 ("low", "medium", "high")
         """
-        high_severity_types = [
-            "privilege_escalation",
-            "admin_endpoint_access",
-            "data_exfiltration_attempt",
-            "unauthorized_api_access"
-        ]
-        
-        medium_severity_types = [
-            "invalid_token",
-            "expired_session",
-            "unauthorized_endpoint",
-            "cross_origin_request",
-            "suspicious_user_agent"
-        ]
-        
-        if access_type in high_severity_types:
+        if access_type in HIGH_SEVERITY_ACCESS_TYPES:
             return "high"
-        elif access_type in medium_severity_types:
+        elif access_type in MEDIUM_SEVERITY_ACCESS_TYPES:
             return "medium"
         else:
             return "low"
@@ -763,7 +875,7 @@ class LoggingService:
                 "processed_at": datetime.utcnow().isoformat()
             }
             
-            log_data = AuthLogCreate(
+            log_data = AuthLogCreate.model_construct(
                 user_id=user_id,
                 email=email,
                 event_type="cognito_operation",
@@ -775,11 +887,13 @@ class LoggingService:
             log = await self.db.create_auth_log(log_data)
             
             if log:
-                logger.info(
-                    f"Cognito操作ログを記録しました: "
-                    f"メールアドレス={email}, 操作={operation}, 結果={result}, "
-                    f"詳細={json.dumps(details, ensure_ascii=False)}"
-                )
+                # 出力されないレベルの場合は詳細のJSON文字列化を省略する
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info(
+                        f"Cognito操作ログを記録しました: "
+                        f"メールアドレス={email}, 操作={operation}, 結果={result}, "
+                        f"詳細={_json_dumps(details)}"
+                    )
                 return True
             else:
                 logger.error(f"Cognito操作ログの記録に失敗しました: {email}")
@@ -811,14 +925,17 @@ class LoggingService:
             bool: ログ記録の成功/失敗
         """
         try:
+            # 詳細とCloudWatch Logsで同じ処理時刻を使う
+            processed_at = datetime.utcnow().isoformat()
+            
             details_with_registration = {
                 **details,
                 "operation": "user_registration",
                 "cognito_service": True,
-                "processed_at": datetime.utcnow().isoformat()
+                "processed_at": processed_at
             }
             
-            log_data = AuthLogCreate(
+            log_data = AuthLogCreate.model_construct(
                 user_id=user_id,
                 email=email,
                 event_type="cognito_user_registration",
@@ -837,14 +954,14 @@ class LoggingService:
                 )
                 
                 # CloudWatch Logsに送信（ユーザー登録は重要なイベント）
-                await self._send_to_cloudwatch({
+                self._send_to_cloudwatch({
                     "event_type": "cognito_user_registration",
                     "user_id": user_id,
                     "email": email,
                     "result": result,
                     "details": details,
                     "ip_address": ip_address,
-                    "timestamp": datetime.utcnow().isoformat(),
+                    "timestamp": processed_at,
                     "severity": "normal"
                 })
                 
@@ -886,7 +1003,7 @@ class LoggingService:
                 "processed_at": datetime.utcnow().isoformat()
             }
             
-            log_data = AuthLogCreate(
+            log_data = AuthLogCreate.model_construct(
                 user_id=user_id,
                 email=email,
                 event_type="cognito_user_login",
@@ -947,7 +1064,7 @@ class LoggingService:
                 "processed_at": datetime.utcnow().isoformat()
             }
             
-            log_data = AuthLogCreate(
+            log_data = AuthLogCreate.model_construct(
                 user_id=user_id,
                 email=email,
                 event_type="cognito_user_logout",
@@ -1002,7 +1119,7 @@ class LoggingService:
                 "processed_at": datetime.utcnow().isoformat()
             }
             
-            log_data = AuthLogCreate(
+            log_data = AuthLogCreate.model_construct(
                 user_id=user_id,
                 email=email,
                 event_type="cognito_authentication_failure",
@@ -1015,7 +1132,7 @@ class LoggingService:
             
             if log:
                 # 失敗タイプに応じてログレベルを調整
-                if failure_type in ["account_locked", "rate_limit_exceeded", "brute_force_detected"]:
+                if failure_type in WARNING_AUTH_FAILURE_TYPES:
                     logger.warning(
                         f"【セキュリティ警告】Cognito認証失敗ログを記録しました: "
                         f"メールアドレス={email}, 失敗タイプ={failure_type}, "
@@ -1066,7 +1183,7 @@ class LoggingService:
                 "processed_at": datetime.utcnow().isoformat()
             }
             
-            log_data = AuthLogCreate(
+            log_data = AuthLogCreate.model_construct(
                 user_id=user_id,
                 email=email,
                 event_type="cognito_password_reset",
@@ -1115,21 +1232,7 @@ class LoggingService:
             bool: ログ記録の成功/失敗
         """
         try:
-            details_with_session = {
-                **details,
-                "operation": f"session_{operation}",
-                "cognito_service": True,
-                "processed_at": datetime.utcnow().isoformat()
-            }
-            
-            log_data = AuthLogCreate(
-                user_id=user_id,
-                email=email,
-                event_type="cognito_session_operation",
-                result=result,
-                details=details_with_session,
-                ip_address=ip_address
-            )
+            log_data = self._build_cognito_session_log(email, operation, result, details, user_id, ip_address)
             
             log = await self.db.create_auth_log(log_data)
             
@@ -1148,6 +1251,64 @@ class LoggingService:
             logger.error(f"Cognitoセッション操作ログ記録エラー: {e}")
             return False
 
+    def queue_cognito_session_operation(
+        self,
+        email: str,
+        operation: str,
+        result: str,
+        details: Dict[str, Any],
+        user_id: Optional[str] = None,
+        ip_address: Optional[str] = None
+    ) -> bool:
+        """
+        Cognitoセッション操作ログの書き込みを予約（待機せずにバッチ書き込みに回す）
+        リクエスト処理中の頻度の高い操作ログ用
+        
+        Args:
+            email: メールアドレス
+            operation: 操作タイプ ("auto_refresh", "auto_extend" など)
+            result: 結果 ("success", "failure", "error")
+            details: 詳細情報（セッションID、有効期限など）
+            user_id: ユーザーID（オプション）
+            ip_address: IPアドレス（オプション）
+        
+        Returns:
+            bool: 予約の成功/失敗（バッファが満杯の場合は破棄）
+        """
+        try:
+            log_data = self._build_cognito_session_log(email, operation, result, details, user_id, ip_address)
+            return self.db.queue_auth_log(log_data) is not None
+            
+        except Exception as e:
+            logger.error(f"Cognitoセッション操作ログ予約エラー: {e}")
+            return False
+    
+    def _build_cognito_session_log(
+        self,
+        email: str,
+        operation: str,
+        result: str,
+        details: Dict[str, Any],
+        user_id: Optional[str],
+        ip_address: Optional[str]
+    ) -> AuthLogCreate:
+        """Cognitoセッション操作ログの作成用データを構築"""
+        details_with_session = {
+            **details,
+            "operation": f"session_{operation}",
+            "cognito_service": True,
+            "processed_at": datetime.utcnow().isoformat()
+        }
+        
+        return AuthLogCreate.model_construct(
+            user_id=user_id,
+            email=email,
+            event_type="cognito_session_operation",
+            result=result,
+            details=details_with_session,
+            ip_address=ip_address
+        )
+
     async def log_cognito_sms_verification(
         self,
         email: str,
@@ -1179,7 +1340,7 @@ class LoggingService:
                 "processed_at": datetime.utcnow().isoformat()
             }
             
-            log_data = AuthLogCreate(
+            log_data = AuthLogCreate.model_construct(
                 user_id=user_id,
                 email=email,
                 event_type="cognito_sms_verification",
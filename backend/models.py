@@ -1,6 +1,7 @@
 """
 データベースモデル定義
 """
+import calendar
 from datetime import datetime, timedelta
 from typing import Optional, Any
 from pydantic import BaseModel, Field
@@ -24,6 +25,10 @@ class UserSession(BaseModel):
     access_token: str  # Cognitoアクセストークン
     id_token: Optional[str] = None  # CognitoIDトークン
     refresh_token: Optional[str] = None  # Cognitoリフレッシュトークン
+    # リフレッシュトークンのSHA-256ダイジェスト（DB読み込み時のみ）
+    refresh_token_hash: Optional[bytes] = Field(default=None, exclude=True, repr=False)
+    # 暗号化済みリフレッシュトークン（DB読み込み時のみ、自動リフレッシュでの再SELECTを省略するため保持）
+    encrypted_refresh_token: Optional[str] = Field(default=None, exclude=True, repr=False)
     expires_at: datetime
     created_at: datetime = Field(default_factory=datetime.utcnow)
     last_activity: datetime = Field(default_factory=datetime.utcnow)
@@ -31,6 +36,16 @@ class UserSession(BaseModel):
     client_ip: Optional[str] = None
     user_agent: Optional[str] = None
 
+    @property
+    def last_activity_ts(self) -> int:
+        """最終活動時刻（UTCのUNIX時刻・秒）"""
+        return calendar.timegm(self.last_activity.utctimetuple())
+
+    @property
+    def expires_at_ts(self) -> int:
+        """有効期限（UTCのUNIX時刻・秒）"""
+        return calendar.timegm(self.expires_at.utctimetuple())
+
 
 class AuthLog(BaseModel):
     """認証ログモデル（Cognito統合）"""
@@ -48,7 +63,8 @@ class AuthLog(BaseModel):
 # データベース操作用のクラス
 class UserCreate(BaseModel):
     """ユーザー作成用モデル（Cognito中心管理）"""
-    cognito_user_sub: str  # Cognito User Sub のみ保存
+    cognito_user_sub: str  # Cognito User Sub
+    email: Optional[str] = None  # メールアドレス（ハッシュのみ保存し、メールアドレスでの検索に使用）
 
 
 class SessionCreate(BaseModel):
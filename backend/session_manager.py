@@ -5,7 +5,7 @@ import os
 import logging
 import asyncio
 import json
-import aiomysql
+from asyncmy.cursors import DictCursor
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta
 from database import db_manager
@@ -47,6 +47,7 @@ class SessionManager:
             try:
                 await asyncio.sleep(self.cleanup_interval)
                 await self.cleanup_expired_sessions()
+                await db_manager.purge_inactive_sessions()
             except asyncio.CancelledError:
                 logger.info("セッションクリーンアップループがキャンセルされました")
                 break
@@ -55,13 +56,15 @@ class SessionManager:
                 # エラーが発生してもループを継続
                 await asyncio.sleep(60)  # 1分待ってから再試行
     
-    async def persist_session(self, session_data: SessionCreate, user_agent: Optional[str] = None) -> Optional[UserSession]:
+    async def persist_session(self, session_data: SessionCreate, user_agent: Optional[str] = None,
+                              record_login: bool = False) -> Optional[UserSession]:
         """
         Cognito セッション情報をローカルに永続化
         
         Args:
             session_data: セッション作成データ
             user_agent: ユーザーエージェント
+            record_login: Trueの場合、ユーザーのログイン時刻も同じトランザクションで更新
             
         Returns:
             Optional[UserSession]: 作成されたセッション
@@ -72,7 +75,10 @@ class SessionManager:
                 session_data.user_agent = user_agent
             
             # データベースにセッションを作成
-            session = await db_manager.create_session(session_data)
+            if record_login:
+                session = await db_manager.login_transaction(session_data)
+            else:
+                session = await db_manager.create_session(session_data)
             
             if session:
                 # セッション作成ログ
@@ -117,7 +123,7 @@ class SessionManager:
         """
         try:
             async with db_manager.pool.acquire() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                async with conn.cursor(DictCursor) as cursor:
                     await cursor.execute("""
                         SELECT s.*, u.cognito_user_sub, u.is_active as user_active
                         FROM user_sessions s
@@ -127,7 +133,8 @@ class SessionManager:
                     
                     row = await cursor.fetchone()
                     if row:
-                        session_info = dict(row)
+                        # DictCursor の行はそのまま dict なので複製せずに使う
+                        session_info = row
                         
                         # 有効期限チェック
                         current_time = datetime.utcnow()
@@ -263,7 +270,7 @@ class SessionManager:
         """
         try:
             async with db_manager.pool.acquire() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                async with conn.cursor(DictCursor) as cursor:
                     await cursor.execute("""
                         SELECT session_id, created_at, last_activity, expires_at, 
                                client_ip, user_agent, cognito_user_sub
@@ -278,7 +285,7 @@ class SessionManager:
                     current_time = datetime.utcnow()
                     
                     for row in rows:
-                        session_dict = dict(row)
+                        session_dict = row
                         expires_at = session_dict['expires_at']
                         last_activity = session_dict['last_activity']
                         
@@ -359,14 +366,14 @@ class SessionManager:
         """期限切れセッションを取得"""
         try:
             async with db_manager.pool.acquire() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                async with conn.cursor(DictCursor) as cursor:
                     await cursor.execute("""
                         SELECT session_id, user_id, expires_at, cognito_user_sub
                         FROM user_sessions
                         WHERE expires_at < %s AND is_active = TRUE
                     """, (datetime.utcnow(),))
                     
-                    return [dict(row) for row in await cursor.fetchall()]
+                    return list(await cursor.fetchall())
                     
         except Exception as e:
             logger.error(f"期限切れセッション取得エラー: {e}")
@@ -378,14 +385,14 @@ class SessionManager:
             inactive_threshold = datetime.utcnow() - timedelta(seconds=self.inactive_timeout)
             
             async with db_manager.pool.acquire() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                async with conn.cursor(DictCursor) as cursor:
                     await cursor.execute("""
                         SELECT session_id, user_id, last_activity, cognito_user_sub
                         FROM user_sessions
                         WHERE last_activity < %s AND is_active = TRUE
                     """, (inactive_threshold,))
                     
-                    return [dict(row) for row in await cursor.fetchall()]
+                    return list(await cursor.fetchall())
                     
         except Exception as e:
             logger.error(f"非アクティブセッション取得エラー: {e}")
@@ -470,7 +477,10 @@ class SessionManager:
         """
         try:
             async with db_manager.pool.acquire() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                async with conn.cursor(DictCursor) as cursor:
+                    # 各集計で同じ基準時刻を使う
+                    now = datetime.utcnow()
+                    
                     # アクティブセッション数
                     await cursor.execute("""
                         SELECT COUNT(*) as active_count
@@ -484,11 +494,11 @@ class SessionManager:
                         SELECT COUNT(*) as expired_count
                         FROM user_sessions
                         WHERE expires_at < %s AND is_active = TRUE
-                    """, (datetime.utcnow(),))
+                    """, (now,))
                     expired_result = await cursor.fetchone()
                     
                     # 非アクティブセッション数
-                    inactive_threshold = datetime.utcnow() - timedelta(seconds=self.inactive_timeout)
+                    inactive_threshold = now - timedelta(seconds=self.inactive_timeout)
                     await cursor.execute("""
                         SELECT COUNT(*) as inactive_count
                         FROM user_sessions
@@ -497,7 +507,7 @@ class SessionManager:
                     inactive_result = await cursor.fetchone()
                     
                     # 今日作成されたセッション数
-                    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+                    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
                     await cursor.execute("""
                         SELECT COUNT(*) as today_count
                         FROM user_sessions
@@ -513,7 +523,7 @@ class SessionManager:
                         'cleanup_interval_seconds': self.cleanup_interval,
                         'inactive_timeout_seconds': self.inactive_timeout,
                         'session_lifetime_seconds': self.session_lifetime,
-                        'timestamp': datetime.utcnow().isoformat()
+                        'timestamp': now.isoformat()
                     }
                     
         except Exception as e:
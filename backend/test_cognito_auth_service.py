@@ -378,6 +378,10 @@ class TestCognitoAuthService:
             self.cognito_service.cognito_client.admin_initiate_auth.assert_called_once()
             # get_userはログイン処理では呼ばれない場合があるのでコメントアウト
             # self.cognito_service.cognito_client.get_user.assert_called_once()
+            
+            # セッション作成とログイン時刻の更新が1回の呼び出しで行われることを確認
+            assert mock_session_manager.persist_session.call_args.kwargs['record_login'] is True
+            mock_db_manager.update_user_login.assert_not_called()
     
     @pytest.mark.asyncio
     async def test_login_user_invalid_credentials(self):
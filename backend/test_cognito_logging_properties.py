@@ -201,5 +201,28 @@ class TestCognitoLoggingServiceProperties:
         assert "detected_at" in call_args.details
 
 
+    def test_queued_session_operation_logging(self):
+        """セッション操作ログの予約がDB書き込みを待たずにバッファへ渡されることのテスト"""
+        self.mock_db.queue_auth_log = Mock(return_value=True)
+        
+        success = self.logging_service.queue_cognito_session_operation(
+            "cognito_user", "auto_extend", "success", {"session_id": "session123"}, "user123", "192.168.1.1"
+        )
+        
+        assert success is True
+        self.mock_db.create_auth_log.assert_not_called()
+        
+        call_args = self.mock_db.queue_auth_log.call_args[0][0]
+        assert call_args.event_type == "cognito_session_operation"
+        assert call_args.details["operation"] == "session_auto_extend"
+        assert call_args.details["session_id"] == "session123"
+        
+        # バッファが満杯で破棄された場合は失敗を返す
+        self.mock_db.queue_auth_log.return_value = None
+        assert self.logging_service.queue_cognito_session_operation(
+            "cognito_user", "auto_extend", "success", {"session_id": "session123"}
+        ) is False
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
@@ -0,0 +1,491 @@
+"""
+Cognito トークン管理サービスの単体テスト
+"""
+import pytest
+import asyncio
+import json
+import os
+import time
+import jwt
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+import auth_service
+import cognito_token_service
+from auth_service import AuthService
+from cognito_token_service import CognitoTokenService, MAX_TOKEN_LENGTH
+from database import DatabaseManager, token_digest
+from models import UserSession
+
+# DB はすべてモックしているため、各テスト後のクリーンアップは不要
+pytestmark = pytest.mark.no_db
+
+
+class _TrackingPool:
+    """取得中のコネクション数を記録するテスト用コネクションプール"""
+
+    def __init__(self, row=None):
+        self.held = 0
+        self.cursor = MagicMock()
+        self.cursor.execute = AsyncMock()
+        self.cursor.fetchone = AsyncMock(return_value=row)
+        self.cursor.rowcount = 1
+
+    @asynccontextmanager
+    async def acquire(self):
+        self.held += 1
+        try:
+            conn = MagicMock()
+            conn.cursor = self._cursor
+            yield conn
+        finally:
+            self.held -= 1
+
+    @asynccontextmanager
+    async def _cursor(self, *args):
+        yield self.cursor
+
+
+class TestCognitoTokenService:
+    """Cognitoトークン検証の単体テスト"""
+
+    def setup_method(self):
+        """テストセットアップ"""
+        with patch.dict(os.environ, {
+            'COGNITO_USER_POOL_ID': 'test_pool_id',
+            'COGNITO_CLIENT_ID': 'test_client_id',
+            'AWS_REGION': 'ap-northeast-1'
+        }):
+            self.service = CognitoTokenService()
+
+        # テスト用のRSAキーでJWKSキャッシュを構築
+        self.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = json.loads(RSAAlgorithm.to_jwk(self.private_key.public_key()))
+        jwk['kid'] = 'test-kid'
+        self.service.jwks_cache = {'keys': [jwk]}
+        self.service._publish_jwks_keys(self.service.jwks_cache)
+        self.service.jwks_cache_expiry = time.time() + 3600
+
+    def _make_token(self, **overrides):
+        """テスト用のAccess Tokenを作成"""
+        now = int(time.time())
+        payload = {
+            'sub': 'test-sub',
+            'token_use': 'access',
+            'client_id': 'test_client_id',
+            'iss': self.service.issuer,
+            'exp': now + 3600,
+            'iat': now
+        }
+        payload.update(overrides)
+        return jwt.encode(payload, self.private_key, algorithm='RS256', headers={'kid': 'test-kid'})
+
+    @pytest.mark.asyncio
+    async def test_verify_access_token_success(self):
+        """有効なAccess Tokenの検証テスト"""
+        result = await self.service.verify_access_token(self._make_token())
+
+        assert result['valid'] is True
+        assert result['user_sub'] == 'test-sub'
+        assert result['client_id'] == 'test_client_id'
+
+    @pytest.mark.asyncio
+    async def test_verify_access_token_expired(self):
+        """期限切れAccess Tokenの検証テスト"""
+        token = self._make_token(exp=int(time.time()) - 3600)
+
+        result = await self.service.verify_access_token(token)
+
+        assert result['valid'] is False
+        assert result['error'] == 'token_expired'
+
+    @pytest.mark.asyncio
+    async def test_verify_access_token_within_leeway(self):
+        """猶予時間内の期限切れAccess Tokenは有効として扱われることのテスト"""
+        token = self._make_token(exp=int(time.time()) - self.service.jwt_leeway // 2)
+
+        result = await self.service.verify_access_token(token)
+
+        assert result['valid'] is True
+
+    @pytest.mark.asyncio
+    async def test_verify_access_token_invalid_client_id(self):
+        """client_idが一致しないAccess Tokenの検証テスト"""
+        result = await self.service.verify_access_token(self._make_token(client_id='other'))
+
+        assert result['valid'] is False
+        assert result['error'] == 'invalid_client_id'
+
+    @pytest.mark.asyncio
+    async def test_verify_access_token_invalid_issuer(self):
+        """issuerが一致しないAccess Tokenの検証テスト"""
+        result = await self.service.verify_access_token(self._make_token(iss='https://example.com'))
+
+        assert result['valid'] is False
+        assert result['error'] == 'invalid_issuer'
+
+    @pytest.mark.asyncio
+    async def test_verify_access_token_tampered_signature(self):
+        """署名が改ざんされたAccess Tokenの検証テスト"""
+        header, _, signature = self._make_token(sub='user-a').split('.')
+        forged_payload = self._make_token(sub='user-b').split('.')[1]
+
+        result = await self.service.verify_access_token(f"{header}.{forged_payload}.{signature}")
+
+        assert result['valid'] is False
+        assert result['error'] == 'invalid_token'
+
+    @pytest.mark.asyncio
+    async def test_verify_access_token_rejects_malformed_before_jwks(self):
+        """不正な形式のトークンはJWKSを取得せずに拒否されることのテスト"""
+        with patch.object(self.service, 'get_jwks', new=AsyncMock()) as mock_get_jwks:
+            for token in ['garbage', 'a.b', 'a.b.c.d', 'a.' + 'b' * MAX_TOKEN_LENGTH + '.c']:
+                result = await self.service.verify_access_token(token)
+
+                assert result['valid'] is False
+                assert result['error'] == 'invalid_token_format'
+
+            mock_get_jwks.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_verify_id_token_audience(self):
+        """ID Tokenのaudience検証テスト"""
+        valid_token = self._make_token(token_use='id', aud='test_client_id')
+        invalid_token = self._make_token(token_use='id', aud='other_client')
+
+        assert (await self.service.verify_id_token(valid_token))['valid'] is True
+
+        result = await self.service.verify_id_token(invalid_token)
+        assert result['valid'] is False
+        assert result['error'] == 'invalid_audience'
+
+    @pytest.mark.asyncio
+    async def test_auto_refresh_coalesces_concurrent_calls(self):
+        """同一セッションへの同時自動リフレッシュが1回にまとめられることのテスト"""
+        refresh_result = {
+            'success': True,
+            'new_access_token': 'new-access-token',
+            'new_id_token': None,
+            'expires_in': 3600,
+            'message': 'トークンを自動リフレッシュしました。'
+        }
+        session = SimpleNamespace(session_id='session-1', user_id='user-1')
+
+        async def slow_refresh(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            return refresh_result
+
+        with patch.object(self.service, '_refresh_session_tokens', new=AsyncMock(side_effect=slow_refresh)) as mock_refresh:
+            results = await asyncio.gather(*[
+                self.service._auto_refresh_session_tokens(session, None, b'old-token') for _ in range(10)
+            ])
+            # 完了直後に同じトークンで届いたリクエストも直前の結果を再利用する
+            results.append(await self.service._auto_refresh_session_tokens(session, None, b'old-token'))
+
+        assert mock_refresh.await_count == 1
+        assert all(result['new_access_token'] == 'new-access-token' for result in results)
+        assert not self.service._refresh_inflight
+
+    @pytest.mark.asyncio
+    async def test_validation_cache_hit_skips_verification(self):
+        """同じトークンの再検証ではキャッシュした検証・同期結果を返すことのテスト"""
+        token = self._make_token()
+        session = UserSession(
+            session_id='session-1', user_id='user-1', cognito_user_sub='test-sub',
+            access_token=token, expires_at=datetime.utcnow() + timedelta(hours=1)
+        )
+        user = SimpleNamespace(user_id='user-1', is_active=True)
+        mock_db = SimpleNamespace(
+            get_session_by_token=AsyncMock(return_value=session),
+            get_user_by_id=AsyncMock(return_value=user),
+            queue_session_activity=MagicMock()
+        )
+
+        with patch.object(cognito_token_service, 'db_manager', new=mock_db):
+            first = await self.service.validate_and_sync_session(token)
+            with patch.object(self.service, 'verify_access_token', new=AsyncMock(side_effect=AssertionError('検証は不要'))) as verify:
+                second = await self.service.validate_and_sync_session(token)
+
+        assert first['success'] is True
+        assert second['success'] is True
+        assert second['session'] is session
+        assert second['user'] is user
+        verify.assert_not_called()
+        mock_db.get_session_by_token.assert_awaited_once()
+        assert mock_db.queue_session_activity.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_revocation_through_auth_service_evicts_validation_cache(self):
+        """AuthService経由でログアウトしたトークンは、キャッシュした検証結果で通らないことのテスト"""
+        token = self._make_token()
+        session = UserSession(
+            session_id='session-1', user_id='user-1', cognito_user_sub='test-sub',
+            access_token=token, expires_at=datetime.utcnow() + timedelta(hours=1)
+        )
+        user = SimpleNamespace(user_id='user-1', is_active=True, phone_number=None)
+        db = DatabaseManager.__new__(DatabaseManager)
+        db._init_runtime_state()
+        db.pool = _TrackingPool()
+        db.add_session_invalidation_listener(self.service.invalidate_validation_cache)
+        db.get_session_by_token = AsyncMock(return_value=session)
+        db.get_user_by_id = AsyncMock(return_value=user)
+        db.queue_session_activity = MagicMock()
+        auth = AuthService.__new__(AuthService)
+
+        with patch.object(cognito_token_service, 'db_manager', new=db), \
+                patch.object(auth_service, 'db_manager', new=db), \
+                patch.object(auth_service, 'logging_service', new=AsyncMock()):
+            first = await self.service.validate_and_sync_session(token)
+            logout = await auth.logout(token)
+            with patch.object(self.service, 'verify_access_token', new=AsyncMock(return_value={
+                'valid': False, 'error': 'invalid_token', 'message': '無効なトークンです。'
+            })) as verify:
+                second = await self.service.validate_and_sync_session(token)
+
+        assert first['success'] is True
+        assert logout['success'] is True
+        verify.assert_awaited_once_with(token)
+        assert second['success'] is False
+
+    def test_token_state(self):
+        """有効期限からのトークン状態判定テスト"""
+        now = int(time.time())
+
+        assert self.service._token_state(now + 3600) == 'fresh'
+        assert self.service._token_state(now + self.service.refresh_stale_window // 2) == 'stale'
+        assert self.service._token_state(now - 1) == 'expired'
+
+    @pytest.mark.asyncio
+    async def test_background_refresh_result_returned_for_stale_token(self):
+        """期限間近のトークンはバックグラウンドでリフレッシュされ、次回は新しいトークンが返されることのテスト"""
+        session = SimpleNamespace(session_id='session-1', user_id='user-1')
+        new_token = self._make_token(sub='test-sub')
+        refresh_result = {
+            'success': True,
+            'new_access_token': new_token,
+            'new_id_token': None,
+            'expires_in': 3600,
+            'message': 'トークンを自動リフレッシュしました。'
+        }
+
+        with patch.object(self.service, '_refresh_session_tokens', new=AsyncMock(return_value=refresh_result)):
+            self.service._schedule_background_refresh(session, None, b'stale-token')
+            # 実行中は同じセッションのリフレッシュを重複して開始しない
+            self.service._schedule_background_refresh(session, None, b'stale-token')
+            assert len(self.service._background_refreshes) == 1
+
+            await asyncio.gather(*self.service._background_refreshes.values())
+
+        assert self.service._get_recent_refresh(b'stale-token')['new_access_token'] == new_token
+        validation = await self.service._verify_refreshed_token(refresh_result)
+        assert validation['token_refreshed'] is True
+        assert validation['new_access_token'] == new_token
+
+        # セッション無効化時はリフレッシュ結果も破棄される
+        self.service.invalidate_validation_cache(session_id='session-1')
+        assert self.service._get_recent_refresh(b'stale-token') is None
+
+    @pytest.mark.asyncio
+    async def test_recent_refresh_requires_valid_superseded_token(self):
+        """リフレッシュ結果は、更新前トークンが期限切れ後の猶予内である場合のみ引き継がれることのテスト"""
+        now = int(time.time())
+        session = SimpleNamespace(session_id='session-1', user_id='user-1')
+        new_token = self._make_token()
+        refresh_result = {'success': True, 'new_access_token': new_token, 'new_id_token': None, 'expires_in': 3600}
+        recent_token = self._make_token(exp=now - self.service.recent_refresh_grace // 2)
+        old_token = self._make_token(exp=now - self.service.recent_refresh_grace * 2)
+        forged_token = recent_token[:-4] + ('AAAA' if not recent_token.endswith('AAAA') else 'BBBB')
+        for token in (recent_token, old_token, forged_token):
+            self.service._store_recent_refresh(token_digest(token), session, refresh_result)
+
+        assert await self.service._verify_superseded_token(recent_token) is True
+        assert await self.service._verify_superseded_token(old_token) is False
+        assert await self.service._verify_superseded_token(forged_token) is False
+
+        mock_db = SimpleNamespace(get_session_by_token=AsyncMock(return_value=None))
+        with patch.object(cognito_token_service, 'db_manager', new=mock_db):
+            result = await self.service.validate_and_sync_session(old_token)
+
+        # 猶予を過ぎたトークンは新しいトークンを受け取れず、保存済みの結果も破棄される
+        assert result['success'] is False
+        assert result['error'] == 'token_expired'
+        assert self.service._get_recent_refresh(token_digest(old_token)) is None
+        assert self.service._get_recent_refresh(token_digest(recent_token)) is not None
+
+    @pytest.mark.asyncio
+    async def test_superseded_token_resolves_session_after_background_refresh(self):
+        """バックグラウンドでトークンを入れ替えた後も、旧トークンで同じセッションを引けることのテスト"""
+        old_token = self._make_token()
+        new_token = self._make_token(jti='new-token')
+        now = datetime.utcnow()
+        row = (
+            'session-1', 'user-1', 'test-sub', b'h' * 32, 'encrypted-token',
+            now + timedelta(hours=1), now, now, True, None, None
+        )
+        db = DatabaseManager.__new__(DatabaseManager)
+        db._init_runtime_state()
+        db.pool = _TrackingPool(row=row)
+        db.get_user_by_id = AsyncMock(return_value=SimpleNamespace(user_id='user-1', is_active=True))
+        db.queue_session_activity = MagicMock()
+        db.create_session = AsyncMock(side_effect=AssertionError('セッションの重複作成は不要'))
+        mock_encryption = MagicMock()
+        mock_encryption.decrypt_token.return_value = 'plain-refresh-token'
+        refresh_tokens = AsyncMock(return_value={'success': True, 'access_token': new_token, 'expires_in': 3600})
+
+        with patch.object(cognito_token_service, 'db_manager', new=db), \
+                patch.object(cognito_token_service, 'encryption_utils', new=mock_encryption), \
+                patch.object(cognito_token_service, 'logging_service', new=MagicMock()), \
+                patch.object(self.service, '_maybe_purge_sessions'), \
+                patch.object(self.service, 'refresh_tokens', new=refresh_tokens):
+            session = await db.get_session_by_token(old_token)
+            self.service._schedule_background_refresh(session, None, token_digest(old_token))
+            await asyncio.gather(*self.service._background_refreshes.values())
+
+            # 別プロセスへのリクエストやLRUからの追い出しで、リフレッシュ結果が手元にない状態
+            self.service._recent_refreshes.clear()
+            result = await self.service.validate_and_sync_session(old_token)
+
+        # 入れ替え時に旧トークンのハッシュを退避する
+        update_sql = next(
+            call.args[0] for call in db.pool.cursor.execute.call_args_list
+            if call.args[0] == cognito_token_service.SESSION_TOKEN_UPDATE_SQL
+        )
+        assert update_sql.index('previous_access_token_hash = access_token_hash') < update_sql.index('access_token_hash = %s')
+
+        # 旧トークンは現在・直前どちらのハッシュとしても照合され、既存のセッションが返される
+        lookup_sql, lookup_params = db.pool.cursor.execute.call_args_list[-1].args
+        assert 'previous_access_token_hash = %s' in lookup_sql
+        assert lookup_params == (token_digest(old_token), token_digest(old_token))
+        assert result['success'] is True
+        assert result['session'].session_id == 'session-1'
+        db.create_session.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_refresh_token_cache_skips_db(self):
+        """キャッシュ済みのRefresh TokenはDB参照・復号なしで返されることのテスト"""
+        self.service._cache_refresh_token('session-1', 'plain-refresh-token')
+
+        with patch.object(cognito_token_service, 'db_manager', new=MagicMock()) as mock_db:
+            refresh_token = await self.service._get_encrypted_refresh_token('session-1')
+
+        assert refresh_token == 'plain-refresh-token'
+        mock_db.pool.acquire.assert_not_called()
+
+        # セッション無効化時はキャッシュも破棄される
+        self.service.invalidate_validation_cache(session_id='session-1')
+        assert 'session-1' not in self.service._refresh_token_cache
+
+    @pytest.mark.asyncio
+    async def test_auto_extend_rejects_inactive_session(self):
+        """最終活動から1時間以上経過したセッションは自動延長されないことのテスト"""
+        session = SimpleNamespace(
+            session_id='session-1',
+            user_id='user-1',
+            last_activity_ts=int(time.time()) - 2 * 3600
+        )
+
+        result = await self.service._auto_extend_session(session)
+
+        assert result['success'] is False
+        assert result['error'] == 'session_too_old'
+
+    @pytest.mark.asyncio
+    async def test_refresh_token_decrypted_without_select(self):
+        """セッション読み込み時の暗号化Refresh TokenはDBを再参照せずに復号されることのテスト"""
+        mock_encryption = MagicMock()
+        mock_encryption.decrypt_token.return_value = 'plain-refresh-token'
+
+        with patch.object(cognito_token_service, 'db_manager', new=MagicMock()) as mock_db, \
+                patch.object(cognito_token_service, 'encryption_utils', new=mock_encryption):
+            refresh_token = await self.service._get_encrypted_refresh_token('session-2', 'encrypted-token')
+
+        assert refresh_token == 'plain-refresh-token'
+        mock_encryption.decrypt_token.assert_called_once_with('encrypted-token')
+        mock_db.pool.acquire.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_auto_refresh_releases_db_connection_during_cognito_call(self):
+        """Cognito呼び出し中はDBコネクションを保持しないことのテスト"""
+        pool = _TrackingPool(row=('encrypted-token',))
+        session = SimpleNamespace(
+            session_id='session-3',
+            user_id='user-1',
+            refresh_token_hash='hash',
+            encrypted_refresh_token=None
+        )
+        held_during_call = []
+
+        async def refresh_tokens(*args, **kwargs):
+            held_during_call.append(pool.held)
+            return {'success': True, 'access_token': 'new-access-token', 'expires_in': 3600}
+
+        mock_encryption = MagicMock()
+        mock_encryption.decrypt_token.return_value = 'plain-refresh-token'
+        mock_db = SimpleNamespace(pool=pool, invalidate_cached_session=MagicMock())
+
+        with patch.object(cognito_token_service, 'db_manager', new=mock_db), \
+                patch.object(cognito_token_service, 'encryption_utils', new=mock_encryption), \
+                patch.object(cognito_token_service, 'logging_service', new=MagicMock()), \
+                patch.object(self.service, '_maybe_purge_sessions'), \
+                patch.object(self.service, 'refresh_tokens', new=AsyncMock(side_effect=refresh_tokens)):
+            result = await self.service._refresh_session_tokens(session)
+
+        assert result['success'] is True
+        assert held_during_call == [0]
+        # SELECT と UPDATE の2回のみDBにアクセスする
+        assert pool.cursor.execute.await_count == 2
+        # 古いトークンで参照したセッションのキャッシュを破棄する
+        mock_db.invalidate_cached_session.assert_called_once_with(session_id='session-3')
+
+    @pytest.mark.asyncio
+    async def test_verified_claims_cached(self):
+        """検証済みトークンの再検証では署名検証を省略することのテスト"""
+        token = self._make_token()
+        first = await self.service.verify_access_token(token)
+
+        with patch.object(self.service, '_decode_rs256', side_effect=AssertionError('署名検証は不要')):
+            second = await self.service.verify_access_token(token)
+
+        assert second == first
+        assert second is not first
+
+        # 署名キーが入れ替わった場合はキャッシュを破棄する
+        self.service._publish_jwks_keys({'keys': []})
+        result = await self.service.verify_access_token(token)
+        assert result['error'] == 'jwk_key_not_found'
+
+    @pytest.mark.asyncio
+    async def test_refresh_many_batches_db_update(self):
+        """複数セッションのリフレッシュ結果が1回のexecutemanyで保存されることのテスト"""
+        pool = _TrackingPool()
+        pool.cursor.executemany = AsyncMock()
+        sessions = [
+            SimpleNamespace(session_id=f'session-{i}', user_id='user-1', encrypted_refresh_token=None)
+            for i in range(3)
+        ]
+        refresh_tokens_by_session = {'session-0': 'rt-0', 'session-2': 'rt-2'}
+
+        async def get_refresh_token(session_id, encrypted_token=None):
+            return refresh_tokens_by_session.get(session_id)
+
+        async def refresh_tokens(refresh_token, ip_address=None):
+            return {'success': True, 'access_token': f'access-{refresh_token}', 'refresh_token': refresh_token, 'expires_in': 3600}
+
+        mock_db = SimpleNamespace(pool=pool, invalidate_cached_session=MagicMock())
+
+        with patch.object(cognito_token_service, 'db_manager', new=mock_db), \
+                patch.object(cognito_token_service, 'logging_service', new=MagicMock()), \
+                patch.object(self.service, '_get_encrypted_refresh_token', new=AsyncMock(side_effect=get_refresh_token)), \
+                patch.object(self.service, 'refresh_tokens', new=AsyncMock(side_effect=refresh_tokens)):
+            results = await self.service.refresh_many(sessions, concurrency=2)
+
+        assert [result['success'] for result in results] == [True, False, True]
+        assert results[0]['new_access_token'] == 'access-rt-0'
+        assert results[1]['error'] == 'refresh_token_not_found'
+        pool.cursor.executemany.assert_awaited_once()
+        assert len(pool.cursor.executemany.call_args[0][1]) == 2
+        assert mock_db.invalidate_cached_session.call_count == 2
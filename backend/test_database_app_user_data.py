@@ -0,0 +1,80 @@
+"""
+app_user_data のJSONカラム更新（DatabaseManager.update_app_user_profile / update_app_user_preferences）の単体テスト
+"""
+import json
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+from database import DatabaseManager, _json_set_expression
+
+# DB はすべてモックしているため、各テスト後のクリーンアップは不要
+pytestmark = pytest.mark.no_db
+
+
+class _FakePool:
+    """execute の呼び出しを記録するテスト用コネクションプール"""
+
+    def __init__(self):
+        self.cursor = MagicMock()
+        self.cursor.execute = AsyncMock()
+
+    @asynccontextmanager
+    async def acquire(self):
+        conn = MagicMock()
+        conn.cursor = self._cursor
+        yield conn
+
+    @asynccontextmanager
+    async def _cursor(self, *args):
+        yield self.cursor
+
+
+class TestJsonColumnUpdate:
+    """JSONカラムの更新式のテスト"""
+
+    def setup_method(self):
+        """テストセットアップ（Secrets Manager を参照しないよう実行時状態のみ初期化）"""
+        self.pool = _FakePool()
+        self.manager = DatabaseManager.__new__(DatabaseManager)
+        self.manager._init_runtime_state()
+        self.manager.pool = self.pool
+        self.manager._drain_results = AsyncMock(return_value=[('{"display_name": "taro"}',)])
+
+    def test_nested_object_replaced_as_a_whole(self):
+        """入れ子のオブジェクトはマージせず、キーごと置き換えることのテスト"""
+        expression, params = _json_set_expression('profile_data', {'address': {'city': 'Tokyo'}})
+
+        assert expression.startswith('JSON_SET(COALESCE(profile_data, JSON_OBJECT())')
+        assert 'JSON_MERGE_PATCH' not in expression
+        assert params[0] == '$."address"'
+        assert json.loads(params[1]) == {'city': 'Tokyo'}
+
+    def test_null_value_kept_as_json_null(self):
+        """値がNoneのキーは削除せず、JSONのnullとして保存することのテスト"""
+        expression, params = _json_set_expression('preferences', {'theme': None, 'language': 'en'})
+
+        assert expression.count('CAST(%s AS JSON)') == 2
+        assert params == ('$."theme"', 'null', '$."language"', '"en"')
+
+    def test_key_quoted_as_json_path(self):
+        """キーはJSONパスとして引用符で囲み、特殊文字をエスケープすることのテスト"""
+        _, params = _json_set_expression('profile_data', {'a.b "c"': 1})
+
+        assert params[0] == '$.' + json.dumps('a.b "c"')
+
+    def test_empty_updates_keep_current_value(self):
+        """更新する項目がない場合は現在の値をそのまま残すことのテスト"""
+        assert _json_set_expression('profile_data', {}) == ('COALESCE(profile_data, JSON_OBJECT())', ())
+
+    @pytest.mark.asyncio
+    async def test_profile_update_statement_matches_params(self):
+        """更新文のプレースホルダーとパラメータの数が一致し、更新後の値を返すことのテスト"""
+        result = await self.manager.update_app_user_profile('sub-a', {'display_name': 'taro', 'bio': None})
+
+        sql, params = self.pool.cursor.execute.call_args[0]
+        assert sql.count('%s') == len(params)
+        assert '{value}' not in sql
+        assert params[0] == 'sub-a'
+        assert params[-1] == 'sub-a'
+        assert result == {'display_name': 'taro'}
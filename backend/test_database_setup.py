@@ -3,7 +3,7 @@
 """
 import os
 import asyncio
-import aiomysql
+import asyncmy
 from dotenv import load_dotenv
 from database import DatabaseManager
 
@@ -24,13 +24,14 @@ class TestDatabaseManager(DatabaseManager):
         self.password = os.getenv('TEST_DB_PASSWORD', 'gijiroku_pass')
         self.database = os.getenv('TEST_DB_NAME', 'gijiroku_test_db')
         self.pool = None
+        self._init_runtime_state()
         self.mock_mode = False  # モックモードフラグ
     
     async def setup_test_database(self):
         """テスト用データベースをセットアップ"""
         # まず、データベースを作成するために管理者接続を使用
         try:
-            conn = await aiomysql.connect(
+            conn = await asyncmy.connect(
                 host=self.host,
                 port=self.port,
                 user=self.user,
@@ -69,6 +70,9 @@ class TestDatabaseManager(DatabaseManager):
                         await cursor.execute("DELETE FROM auth_logs")
                         await cursor.execute("DELETE FROM user_sessions")
                         await cursor.execute("DELETE FROM users")
+                
+                # 削除した行の参照結果が次のテストに残らないようにする
+                self.clear_lookup_caches()
                         
             except Exception as e:
                 print(f"テストデータクリーンアップエラー: {e}")
@@ -141,7 +145,7 @@ class TestDatabaseManager(DatabaseManager):
             await self.close_pool()
         
         try:
-            conn = await aiomysql.connect(
+            conn = await asyncmy.connect(
                 host=self.host,
                 port=self.port,
                 user=self.user,
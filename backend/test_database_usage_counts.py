@@ -0,0 +1,120 @@
+"""
+使用回数の書き込みバッファ（DatabaseManager.queue_usage_count / flush_usage_counts）の単体テスト
+"""
+import re
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+from database import (
+    DatabaseManager, APP_USER_USAGE_BATCH_UPSERT_SQL, APP_USER_USAGE_UPSERT_SQL, FREE_SECONDS_BALANCE
+)
+
+# DB はすべてモックしているため、各テスト後のクリーンアップは不要
+pytestmark = pytest.mark.no_db
+
+
+class _FakePool:
+    """executemany の呼び出しを記録するテスト用コネクションプール"""
+
+    def __init__(self):
+        self.cursor = MagicMock()
+        self.cursor.executemany = AsyncMock()
+
+    @asynccontextmanager
+    async def acquire(self):
+        conn = MagicMock()
+        conn.cursor = self._cursor
+        yield conn
+
+    @asynccontextmanager
+    async def _cursor(self, *args):
+        yield self.cursor
+
+
+class TestUsageCountBuffer:
+    """使用回数の書き込みバッファのテスト"""
+
+    def setup_method(self):
+        """テストセットアップ（Secrets Manager を参照しないよう実行時状態のみ初期化）"""
+        self.pool = _FakePool()
+        self.manager = DatabaseManager.__new__(DatabaseManager)
+        self.manager._init_runtime_state()
+        self.manager.pool = self.pool
+        # 遅延書き込みタスクではなくテストから明示的に書き込む
+        self.manager.usage_flush_delay = 60
+
+    def teardown_method(self):
+        """予約された遅延書き込みタスクを停止"""
+        task = self.manager._usage_flush_task
+        if task and not task.done():
+            task.cancel()
+
+    def _written_increments(self, call_index=-1):
+        """executemany に渡された (cognito_sub, usage_count, monthly_usage_count) の一覧"""
+        rows = self.pool.cursor.executemany.call_args_list[call_index][0][1]
+        return [(row[1], row[3], row[4]) for row in rows]
+
+    def test_batch_upsert_is_rewritable_to_multi_row_insert(self):
+        """VALUES句がプレースホルダーのみで、UPDATE句にパラメータがないことのテスト"""
+        insert, _, update = APP_USER_USAGE_BATCH_UPSERT_SQL.partition('ON DUPLICATE KEY UPDATE')
+
+        assert re.search(r'VALUES\s*\(\s*%s(\s*,\s*%s)*\s*\)\s*$', insert)
+        assert '%s' not in update
+        assert insert.count('%s') == insert.split('VALUES')[0].count(',') + 1
+
+    @pytest.mark.asyncio
+    async def test_batch_upsert_uses_free_initial_balance(self):
+        """一括書き込みと単発の書き込みで、新規作成時の残り時間が同じ初期値になることのテスト"""
+        self.manager.queue_usage_count('sub-a')
+
+        await self.manager.flush_usage_counts()
+
+        row = self.pool.cursor.executemany.call_args[0][1][0]
+        assert row[5] == FREE_SECONDS_BALANCE
+        assert f", {FREE_SECONDS_BALANCE}, " in APP_USER_USAGE_UPSERT_SQL.partition('ON DUPLICATE KEY UPDATE')[0]
+
+    @pytest.mark.asyncio
+    async def test_increments_aggregated_per_user(self):
+        """同じユーザーの加算が合算され、1回のexecutemanyで書き込まれることのテスト"""
+        self.manager.queue_usage_count('sub-a')
+        self.manager.queue_usage_count('sub-a', 2)
+        self.manager.queue_usage_count('sub-b')
+
+        assert self.manager._pending_usage == {'sub-a': 3, 'sub-b': 1}
+
+        written = await self.manager.flush_usage_counts()
+
+        assert written == 2
+        assert self.manager._pending_usage == {}
+        self.pool.cursor.executemany.assert_awaited_once()
+        assert self.pool.cursor.executemany.call_args[0][0] == APP_USER_USAGE_BATCH_UPSERT_SQL
+        assert sorted(self._written_increments()) == [('sub-a', 3, 3), ('sub-b', 1, 1)]
+
+    @pytest.mark.asyncio
+    async def test_failed_increments_merged_back(self):
+        """書き込みに失敗した加算が、その後の加算と合算されて再試行されることのテスト"""
+        self.pool.cursor.executemany.side_effect = RuntimeError('connection lost')
+        self.manager.queue_usage_count('sub-a', 2)
+        self.manager.queue_usage_count('sub-b')
+
+        assert await self.manager.flush_usage_counts() == 0
+        assert self.manager._pending_usage == {'sub-a': 2, 'sub-b': 1}
+
+        self.manager.queue_usage_count('sub-a')
+        self.pool.cursor.executemany.side_effect = None
+
+        assert await self.manager.flush_usage_counts() == 2
+        assert self.manager._pending_usage == {}
+        assert sorted(self._written_increments()) == [('sub-a', 3, 3), ('sub-b', 1, 1)]
+
+    @pytest.mark.asyncio
+    async def test_written_batches_not_retried(self):
+        """途中のバッチで失敗した場合、書き込み済みのバッチは再試行しないことのテスト"""
+        self.manager.usage_batch_size = 1
+        self.pool.cursor.executemany.side_effect = [None, RuntimeError('connection lost')]
+        self.manager.queue_usage_count('sub-a')
+        self.manager.queue_usage_count('sub-b')
+
+        assert await self.manager.flush_usage_counts() == 1
+        assert self.manager._pending_usage == {'sub-b': 1}
@@ -384,7 +384,7 @@ class TestEmailPasswordAuthProperties:
             
             # 対応するセッションがない場合は認証が失敗する必要がある
             assert result['success'] is False
-            assert result['error'] in ['invalid_token', 'session_not_found', 'verification_error']
+            assert result['error'] in ['invalid_token', 'invalid_token_format', 'session_not_found', 'verification_error']
             assert 'message' in result
     
     @given(valid_email_addresses())